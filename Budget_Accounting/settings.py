@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 import os.path
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,18 +48,83 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        # Основной способ для API: JWT, проверяется только подпись (без базы и хэширования пароля).
+        # Стоит после сессии, чтобы ответ без учетных данных остался 403, как раньше
+        'budget.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
 }
+# Access-токен проверяется без базы, поэтому живет недолго; обновление проверяет пользователя
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_OBTAIN_SERIALIZER': 'budget.serializers.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'budget.serializers.ClaimsTokenRefreshSerializer',
+}
+
 # Настройки Celery
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 
+CELERY_BEAT_SCHEDULE = {
+    'cleanup-export-jobs': {
+        'task': 'budget.tasks.cleanup_export_jobs',
+        'schedule': 60 * 60,
+    },
+}
+
+# Кэш: Redis, если задан REDIS_CACHE_URL (общий для всех воркеров), иначе память процесса
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'budget-accounting',
+        }
+    }
+
+# PDF-отчеты больше PDF_SYNC_MAX_ROWS строк строятся фоновой выгрузкой
+PDF_SYNC_MAX_ROWS = 5000
+# Файлы фоновых выгрузок и срок их хранения (секунды)
+EXPORT_ROOT = BASE_DIR / 'exports'
+EXPORT_TTL = 24 * 60 * 60
+# Незавершенная дольше этого выгрузка (упавший воркер) считается неудачной (секунды)
+EXPORT_STALE_AFTER = 60 * 60
+# Профили запросов администраторов (?profile=cpu|sql, budget.profiling) и интервал выборки стеков (секунды)
+PROFILE_ROOT = BASE_DIR / 'profiles'
+PROFILE_SAMPLE_INTERVAL = 0.001
+
+# Курсы валют: провайдеры по приоритету (budget.rates.providers), таймауты (соединение, чтение),
+# повторы с экспоненциальной задержкой и число потоков загрузки.
+# RATE_PROVIDER_URLS переопределяет адреса API, например {'nbrb': 'http://127.0.0.1:8001/rates'}
+RATE_PROVIDERS = ['nbrb']
+RATE_PROVIDER_URLS = {}
+RATE_FETCH_TIMEOUT = (3.05, 10)
+RATE_FETCH_RETRIES = 3
+RATE_FETCH_BACKOFF = 0.5
+RATE_FETCH_WORKERS = 8
+
+# Замеры запросов (budget.monitoring): журнал budget.performance, сводка процесса и
+# выборка запросов к базе дольше SLOW_QUERY_MS миллисекунд (последние SLOW_QUERY_SAMPLES)
+PERFORMANCE_MONITORING = os.getenv('PERFORMANCE_MONITORING', 'True') == 'True'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+SLOW_QUERY_SAMPLES = 100
+# /metrics (budget.metrics) открыт для этих адресов и администраторов. Для нескольких процессов
+# gunicorn и Celery задайте общий каталог PROMETHEUS_MULTIPROC_DIR (см. gunicorn.conf.py)
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
 MIDDLEWARE = [
+    'budget.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +132,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'budget.middleware.ProfilingMiddleware',
+    'budget.middleware.RateSnapshotMiddleware',
 ]
 
 ROOT_URLCONF = 'Budget_Accounting.urls'
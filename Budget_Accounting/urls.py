@@ -25,7 +25,7 @@ from rest_framework_simplejwt.views import (
 )
 from django.conf import settings
 from django.conf.urls.static import static
-from budget.views import RegisterView
+from budget.views import RegisterView, metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -42,6 +42,7 @@ schema_view = get_schema_view(
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/', include('budget.urls')),
     # path('api-auth/', include('rest_framework.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -0,0 +1,74 @@
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from budget.conditional import request_stamp
+from budget.metrics import CACHE_REQUESTS
+from budget.versioning import CATALOG_CATEGORIES
+
+# Сколько хранится ответ, если данные пользователя не менялись
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+HITS_KEY = 'analytics:cache:hits'
+MISSES_KEY = 'analytics:cache:misses'
+
+
+def analytics_cache_key(namespace, user_id, stamp, params):
+    """Ключ ответа: вид аналитики, пользователь, версия его данных и параметры запроса."""
+    query = json.dumps(sorted(params.lists()), ensure_ascii=False)
+    digest = hashlib.sha256(query.encode('utf-8')).hexdigest()
+    return f'analytics:{namespace}:{user_id}:{stamp}:{digest}'
+
+
+def count(key):
+    # Счетчики лежат в самом кэше, поэтому с Redis суммируются по всем воркерам
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
+
+
+def versioned_cache(namespace, catalogs=(CATALOG_CATEGORIES,)):
+    """
+    Кэширует успешные ответы метода get() APIView по версии данных пользователя
+    и справочников catalogs (в ответах аналитики есть названия категорий).
+    Любое изменение транзакций, счетов или бюджетов увеличивает версию (budget.versioning),
+    после чего старые ключи просто перестают запрашиваться и вытесняются по таймауту.
+    Заголовок X-Cache показывает, был ли ответ взят из кэша.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            stamp = request_stamp(request, catalogs=catalogs)
+            key = analytics_cache_key(namespace, request.user.pk, stamp, request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                count(HITS_KEY)
+                CACHE_REQUESTS.labels('hit').inc()
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            count(MISSES_KEY)
+            CACHE_REQUESTS.labels('miss').inc()
+            response = get(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, ANALYTICS_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
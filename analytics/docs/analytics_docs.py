@@ -1,5 +1,25 @@
 from drf_yasg import openapi
 
+# Параметр валюты отчета, общий для аналитики
+CURRENCY_PARAMETER = openapi.Parameter(
+    "currency",
+    openapi.IN_QUERY,
+    description="Код валюты отчета (например USD): суммы пересчитываются по курсу на дату операции. "
+                "По умолчанию суммы не пересчитываются.",
+    type=openapi.TYPE_STRING,
+    required=False,
+)
+
+# Часовой пояс, по которому операции относятся к дням периода
+TIMEZONE_PARAMETER = openapi.Parameter(
+    "tz",
+    openapi.IN_QUERY,
+    description="Часовой пояс IANA (например Europe/Minsk) для границ периода и группировки по дням. "
+                "По умолчанию - пояс сервера.",
+    type=openapi.TYPE_STRING,
+    required=False,
+)
+
 # Пример запроса
 ANALYTICS_REQUEST_EXAMPLE = {
     "start_date": "2024-12-01",
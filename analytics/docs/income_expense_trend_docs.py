@@ -1,5 +1,7 @@
 from drf_yasg import openapi
 
+from analytics.docs.analytics_docs import CURRENCY_PARAMETER, TIMEZONE_PARAMETER
+
 INCOME_EXPENSE_TREND_DOCS = {
     'operation_description': "Получение динамики доходов и расходов за определенный период",
     'manual_parameters': [
@@ -25,6 +27,8 @@ INCOME_EXPENSE_TREND_DOCS = {
             enum=["day", "week", "month"],
             required=True,
         ),
+        CURRENCY_PARAMETER,
+        TIMEZONE_PARAMETER,
     ],
     'responses': {
     200: openapi.Response(
@@ -37,12 +41,12 @@ INCOME_EXPENSE_TREND_DOCS = {
                 },
                 "trend": [
                     {
-                        "date": "2024-12-01",
+                        "date": "2024-12-01T00:00:00Z",
                         "total_income": 200.0,
                         "total_expense": 100.0,
                     },
                     {
-                        "date": "2024-12-02",
+                        "date": "2024-12-02T00:00:00Z",
                         "total_income": 150.0,
                         "total_expense": 50.0,
                     },
@@ -1,5 +1,7 @@
 from drf_yasg import openapi
 
+from analytics.docs.analytics_docs import CURRENCY_PARAMETER, TIMEZONE_PARAMETER
+
 TOP_EXPENSE_CATEGORIES_DOCS = {
     "operation_description": "Получение аналитики по топ категориям расходов.",
     "manual_parameters": [
@@ -24,6 +26,8 @@ TOP_EXPENSE_CATEGORIES_DOCS = {
             type=openapi.TYPE_INTEGER,
             required=False,
         ),
+        CURRENCY_PARAMETER,
+        TIMEZONE_PARAMETER,
     ],
     "responses": {
         200: openapi.Response(
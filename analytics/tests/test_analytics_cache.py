@@ -0,0 +1,82 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Budget, Category, Transaction
+
+
+class AnalyticsCacheTest(APITestCase):
+    params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(name='Еда')
+        self.create('30.00')
+
+    def create(self, amount, user=None):
+        return Transaction.objects.create(
+            user=user or self.user, category=self.food, type='expense',
+            amount=Decimal(amount), date=make_aware(datetime(2025, 3, 10, 12)),
+        )
+
+    def get(self, url='/api/analytics/analytics/', **params):
+        response = self.client.get(url, {**self.params, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_hit_after_miss(self):
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+        # Из кэша: только чтение версии данных
+        with self.assertNumQueries(1):
+            response = self.get()
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['total_expense'], Decimal('30.00'))
+        # Другие параметры - другой ключ
+        self.assertEqual(self.get(end_date='2025-03-30')['X-Cache'], 'MISS')
+
+    def test_writes_invalidate_only_own_cache(self):
+        for url in ('/api/analytics/analytics/', '/api/analytics/top-expenses/', '/api/analytics/trend/'):
+            self.get(url)
+            self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+
+        other = User.objects.create_user(username='other', password='password123')
+        self.create('5.00', user=other)
+        self.assertEqual(self.get()['X-Cache'], 'HIT')
+
+        transaction = self.create('20.00')
+        response = self.get()
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['total_expense'], Decimal('50.00'))
+        self.assertEqual(self.get('/api/analytics/trend/')['X-Cache'], 'MISS')
+
+        transaction.delete()
+        self.assertEqual(self.get().data['total_expense'], Decimal('30.00'))
+
+        self.get()
+        Budget.objects.create(
+            user=self.user, category=self.food, amount=Decimal('100.00'),
+            start_date=datetime(2025, 3, 1).date(), end_date=datetime(2025, 3, 31).date(),
+        )
+        self.assertEqual(self.get()['X-Cache'], 'MISS')
+
+    def test_errors_are_not_cached(self):
+        response = self.client.get('/api/analytics/analytics/', {'start_date': '2025-03-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/analytics/analytics/', {'start_date': '2025-03-01'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_stats(self):
+        self.get()
+        self.get()
+        self.assertEqual(self.client.get('/api/analytics/cache-stats/').status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_superuser(username='admin', password='password123')
+        self.client.force_authenticate(user=admin)
+        response = self.client.get('/api/analytics/cache-stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
@@ -0,0 +1,92 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Category, Currency, Transaction
+from budget.rates import save_rates
+
+
+class AnalyticsCurrencyTest(APITestCase):
+    params = {'start_date': '2024-12-01', 'end_date': '2024-12-31'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='currencyuser', password='password123')
+        self.client.force_authenticate(user=self.user)
+        byn = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=1)
+        usd = Currency.objects.create(code='USD', name='Доллар', rate_to_base=Decimal('3.0'))
+        # Курс доллара меняется в середине месяца
+        save_rates({'USD': '3.2'}, date(2024, 12, 1))
+        save_rates({'USD': '3.0'}, date(2024, 12, 16))
+
+        account = Account.objects.create(user=self.user, name='Счет', account_type='cash', currency=byn, balance=1000)
+        salary = Category.objects.create(name='Зарплата')
+        food = Category.objects.create(name='Еда')
+        for day, kind, amount, currency, category in (
+            (5, 'income', '320.00', byn, salary),
+            (10, 'expense', '10.00', usd, food),
+            (20, 'expense', '10.00', usd, food),
+        ):
+            Transaction.objects.create(
+                user=self.user, account=account, category=category, type=kind, amount=Decimal(amount),
+                currency=currency, date=make_aware(datetime(2024, 12, day, 12)),
+            )
+
+    def test_totals_are_mixed_without_currency(self):
+        response = self.client.get('/api/analytics/analytics/', self.params)
+        self.assertEqual(response.data['total_expense'], Decimal('20.00'))
+        self.assertNotIn('currency', response.data)
+
+    def test_totals_converted_by_rate_on_date(self):
+        # Снимок курсов процесса загружается первым запросом после изменения курсов
+        self.client.get('/api/analytics/top-expenses/', {**self.params, 'currency': 'USD'})
+        # Версии данных и одна выборка с пересчетом, как и без пересчета
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/analytics/', {**self.params, 'currency': 'byn'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['currency'], 'BYN')
+        # 10 USD по 3.2 и 10 USD по 3.0
+        self.assertEqual(response.data['total_expense'], Decimal('62.00'))
+        self.assertEqual(response.data['total_income'], Decimal('320.00'))
+
+        response = self.client.get('/api/analytics/analytics/', {**self.params, 'currency': 'USD'})
+        self.assertEqual(response.data['total_income'], Decimal('100.00'))
+        self.assertEqual(response.data['total_expense'], Decimal('20.00'))
+
+    def test_top_expenses_and_trend(self):
+        response = self.client.get('/api/analytics/top-expenses/', {**self.params, 'currency': 'BYN'})
+        self.assertEqual(response.data['top_categories'], [{'category__name': 'Еда', 'total_expense': Decimal('62.00')}])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                '/api/analytics/trend/', {**self.params, 'group_by': 'day', 'currency': 'BYN'}
+            )
+        expenses = [item['total_expense'] for item in response.data['trend'] if item['total_expense']]
+        self.assertEqual(expenses, [Decimal('32.00'), Decimal('30.00')])
+
+    def test_transaction_without_currency_in_account_currency(self):
+        # Транзакция, созданная через API, без валюты: ее сумма в валюте счета (USD), а не в базовой
+        usd_account = Account.objects.create(
+            user=self.user, name='Долларовый', account_type='card', currency=Currency.objects.get(code='USD'), balance=0,
+        )
+        Transaction.objects.create(
+            user=self.user, account=usd_account, category=Category.objects.get(name='Еда'), type='expense',
+            amount=Decimal('10.00'), date=make_aware(datetime(2024, 12, 12, 12)),
+        )
+        # 10 USD по 3.2 к прежним 62 BYN - и по сводкам, и по транзакциям (день в другом поясе)
+        for extra in ({}, {'tz': 'Europe/Minsk'}):
+            response = self.client.get('/api/analytics/analytics/', {**self.params, **extra, 'currency': 'BYN'})
+            self.assertEqual(response.data['total_expense'], Decimal('94.00'))
+            response = self.client.get('/api/analytics/analytics/', {**self.params, **extra, 'currency': 'USD'})
+            self.assertEqual(response.data['total_expense'], Decimal('30.00'))
+
+    def test_unknown_currency(self):
+        response = self.client.get('/api/analytics/analytics/', {**self.params, 'currency': 'XYZ'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Валюта XYZ не найдена.')
+        response = self.client.get('/api/analytics/trend/', {**self.params, 'currency': 'dollars'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
@@ -76,6 +76,14 @@ class AnalyticsViewTestCase(APITestCase):
         self.assertEqual(float(categories[2]["total_income"]), 235.48)
         self.assertEqual(categories[2]["total_expense"], 0.0)
 
+    def test_single_query(self):
+        # Разбивка по категориям и итоги считаются за один запрос к БД, плюс чтение версии данных для кэша
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"start_date": "2024-12-01", "end_date": "2025-01-31"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_expense"], 103.0)
+
     def test_missing_parameters(self):
         self.client.login(username="testuser", password="password123")
         response = self.client.get(self.url)
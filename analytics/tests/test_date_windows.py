@@ -0,0 +1,80 @@
+import csv
+import io
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.dates import date_window
+from budget.models import Category, Transaction
+
+
+class DateWindowTest(SimpleTestCase):
+    def test_half_open_range(self):
+        window = date_window('2024-12-01', '2024-12-31', 'Europe/Minsk')
+        lookups = window.lookups()
+        self.assertEqual(lookups['date__gte'], datetime(2024, 11, 30, 21, tzinfo=dt_timezone.utc))
+        self.assertEqual(lookups['date__lt'], datetime(2024, 12, 31, 21, tzinfo=dt_timezone.utc))
+        self.assertFalse(window.is_server_local)
+        self.assertTrue(date_window('2024-12-01', '2024-12-31').is_server_local)
+
+    def test_invalid_values(self):
+        for args in (('2024-12-01', None), ('2024-13-01', '2024-12-31'), ('2024-12-01', '2024-12-31', 'Mars/Base')):
+            with self.assertRaises(ValueError):
+                date_window(*args)
+
+
+class TimezoneBucketsTest(APITestCase):
+    params = {'start_date': '2024-12-01', 'end_date': '2024-12-31'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tzuser', password='password123')
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Еда')
+        for moment, amount in (
+            # 5 декабря по UTC, но уже 6 декабря в Минске (UTC+3)
+            (datetime(2024, 12, 5, 22, 30), '10.00'),
+            (datetime(2024, 12, 6, 12, 0), '5.00'),
+            # Последний день периода по UTC, в Минске - уже январь
+            (datetime(2024, 12, 31, 22, 30), '7.00'),
+        ):
+            Transaction.objects.create(
+                user=self.user, category=category, type='expense', amount=Decimal(amount),
+                date=moment.replace(tzinfo=dt_timezone.utc),
+            )
+
+    def trend(self, **params):
+        response = self.client.get('/api/analytics/trend/', {**self.params, 'group_by': 'day', **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Формат даты в JSON - как у прежнего TruncDay по транзакциям: начало дня со смещением пояса
+        return {item['date']: item['total_expense'] for item in response.json()['trend']}
+
+    def test_days_follow_server_timezone_by_default(self):
+        self.assertEqual(self.trend(), {
+            '2024-12-05T00:00:00Z': 10.0, '2024-12-06T00:00:00Z': 5.0, '2024-12-31T00:00:00Z': 7.0,
+        })
+
+    def test_days_follow_requested_timezone(self):
+        # Версии данных и одна выборка по транзакциям
+        with self.assertNumQueries(2):
+            trend = self.trend(tz='Europe/Minsk')
+        self.assertEqual(trend, {'2024-12-06T00:00:00+03:00': 15.0})
+        self.assertEqual(self.trend(tz='Europe/Minsk', group_by='month'), {'2024-12-01T00:00:00+03:00': 15.0})
+
+        response = self.client.get('/api/analytics/analytics/', {**self.params, 'tz': 'Europe/Minsk'})
+        self.assertEqual(response.data['total_expense'], Decimal('15.00'))
+        self.assertEqual(response.data['timezone'], 'Europe/Minsk')
+
+    def test_unknown_timezone(self):
+        response = self.client.get('/api/analytics/top-expenses/', {**self.params, 'tz': 'Mars/Base'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.data)
+
+    def test_csv_includes_last_day(self):
+        response = self.client.get('/api/analytics/export-csv/', {'start_date': '2024-12-31', 'end_date': '2024-12-31'})
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual(len(rows), 2)
+        self.assertIn('7.00', rows[1])
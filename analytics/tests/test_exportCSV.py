@@ -1,8 +1,10 @@
 import csv
 import io
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
@@ -53,7 +55,7 @@ class ExportCSVViewTests(APITestCase):
         self.assertTrue(response['Content-Disposition'].startswith('attachment; filename='))
 
         # Проверка содержимого CSV
-        csv_file = io.StringIO(response.content.decode('utf-8'))
+        csv_file = io.StringIO(b''.join(response.streaming_content).decode('utf-8'))
         reader = csv.reader(csv_file, delimiter=';')
         rows = list(reader)
         rows[0] = [cell.lstrip('\ufeff') for cell in rows[0]]
@@ -61,8 +63,16 @@ class ExportCSVViewTests(APITestCase):
         self.assertEqual(rows[0], ['Дата', 'Тип', 'Категория', 'Сумма', 'Описание'])
 
         # Проверка данных транзакций в CSV
-        self.assertEqual(rows[1][0][:10], '2025-01-30')
-        self.assertEqual(rows[2][0][:10], '2025-01-30')
+        self.assertEqual(rows[1][0][:10], '2025-01-01')
+        self.assertEqual(rows[2][0][:10], '2025-01-31')
+
+    def test_export_csv_dates_in_requested_timezone(self):
+        # 2025-01-01 00:00 UTC в Нью-Йорке - еще 31 декабря: строка входит в период и печатается его датой
+        params = {'start_date': '2024-12-31', 'end_date': '2024-12-31', 'tz': 'America/New_York'}
+        response = self.client.get('/api/analytics/export-csv/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual([row[0] for row in rows[1:]], ['2024-12-31 19:00:00'])
 
     def test_export_csv_no_transactions(self):
         # Создание пустого фильтра (не существует транзакций в январе 2024)
@@ -76,8 +86,28 @@ class ExportCSVViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Чтение содержимого CSV
-        content = response.content.decode('utf-8')
+        content = b''.join(response.streaming_content).decode('utf-8')
         rows = content.splitlines()
 
         # Проверка, что в CSV нет данных (только заголовки)
         self.assertEqual(len(rows), 1)  # Только заголовок
+
+    def test_export_csv_constant_queries(self):
+        # Количество запросов не зависит от числа строк (нет N+1 по категориям)
+        for number in range(30):
+            Transaction.objects.create(
+                user=self.user,
+                type='expense',
+                category=Category.objects.create(name=f'Category {number}'),
+                amount=10.00,
+            )
+        today = timezone.localdate()
+        params = {
+            'start_date': (today - timedelta(days=1)).isoformat(),
+            'end_date': (today + timedelta(days=1)).isoformat(),
+        }
+        response = self.client.get('/api/analytics/export-csv/', params)
+        with CaptureQueriesContext(connection) as queries:
+            rows = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(rows), 31)
+        self.assertEqual(len(queries), 1)
@@ -0,0 +1,67 @@
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Category, Transaction
+from budget.tasks import run_export_job
+
+
+class ExportPDFViewTests(APITestCase):
+    url = '/api/analytics/export-pdf/'
+    params = {'start_date': '2025-01-01', 'end_date': '2025-02-01'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='pdfuser', password='password123')
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Еда')
+        first_day = timezone.make_aware(datetime(2025, 1, 1, 9))
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, category=category, type='expense' if number % 3 else 'income',
+                amount=Decimal('10.00'), description=f'Очень длинное описание транзакции номер {number} ' * 3,
+                date=first_day + timedelta(hours=number),
+            )
+            for number in range(120)
+        ])
+        self.export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.export_root.cleanup)
+
+    def test_small_report_is_paginated(self):
+        # Подсчет строк для выбора режима и одна выборка строк
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        # 120 строк по ~50 на страницу
+        self.assertEqual(response.content.count(b'/Type /Page\n'), 3)
+
+    def test_transactions_export_pdf(self):
+        response = self.client.get('/api/v1/transactions/export_pdf/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+    def test_invalid_dates(self):
+        response = self.client.get(self.url, {'start_date': '2025-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_large_report_is_rendered_by_export_job(self):
+        with override_settings(PDF_SYNC_MAX_ROWS=100, EXPORT_ROOT=self.export_root.name):
+            with mock.patch.object(run_export_job, 'delay', side_effect=run_export_job) as delay:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.get(self.url, self.params)
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            delay.assert_called_once()
+
+            job = self.client.get(f'/api/v1/exports/{response.data["id"]}/')
+            self.assertEqual(job.data['status'], 'done')
+            download = self.client.get(job.data['download_url'])
+            self.assertEqual(download.status_code, status.HTTP_200_OK)
+            self.assertTrue(b''.join(download.streaming_content).startswith(b'%PDF'))
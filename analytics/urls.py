@@ -2,7 +2,7 @@ from django.urls import path
 from rest_framework.urls import app_name
 
 
-from analytics.views import AnalyticsPageView, AnalyticsView, ExportCSVView, ExportPDFView, TopExpenseCategoriesView, \
+from analytics.views import AnalyticsCacheStatsView, AnalyticsPageView, AnalyticsView, ExportCSVView, ExportPDFView, TopExpenseCategoriesView, \
     IncomeExpenseTrendView, income_expense_trend_chart
 
 app_name = 'analytics'
@@ -15,4 +15,5 @@ urlpatterns = [
     path('top-expenses/', TopExpenseCategoriesView.as_view(), name='top-expenses'),
     path('trend/', IncomeExpenseTrendView.as_view(), name='income_expense_trend'),
     path('trend-chart/', income_expense_trend_chart, name='trend_chart'),
+    path('cache-stats/', AnalyticsCacheStatsView.as_view(), name='cache_stats'),
 ]
\ No newline at end of file
@@ -1,36 +1,36 @@
-import csv
-from io import BytesIO
-
 from django.db.models import Sum, Case, When, DecimalField, F, Q, Value
-from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
-from django.http import HttpResponse
+from django.db.models.functions import TruncDate, TruncWeek, TruncMonth
 from django.shortcuts import render
-from django.utils.dateparse import parse_date
-from django.utils.timezone import localtime, get_current_timezone, make_aware
 from django.views.generic import TemplateView
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework.exceptions import AuthenticationFailed, ValidationError
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime
 
-from analytics.docs.analytics_docs import ANALYTICS_RESPONSE_EXAMPLE
+from analytics.cache import cache_stats, versioned_cache
+from analytics.docs.analytics_docs import ANALYTICS_RESPONSE_EXAMPLE, CURRENCY_PARAMETER, TIMEZONE_PARAMETER
 
 from analytics.docs.income_expense_trend_docs import INCOME_EXPENSE_TREND_DOCS
 from analytics.docs.top_expenses_cat_docs import TOP_EXPENSE_CATEGORIES_DOCS
 
-from budget.models import Transaction
+from budget.conditional import ConditionalGetMixin
+from budget.dates import date_window
+from budget.exports import stream_csv_response
+from budget.reports import analytics_csv_columns, pdf_report_response
+from budget.models import DailyRollup, Transaction
+from budget.rates.convert import converted
+from budget.rates.snapshot import request_rates
+from budget.versioning import CATALOG_CATEGORIES, CATALOG_CURRENCIES
 
+# Ответы аналитики зависят от названий категорий и, при пересчете, от курсов валют
+ANALYTICS_CATALOGS = (CATALOG_CATEGORIES, CATALOG_CURRENCIES)
 
-class AnalyticsView(APIView):
+class AnalyticsView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    etag_catalogs = ANALYTICS_CATALOGS
 
     @swagger_auto_schema(
         operation_description="Получение аналитики по доходам и расходам за указанный период.",
@@ -49,6 +49,8 @@ class AnalyticsView(APIView):
                 type=openapi.TYPE_STRING,
                 required=True,
             ),
+            CURRENCY_PARAMETER,
+            TIMEZONE_PARAMETER,
         ],
         responses={
             200: openapi.Response(
@@ -60,6 +62,7 @@ class AnalyticsView(APIView):
         },
     )
 
+    @versioned_cache('analytics', catalogs=ANALYTICS_CATALOGS)
     def get(self, request):
         if not request.user.is_authenticated:
             raise AuthenticationFailed(detail='Not authenticated')
@@ -73,50 +76,48 @@ class AnalyticsView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         try:
-            start_date = make_aware(datetime.strptime(start_date, '%Y-%m-%d'), timezone=get_current_timezone())
-            end_date = make_aware(datetime.strptime(end_date, '%Y-%m-%d'), timezone=get_current_timezone())
-        except ValueError:
-            return Response(
-                {"error": "Неверный формат даты. Используйте YYYY-MM-DD."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            window = date_window(start_date, end_date, request.query_params.get('tz'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        start_date, end_date = window.start_at, window.day_start(window.end)
+        currency = reporting_currency(request)
 
-        # Фильтрация транзакций по дате
+        # Фильтрация по периоду: дневные сводки или транзакции, если дни считаются в поясе tz
         user = request.user
-        transactions = Transaction.objects.filter(
-            user=user,
-            date__gte=start_date,
-            date__lte=end_date
-        )
+        rollups, amount_field, day_field = period_rows(user, window)
+        amount = reporting_amount(rollups, currency, amount_field, day_field)
 
-        # Агрегация данных
-        analytics = transactions.values('category__name').annotate(
-            total_income=Sum(
-                Case(
-                    When(type='income', then='amount'),
-                    default=0,
-                    output_field=DecimalField()
-                )
-            ),
-            total_expense=Sum(
-                Case(
-                    When(type='expense', then='amount'),
-                    default=0,
-                    output_field=DecimalField()
+        # Агрегация данных: разбивка по категориям за один запрос
+        analytics = list(
+            rollups.values('category__name').annotate(
+                total_income=Sum(
+                    Case(
+                        When(type='income', then=amount),
+                        default=0,
+                        output_field=DecimalField()
+                    )
+                ),
+                total_expense=Sum(
+                    Case(
+                        When(type='expense', then=amount),
+                        default=0,
+                        output_field=DecimalField()
+                    )
                 )
-            )
+            ).order_by('category__name')
         )
 
-        # Итоговые суммы
-        total_income = transactions.filter(type='income').aggregate(total=Sum('amount'))['total'] or 0
-        total_expense = transactions.filter(type='expense').aggregate(total=Sum('amount'))['total'] or 0
+        # Итоговые суммы складываются из уже полученных групп, без повторного прохода по транзакциям
+        total_income = sum((item['total_income'] for item in analytics), 0)
+        total_expense = sum((item['total_expense'] for item in analytics), 0)
 
-        return Response({
+        data = {
             "period": {"start_date": start_date, "end_date": end_date},
             "total_income": total_income,
             "total_expense": total_expense,
-            "categories": list(analytics)  # данные по категориям
-        })
+            "categories": analytics  # данные по категориям
+        }
+        return Response(with_options(data, currency, window))
 
 
 class AnalyticsPageView(TemplateView):
@@ -130,85 +131,44 @@ class ExportCSVView(APIView):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         try:
-            start_date_parsed = parse_date(start_date)
-            end_date_parsed = parse_date(end_date)
-            if not start_date_parsed or not end_date_parsed:
-                raise ValidationError('Неверный формат даты.')
-        except ValidationError as e:
+            window = date_window(start_date, end_date, request.query_params.get('tz'))
+        except ValueError as e:
             return Response({'detail:': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Полуинтервал по самой колонке: последний день периода входит целиком
         transactions = Transaction.objects.filter(
             user=request.user,
-            date__range=[start_date, end_date]
+            **window.lookups()
+        ).order_by('date', 'id')
+        # Генерация CSV
+        return stream_csv_response(
+            transactions,
+            analytics_csv_columns(window.tz),
+            filename=f'{start_date}-{end_date}.csv',
+            delimiter=';',
         )
-        # Генерация CVV
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename={start_date}-{end_date}.csv'
-        response.write('\ufeff'.encode('utf8')) # поддержка utf-8 в экселе
-        writer = csv.writer(response, delimiter=';')
-        writer.writerow(['Дата', 'Тип', 'Категория', 'Сумма', 'Описание'])
-
-        for transaction in transactions:
-            writer.writerow([
-                localtime(transaction.date).strftime('%Y-%m-%d %H:%M:%S'),
-                transaction.type,
-                transaction.category.name if transaction.category else "Без категории",
-                transaction.amount,
-                transaction.description or "_"
-            ])
-        return response
 
 
 class ExportPDFView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-        transactions = Transaction.objects.filter(
-            user=request.user,
-            date__range=[start_date, end_date]
-        ).select_related('category', 'account')
-
-        # Настройка pdf
-        buffer = BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-
-        # Регистрация шрифта для кириллицы
-        pdfmetrics.registerFont(TTFont("DejaVuSans", "static/fonts/DejaVuSans.ttf"))
-        p.setFont("DejaVuSans", 12)
-
-        # Заголовок
-        p.drawString(100,750, f"Аналитика за период: {start_date} - {end_date}")
-
-        # Отображение транзакций
-        y = 720
-        for transaction in transactions:
-            line = (
-                f"{transaction.date.strftime('%Y-%m-%d %H:%M:%S')} - "
-                f"{transaction.type} - "
-                f"{transaction.category.name if transaction.category else 'Без категории'} - "
-                f"{transaction.description or '-'} - "
-                f"{transaction.amount} - "
-                f"{transaction.account.name if transaction.account else 'Не указан'}"
-            )
-            p.drawString(50, y, line)
-            y -= 20
-            if y < 50: # Создаем новую страницу, если заканчивается место
-                p.showPage()
-                p.setFont("DejaVuSans", 12)
-        p.showPage()
-        p.save()
-        buffer.seek(0)
-        response = HttpResponse(buffer, content_type="application/pdf")
-        response["Content-Disposition"] = f'attachment; filename="analytics_{start_date}_to_{end_date}.pdf"'
-        return response
-
-
-class TopExpenseCategoriesView(APIView):
+        params = {'start_date': request.GET.get('start_date'), 'end_date': request.GET.get('end_date')}
+        if request.GET.get('tz'):
+            params['tz'] = request.GET['tz']
+        try:
+            date_window(params['start_date'], params['end_date'], params.get('tz'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return pdf_report_response('analytics', request.user, params)
+
+
+class TopExpenseCategoriesView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    etag_catalogs = ANALYTICS_CATALOGS
 
 
     @swagger_auto_schema(**TOP_EXPENSE_CATEGORIES_DOCS)
+    @versioned_cache('top_expenses', catalogs=ANALYTICS_CATALOGS)
     def get(self, request):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -220,37 +180,34 @@ class TopExpenseCategoriesView(APIView):
                 status=400
             )
 
-
         try:
-            transactions = Transaction.objects.filter(
-                user=request.user,
-                type='expense',
-                date__date__gte=start_date,
-                date__date__lte=end_date
-            )
-        except ValueError:
-
-            return Response({"error": "Неверный формат даты. Используйте YYYY-MM-DD."}, status=400)
-
-        # Группировка и агрегация
-
-        top_categories = (
-            transactions.values('category__name')
-            .annotate(total_expense=Sum('amount'))
+            window = date_window(start_date, end_date, request.query_params.get('tz'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        currency = reporting_currency(request)
+
+        # Группировка и агрегация по дневным сводкам (или транзакциям для пояса tz)
+        rows, amount_field, day_field = period_rows(request.user, window)
+        top_categories = list(
+            rows.filter(type='expense')
+            .values('category__name')
+            .annotate(total_expense=Sum(reporting_amount(rows, currency, amount_field, day_field)))
             .order_by('-total_expense')[:limit]
         )
 
-
-        return Response({
+        data = {
             "period": {"start_date": start_date, "end_date": end_date},
-            "top_categories": list(top_categories)
-        })
+            "top_categories": top_categories
+        }
+        return Response(with_options(data, currency, window))
 
 
-class IncomeExpenseTrendView(APIView):
+class IncomeExpenseTrendView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    etag_catalogs = ANALYTICS_CATALOGS
 
     @swagger_auto_schema(**INCOME_EXPENSE_TREND_DOCS)
+    @versioned_cache('trend', catalogs=ANALYTICS_CATALOGS)
     def get(self, request):
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
@@ -262,33 +219,38 @@ class IncomeExpenseTrendView(APIView):
                 {'error': 'Пожалуйста, укажите start_date и end_date в формате YYYY-MM-DD'}, status=400
             )
         try:
-            group_by_field = {
-                'day': TruncDay('date'),
-                'week': TruncWeek('date'),
-                'month': TruncMonth('date'),
+            group_by_function = {
+                'day': F,
+                'week': TruncWeek,
+                'month': TruncMonth,
             }[group_by]
         except KeyError:
             return Response({'error': 'Недопустимое значение group_by. Используйте day, week или month'}, status=400)
 
-        # Фильтрация транзакций
-        transactions = (
-            request.user.transactions.filter(
-                date__date__gte=start_date,
-                date__date__lte=end_date
-            )
-            .annotate(period=group_by_field)
+        try:
+            window = date_window(start_date, end_date, request.query_params.get('tz'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        currency = reporting_currency(request)
+
+        # Фильтрация дневных сводок; для пояса tz - транзакций, день которых считается в SQL
+        rows, amount_field, day_field = period_rows(request.user, window)
+        amount = reporting_amount(rows, currency, amount_field, day_field)
+        rollups = list(
+            rows
+            .annotate(period=group_by_function(day_field))
             .values('period')
             .annotate(
                 total_income=Sum(
                     Case(
-                        When(Q(type='income'), then='amount'),
+                        When(Q(type='income'), then=amount),
                         default=Value(0),
                         output_field=DecimalField()
                     )
                 ),
                 total_expense=Sum(
                     Case(
-                        When(Q(type='expense'), then='amount'),
+                        When(Q(type='expense'), then=amount),
                         default=Value(0),
                         output_field=DecimalField()
                     )
@@ -297,20 +259,75 @@ class IncomeExpenseTrendView(APIView):
             .order_by('period')
         )
 
-        # Формируем ответ
-        return Response(
-            {
-                "period": {"start_date": start_date, "end_date": end_date},
-                "trend": [
-                    {
-                        "date": item["period"],
-                        "total_income": item["total_income"] or 0,
-                        "total_expense": item["total_expense"] or 0,
-                    }
-                    for item in transactions
-                ],
-            }
-        )
+        # Формируем ответ. Сводки и день в поясе tz - даты; в ответе, как и раньше при TruncDay
+        # по транзакциям, - начало дня (недели, месяца) со смещением пояса периода
+        data = {
+            "period": {"start_date": start_date, "end_date": end_date},
+            "trend": [
+                {
+                    "date": window.day_start(item["period"]),
+                    "total_income": item["total_income"] or 0,
+                    "total_expense": item["total_expense"] or 0,
+                }
+                for item in rollups
+            ],
+        }
+        return Response(with_options(data, currency, window))
+
+class AnalyticsCacheStatsView(APIView):
+    """Счетчики попаданий и промахов кэша аналитики."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_stats())
+
+
+def period_rows(user, window):
+    """
+    Строки для агрегатов аналитики за период window: (queryset, поле суммы, поле дня).
+    Если дни считаются в поясе сервера - дневные сводки. Иначе транзакции за полуинтервал
+    периода (по индексу на дату), а день в поясе window.tz вычисляется в SQL.
+    """
+    if window.is_server_local:
+        return DailyRollup.objects.filter(user=user, **window.date_lookups()), 'total', 'date'
+    transactions = Transaction.objects.filter(user=user, **window.lookups()).annotate(
+        day=TruncDate('date', tzinfo=window.tz)
+    )
+    return transactions, 'amount', 'day'
+
+
+def reporting_currency(request):
+    """Код валюты отчета из параметра currency; None - суммы без пересчета."""
+    currency = request.query_params.get('currency', '').strip().upper()
+    if not currency:
+        return None
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValidationError({'error': 'Неверный код валюты. Используйте трехбуквенный код, например USD.'})
+    # Снимок курсов сверяется по версии справочника, уже прочитанной для ETag: без запросов
+    if currency not in request_rates(request).ids:
+        raise ValidationError({'error': f'Валюта {currency} не найдена.'})
+    return currency
+
+
+def reporting_amount(rows, currency, amount_field='total', day_field='date'):
+    """
+    Сумма строки rows: как есть или пересчитанная в валюту отчета по курсу дня внутри запроса.
+    Транзакция без валюты пересчитывается из валюты счета (в сводках она уже в этой валюте).
+    """
+    if not currency:
+        return F(amount_field)
+    fallback_ref = 'account__currency' if rows.model is Transaction else None
+    return converted(amount_field, currency, date_ref=day_field, fallback_ref=fallback_ref)
+
+
+def with_options(data, currency, window):
+    # Валюта и часовой пояс отчета попадают в ответ, только если были указаны
+    if currency:
+        data["currency"] = currency
+    if window.tz:
+        data["timezone"] = window.tz.key
+    return data
+
 
 def income_expense_trend_chart(request):
     return render(request, 'analytics/income_expense_trend.html')
@@ -1,5 +1,11 @@
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
 from budget.models import *
+from budget.profiling import top_queries
 
 
 @admin.register(Account)
@@ -45,3 +51,71 @@ class LoanAdmin(admin.ModelAdmin):
 @admin.register(Counterparty)
 class CounterpartyAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(DailyRollup)
+class DailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'category', 'type', 'currency', 'total', 'count')
+    list_filter = ('type',)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'format', 'status', 'rows_done', 'rows_total', 'created_at', 'expires_at')
+    list_filter = ('status', 'kind', 'format')
+
+
+@admin.register(DataVersion)
+class DataVersionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'version', 'updated_at')
+
+
+@admin.register(CurrencyRate)
+class CurrencyRateAdmin(admin.ModelAdmin):
+    list_display = ('currency', 'date', 'rate', 'source')
+    list_filter = ('currency', 'source')
+    date_hierarchy = 'date'
+
+
+@admin.register(ProfileCapture)
+class ProfileCaptureAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'mode', 'method', 'path', 'view', 'status_code', 'duration_ms', 'db_ms', 'queries', 'user')
+    list_filter = ('mode', 'view')
+    search_fields = ('path', 'view', 'user__username')
+    readonly_fields = [field.name for field in ProfileCapture._meta.fields] + ['files', 'sql_summary']
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_urls(self):
+        urls = [
+            path('<uuid:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download), name='budget_profilecapture_download'),
+        ]
+        return urls + super().get_urls()
+
+    def download(self, request, pk, kind):
+        # Свернутые стеки открываются flamegraph.pl или speedscope, трасса SQL - JSON
+        capture = get_object_or_404(ProfileCapture, pk=pk)
+        file_path = {'stacks': capture.stacks_path, 'sql': capture.sql_path}.get(kind)
+        if file_path is None or not file_path.exists():
+            raise Http404('Файл профиля не найден.')
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=file_path.name)
+
+    @admin.display(description='Файлы')
+    def files(self, obj):
+        return format_html(
+            '<a href="{}">стеки (flame graph)</a> | <a href="{}">трасса SQL</a>',
+            reverse('admin:budget_profilecapture_download', args=[obj.pk, 'stacks']),
+            reverse('admin:budget_profilecapture_download', args=[obj.pk, 'sql']),
+        )
+
+    @admin.display(description='Самые затратные запросы')
+    def sql_summary(self, obj):
+        rows = top_queries(obj)
+        if not rows:
+            return '-'
+        return format_html(
+            '<table><tr><th>мс</th><th>раз</th><th>SQL</th></tr>{}</table>',
+            format_html_join('', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+                             ((total, count, sql) for sql, count, total in rows)),
+        )
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsUser
+
+# Поля пользователя, которые кладутся в токен при выдаче (ClaimsTokenObtainPairSerializer)
+USER_CLAIMS = ('username', 'is_staff', 'is_superuser')
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Проверка access-токена только по подписи и сроку действия: пользователь строится
+    из claims, без выборки из базы и без хэширования пароля на каждый запрос.
+    Отключение пользователя вступает в силу, когда истечет access-токен
+    (ACCESS_TOKEN_LIFETIME): обновление токена проверяет пользователя в базе.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Токен не содержит идентификатора пользователя.')
+        user = ClaimsUser(
+            id=user_id,
+            is_active=True,
+            **{claim: validated_token.get(claim, User._meta.get_field(claim).get_default()) for claim in USER_CLAIMS},
+        )
+        # Экземпляр соответствует существующей строке, а не новой
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
@@ -0,0 +1,212 @@
+import csv
+import io
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .dates import DateWindow
+from .models import Account, Transaction
+from .monitoring import percentile
+from .serializers import ClaimsTokenObtainPairSerializer
+from .seeding import transaction_counts_by_user
+
+IMPORT_ROWS = 200
+REPORT_DAYS = 90
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def pick_users(sizes):
+    """
+    Для каждого целевого объема - пользователь тестовых данных с ближайшим числом транзакций.
+    Возвращает [(объем, user_id, число транзакций)].
+    """
+    counts = transaction_counts_by_user()
+    if not counts:
+        return []
+    picked = []
+    for size in sizes:
+        user_id = min(counts, key=lambda pk: abs(counts[pk] - size))
+        picked.append((size, user_id, counts[user_id]))
+    return picked
+
+
+class BenchmarkContext:
+    """Данные пользователя, из которых строятся запросы к эндпоинтам."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.accounts = list(Account.objects.filter(user_id=user_id).order_by('id').values_list('id', 'name'))
+        # Периоды отсчитываются от последней транзакции, а не от дня запуска: те же данные - те же запросы
+        transactions = Transaction.objects.filter(user_id=user_id)
+        latest = transactions.order_by('-date').values_list('date', flat=True).first()
+        self.end = timezone.localdate(latest) if latest else timezone.localdate()
+        self.period = self.period_from(self.end - timedelta(days=REPORT_DAYS))
+        self.year = self.period_from(self.end - timedelta(days=365))
+        self.pdf_period = self.sync_pdf_period(transactions)
+
+    def period_from(self, start):
+        return {'start_date': start.isoformat(), 'end_date': self.end.isoformat()}
+
+    def sync_pdf_period(self, transactions):
+        """
+        Период PDF-отчета не больше PDF_SYNC_MAX_ROWS строк: отчет строится в ответ на запрос,
+        а не уходит в фоновую выгрузку, и замеряется построение PDF, а не постановка задачи.
+        """
+        window = DateWindow(self.end - timedelta(days=REPORT_DAYS), self.end)
+        beyond = list(
+            transactions.filter(**window.lookups()).order_by('-date')
+            .values_list('date', flat=True)[settings.PDF_SYNC_MAX_ROWS:settings.PDF_SYNC_MAX_ROWS + 1]
+        )
+        if not beyond:
+            return self.period
+        # Период начинается на следующий день после первой не поместившейся транзакции
+        return self.period_from(min(timezone.localdate(beyond[0]) + timedelta(days=1), self.end))
+
+    def import_file(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['Дата', 'Категория', 'Сумма', 'Тип', 'Описание', 'Счет'])
+        for number in range(IMPORT_ROWS):
+            writer.writerow([
+                (self.end - timedelta(days=number % 30)).isoformat(), 'Продукты', f'{number % 50 + 1}.25', 'expense',
+                f'Импорт {number}', self.accounts[0][1],
+            ])
+        return SimpleUploadedFile('import.csv', buffer.getvalue().encode('utf-8'), content_type='text/csv')
+
+
+# Название и функция (контекст, номер итерации) -> (метод, путь, данные).
+# Номер итерации в параметре _bench делает каждый GET уникальным и отключает кэш ответов.
+ENDPOINTS = [
+    ('transactions', lambda ctx, i: ('get', '/api/v1/transactions/', {'_bench': i})),
+    ('analytics', lambda ctx, i: ('get', '/api/analytics/analytics/', {**ctx.year, '_bench': i})),
+    ('trend', lambda ctx, i: ('get', '/api/analytics/trend/', {**ctx.year, 'group_by': 'month', '_bench': i})),
+    ('top-expenses', lambda ctx, i: ('get', '/api/analytics/top-expenses/', {**ctx.year, '_bench': i})),
+    ('export-csv', lambda ctx, i: ('get', '/api/analytics/export-csv/', {**ctx.period, '_bench': i})),
+    ('export-pdf', lambda ctx, i: ('get', '/api/analytics/export-pdf/', {**ctx.pdf_period, '_bench': i})),
+    ('import-csv', lambda ctx, i: ('post', '/api/v1/transactions/import_csv/', {'file': ctx.import_file()})),
+    ('budget-summary', lambda ctx, i: ('get', '/api/v1/budgets/summary/', {'_bench': i})),
+    ('transfer', lambda ctx, i: ('post', '/api/transfer/', {
+        'sender_account': ctx.accounts[0][0], 'receiver_account': ctx.accounts[-1][0],
+        'amount': '1.00', 'description': f'Перевод {i}',
+    })),
+]
+
+
+class EndpointBenchmark:
+    """
+    Замеры эндпоинтов через тестовый клиент Django (без сети) с JWT пользователя.
+    Каждый запрос выполняется в транзакции, которая откатывается, поэтому импорт
+    и переводы не меняют данные, а отложенные задачи (on_commit) не запускаются.
+    Время меряется отдельно от числа запросов и памяти: CaptureQueriesContext
+    и tracemalloc сами замедляют запрос.
+    """
+
+    def __init__(self, repeat=10, warmup=2, endpoints=None):
+        self.repeat = repeat
+        self.warmup = warmup
+        self.endpoints = [item for item in ENDPOINTS if not endpoints or item[0] in endpoints]
+
+    def run(self, users):
+        results = []
+        for size, user_id, count in users:
+            context = BenchmarkContext(user_id)
+            token = ClaimsTokenObtainPairSerializer.get_token(User.objects.get(pk=user_id)).access_token
+            client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+            for name, build in self.endpoints:
+                result = self.measure(client, context, build)
+                results.append({'endpoint': name, 'size': size, 'user_transactions': count, **result})
+        return results
+
+    def measure(self, client, context, build):
+        iteration = 0
+
+        def call(capture_queries=False):
+            nonlocal iteration
+            method, path, data = build(context, iteration)
+            iteration += 1
+            queries = CaptureQueriesContext(connection) if capture_queries else nullcontext()
+            with transaction.atomic():
+                with queries:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, data)
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+            return response.status_code, len(body), elapsed, len(queries) if capture_queries else None
+
+        for _ in range(self.warmup):
+            call()
+        timings = [call()[2] for _ in range(self.repeat)]
+
+        tracemalloc.start()
+        try:
+            status_code, size, _, queries = call(capture_queries=True)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            'status': status_code,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'peak_memory_kb': round(peak / 1024),
+            'response_bytes': size,
+        }
+
+
+def build_report(results, repeat, warmup):
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'warmup': warmup,
+        },
+        'results': results,
+    }
+
+
+def compare_reports(old, new):
+    """
+    Сравнение двух отчетов по p95 и числу запросов.
+    Возвращает [(эндпоинт, объем, p95 было, p95 стало, изменение %, запросов было, запросов стало)].
+    """
+    previous = {(row['endpoint'], row['size']): row for row in old['results']}
+    rows = []
+    for row in new['results']:
+        before = previous.get((row['endpoint'], row['size']))
+        if before is None:
+            continue
+        change = (row['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+        rows.append((
+            row['endpoint'], row['size'], before['p95_ms'], row['p95_ms'], round(change, 1),
+            before['queries'], row['queries'],
+        ))
+    return rows
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
@@ -0,0 +1,88 @@
+import hashlib
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .versioning import USER_SCOPE, format_stamp, get_version_states
+
+
+class NotModified(APIException):
+    status_code = status.HTTP_304_NOT_MODIFIED
+    default_detail = ''
+
+
+def request_version_states(request, user_data=True, catalogs=()):
+    """
+    Версии данных пользователя и справочников для запроса. Читаются одним запросом
+    и запоминаются на время запроса, чтобы ETag и кэш аналитики не читали их дважды.
+    """
+    http_request = getattr(request, '_request', request)
+    memo = http_request.__dict__.setdefault('_version_states', {})
+    scopes = ([USER_SCOPE] if user_data else []) + list(catalogs)
+    missing = [scope for scope in scopes if scope not in memo]
+    if missing:
+        user_id = request.user.pk if USER_SCOPE in missing else None
+        memo.update(get_version_states(user_id, [scope for scope in missing if scope != USER_SCOPE]))
+    return [memo[scope] for scope in scopes]
+
+
+def request_stamp(request, user_data=True, catalogs=()):
+    """Отметка версии всех данных, от которых зависит ответ (для ключей кэша)."""
+    return '/'.join(format_stamp(state) for state in request_version_states(request, user_data, catalogs))
+
+
+def is_not_modified(request, etag, last_modified):
+    # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        opaque = etag.removeprefix('W/')
+        return '*' in etags or any(tag.removeprefix('W/') == opaque for tag in etags)
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE'))
+    return bool(if_modified_since and last_modified and int(last_modified.timestamp()) <= if_modified_since)
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для APIView и ViewSet. ETag и Last-Modified строятся по версиям
+    данных пользователя (etag_user_data) и общих справочников (etag_catalogs), которые
+    читаются одним запросом по первичному ключу. Если клиент прислал совпадающий
+    If-None-Match или If-Modified-Since, ответ 304 отдается до выполнения самого
+    обработчика: без запросов выборки и без сериализации.
+    """
+    etag_user_data = True
+    etag_catalogs = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        user_data = self.etag_user_data and request.user.is_authenticated
+        states = request_version_states(request, user_data, self.etag_catalogs)
+        fingerprint = '|'.join([
+            str(request.user.pk) if user_data else '',
+            request.get_full_path(),
+            request.accepted_media_type or '',
+            *(format_stamp(state) for state in states),
+        ])
+        self.etag = f'W/"{hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:32]}"'
+        changed = [updated_at for _, updated_at in states if updated_at is not None]
+        self.last_modified = max(changed) if changed else None
+        if is_not_modified(request, self.etag, self.last_modified):
+            raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+        return response
@@ -0,0 +1,79 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+INVALID_DATE_MESSAGE = 'Неверный формат даты. Используйте YYYY-MM-DD.'
+
+
+def parse_date_safe(value):
+    """Разбирает дату YYYY-MM-DD, для неверного значения возвращает None."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def parse_timezone(value):
+    """Часовой пояс IANA из параметра запроса (например Europe/Minsk); None - пояс сервера."""
+    if not value:
+        return None
+    try:
+        return ZoneInfo(value)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f'Неизвестный часовой пояс: {value}')
+
+
+class DateWindow:
+    """
+    Период отчета: даты с start по end включительно в часовом поясе tz.
+    Для DateTimeField превращается в полуинтервал [начало start, начало дня после end)
+    с aware-границами: сравнение идет по самой колонке, поэтому работает индекс
+    по дате, а последний день периода попадает в выборку целиком.
+    """
+
+    def __init__(self, start, end, tz=None):
+        self.start = start
+        self.end = end
+        self.tz = tz
+
+    @property
+    def timezone(self):
+        return self.tz or timezone.get_current_timezone()
+
+    @property
+    def is_server_local(self):
+        # Дневные сводки (DailyRollup) разбиты по дням в поясе сервера
+        return self.tz is None or self.tz.key == settings.TIME_ZONE
+
+    def day_start(self, day):
+        return timezone.make_aware(datetime.combine(day, time.min), self.timezone)
+
+    @property
+    def start_at(self):
+        return self.day_start(self.start)
+
+    @property
+    def end_before(self):
+        return self.day_start(self.end + timedelta(days=1))
+
+    def lookups(self, field='date'):
+        """Условия filter() для DateTimeField field."""
+        return {f'{field}__gte': self.start_at, f'{field}__lt': self.end_before}
+
+    def date_lookups(self, field='date'):
+        """Условия filter() для DateField field."""
+        return {f'{field}__gte': self.start, f'{field}__lte': self.end}
+
+
+def date_window(start_date, end_date, tz=None):
+    """
+    DateWindow из строк запроса YYYY-MM-DD и имени часового пояса.
+    Неверные значения поднимают ValueError с текстом для ответа API.
+    """
+    start, end = parse_date_safe(start_date), parse_date_safe(end_date)
+    if not start or not end:
+        raise ValueError(INVALID_DATE_MESSAGE)
+    return DateWindow(start, end, parse_timezone(tz))
@@ -49,6 +49,18 @@ TRANSACTION_LIST_PARAMETERS = [
         description="Поле для сортировки. Например: 'amount', '-amount', 'date', '-date'",
         type=openapi.TYPE_STRING,
     ),
+    openapi.Parameter(
+        "cursor",
+        openapi.IN_QUERY,
+        description="Курсор страницы из полей next/previous предыдущего ответа",
+        type=openapi.TYPE_STRING,
+    ),
+    openapi.Parameter(
+        "page_size",
+        openapi.IN_QUERY,
+        description="Количество транзакций на странице (по умолчанию 50, максимум 500)",
+        type=openapi.TYPE_INTEGER,
+    ),
 ]
 
 TRANSACTION_LIST_RESPONSES = {
@@ -56,7 +68,6 @@ TRANSACTION_LIST_RESPONSES = {
         description="Успешный ответ с данными о транзакциях",
         examples={
             "application/json": {
-                "count": 2,
                 "next": None,
                 "previous": None,
                 "results": [
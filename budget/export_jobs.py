@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import EXPORT_DURATION, EXPORT_JOBS, EXPORT_ROWS
+from .models import ExportJob
+from .reports import report_source, report_timezone, write_report
+from .serializers import ExportJobSerializer
+from .versioning import get_data_version
+
+logger = logging.getLogger(__name__)
+
+
+def make_params_key(kind, export_format, params):
+    """Ключ одинаковых запросов выгрузки: вид, формат и параметры без учета порядка ключей."""
+    payload = json.dumps([kind, export_format, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def submit_export(user, kind, export_format, params):
+    """
+    Создает фоновую выгрузку или возвращает уже существующую для тех же параметров
+    и той же версии данных пользователя. Зависшие выгрузки (см. stale_exports) не переиспользуются.
+    Возвращает (job, created).
+    """
+    params_key = make_params_key(kind, export_format, params)
+    data_version = get_data_version(user.pk)
+    existing = (
+        ExportJob.objects.filter(user=user, params_key=params_key, data_version=data_version)
+        .exclude(status=ExportJob.STATUS_FAILED)
+        .exclude(pk__in=stale_exports().values('pk'))
+        .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+        .order_by('-created_at')
+        .first()
+    )
+    if existing:
+        return existing, False
+
+    job = ExportJob.objects.create(
+        user=user, kind=kind, format=export_format, params=params,
+        params_key=params_key, data_version=data_version,
+    )
+
+    def enqueue():
+        from .tasks import run_export_job
+        try:
+            run_export_job.delay(str(job.pk))
+        except Exception:
+            logger.exception('Не удалось поставить выгрузку %s в очередь', job.pk)
+            job.status = ExportJob.STATUS_FAILED
+            job.error = 'Сервис выгрузок недоступен, попробуйте позже.'
+            job.save(update_fields=['status', 'error'])
+
+    transaction.on_commit(enqueue)
+    return job, True
+
+
+def stale_exports():
+    """Выгрузки, не завершенные за EXPORT_STALE_AFTER: воркер, который их строил, скорее всего упал."""
+    started_before = timezone.now() - timedelta(seconds=settings.EXPORT_STALE_AFTER)
+    return ExportJob.objects.filter(
+        status__in=(ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING), created_at__lte=started_before,
+    )
+
+
+def export_job_response(job):
+    """Ответ на создание выгрузки: 202 для новой, 200 для найденной готовой, 503 если очередь недоступна."""
+    data = ExportJobSerializer(job).data
+    if job.status == ExportJob.STATUS_FAILED:
+        return Response(data, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    if job.status == ExportJob.STATUS_DONE:
+        return Response(data, status=status.HTTP_200_OK)
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+def run_export(job_id):
+    """
+    Строит файл выгрузки. Прогресс пишется в задание после каждой пачки строк,
+    файл сначала пишется во временный и переименовывается только целиком.
+    """
+    # Задание захватывается одним UPDATE: из нескольких воркеров (повторная доставка задачи)
+    # строить выгрузку будет только тот, кто перевел ее из очереди
+    claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.STATUS_PENDING).update(
+        status=ExportJob.STATUS_RUNNING
+    )
+    job = ExportJob.objects.select_related('user').get(pk=job_id)
+    if not claimed:
+        return job.status
+
+    queryset, title, basename = report_source(job.kind, job.user, job.params)
+    job.rows_total = queryset.count()
+    job.filename = f'{basename}.{job.format}'
+    job.save(update_fields=['rows_total', 'filename'])
+
+    def progress(rows_done):
+        ExportJob.objects.filter(pk=job.pk).update(rows_done=rows_done)
+
+    path = job.artifact_path
+    partial = path.with_suffix('.part')
+    started = time.monotonic()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(partial, 'wb') as output:
+            write_report(
+                job.kind, job.format, queryset, title, output, progress=progress, tz=report_timezone(job.params),
+            )
+        os.replace(partial, path)
+    except Exception as e:
+        logger.exception('Ошибка выгрузки %s', job.pk)
+        partial.unlink(missing_ok=True)
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        EXPORT_JOBS.labels(job.kind, job.format, job.status).inc()
+        return job.status
+
+    job.refresh_from_db(fields=['rows_done'])
+    job.status = ExportJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    job.expires_at = job.finished_at + timedelta(seconds=settings.EXPORT_TTL)
+    job.save(update_fields=['status', 'finished_at', 'expires_at'])
+    EXPORT_JOBS.labels(job.kind, job.format, job.status).inc()
+    EXPORT_DURATION.labels(job.kind, job.format).observe(time.monotonic() - started)
+    EXPORT_ROWS.labels(job.kind, job.format).inc(job.rows_done)
+    return job.status
+
+
+def cleanup_expired_exports():
+    """
+    Помечает неудачными зависшие выгрузки, удаляет выгрузки с истекшим сроком и неудачные
+    старше EXPORT_TTL. Возвращает количество удаленных.
+    """
+    now = timezone.now()
+    stale_exports().update(
+        status=ExportJob.STATUS_FAILED, error='Выгрузка не завершилась вовремя.', finished_at=now,
+    )
+    jobs = ExportJob.objects.filter(
+        Q(expires_at__lte=now)
+        | Q(status=ExportJob.STATUS_FAILED, created_at__lte=now - timedelta(seconds=settings.EXPORT_TTL))
+    )
+    removed = 0
+    for job in jobs.iterator():
+        job.artifact_path.unlink(missing_ok=True)
+        job.delete()
+        removed += 1
+    return removed
@@ -0,0 +1,64 @@
+import csv
+
+from django.http import StreamingHttpResponse
+
+# Сколько строк читаем из курсора БД и отдаем клиенту за один раз
+EXPORT_CHUNK_SIZE = 2000
+
+# Маркер UTF-8, без него Excel не распознает кириллицу
+UTF8_BOM = '\ufeff'
+
+
+class Echo:
+    """
+    Псевдо-буфер для csv.writer: вместо записи в память сразу возвращает строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_rows(queryset, columns, delimiter=',', chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    Генерирует CSV по частям.
+
+    columns - список кортежей (заголовок, поле ORM, функция форматирования или None).
+    Из БД выбираются только нужные колонки (values_list), строки читаются курсором
+    через iterator(), поэтому потребление памяти не зависит от количества транзакций.
+    progress(строк_выгружено), если задан, вызывается после каждой пачки.
+    """
+    writer = csv.writer(Echo(), delimiter=delimiter)
+    fields = [field for _, field, _ in columns]
+    formatters = [formatter for _, _, formatter in columns]
+
+    yield UTF8_BOM + writer.writerow([header for header, _, _ in columns])
+
+    buffer = []
+    count = 0
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        buffer.append(writer.writerow([
+            formatter(value) if formatter else value
+            for formatter, value in zip(formatters, row)
+        ]))
+        if len(buffer) >= chunk_size:
+            count += len(buffer)
+            yield ''.join(buffer)
+            buffer = []
+            if progress:
+                progress(count)
+    if buffer:
+        yield ''.join(buffer)
+    if progress:
+        progress(count + len(buffer))
+
+
+def stream_csv_response(queryset, columns, filename, delimiter=',', content_type='text/csv'):
+    """
+    Возвращает StreamingHttpResponse с CSV-файлом, который формируется по мере отправки.
+    """
+    response = StreamingHttpResponse(
+        iter_csv_rows(queryset, columns, delimiter=delimiter),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
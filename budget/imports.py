@@ -0,0 +1,216 @@
+import csv
+import io
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Case, When, F, Value, DecimalField
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import get_current_timezone, is_naive, make_aware
+
+from .metrics import transactions_ingested
+from .models import Account, Category, Currency, Transaction
+from .rollups import RollupDelta, transaction_state
+from .services import to_money
+from .spending import BudgetSpendDelta, schedule_budget_check
+from .versioning import bump_data_version
+
+# Сколько строк накапливаем перед одной вставкой bulk_create
+IMPORT_BATCH_SIZE = 1000
+
+# Режимы импорта: все или ничего / загрузить все корректные строки
+IMPORT_MODE_ATOMIC = 'atomic'
+IMPORT_MODE_PARTIAL = 'partial'
+IMPORT_MODES = (IMPORT_MODE_ATOMIC, IMPORT_MODE_PARTIAL)
+
+# Ограничение поля amount: max_digits=10, decimal_places=2
+MAX_AMOUNT = Decimal('99999999.99')
+CENTS = Decimal('0.01')
+
+
+class RowError(ValueError):
+    """Ошибка разбора одной строки файла."""
+
+
+class TransactionImporter:
+    """
+    Импорт транзакций из CSV.
+
+    Формат строки совпадает с выгрузкой export_csv:
+    Дата, Категория, Сумма, Тип, Описание[, Счет[, Валюта]]
+
+    Файл читается потоково, категории, валюты и счета загружаются одним запросом
+    на справочник, транзакции вставляются пачками через bulk_create, а балансы счетов
+    и сводная таблица DailyRollup, и счетчики расходов бюджетов обновляются один раз на весь импорт.
+    """
+
+    def __init__(self, user, mode=IMPORT_MODE_ATOMIC, batch_size=IMPORT_BATCH_SIZE):
+        if mode not in IMPORT_MODES:
+            raise ValueError(f'Неизвестный режим импорта: {mode}')
+        self.user = user
+        self.mode = mode
+        self.batch_size = batch_size
+        self.timezone = get_current_timezone()
+        # Имя категории не уникально: строка с именем, под которым их несколько, отклоняется,
+        # а не привязывается к случайной из них
+        self.categories = {}
+        self.ambiguous_categories = set()
+        for category_id, name in Category.objects.values_list('id', 'name'):
+            if name in self.categories:
+                self.ambiguous_categories.add(name)
+            self.categories[name] = category_id
+        self.currencies = {currency.code: currency for currency in Currency.objects.all()}
+        self.accounts = {
+            account.name: account
+            for account in Account.objects.filter(user=user).select_related('currency')
+        }
+        self.errors = []
+        self.imported = 0
+        self.balance_deltas = defaultdict(Decimal)
+        self.rollup = RollupDelta()
+        self.spending = BudgetSpendDelta()
+
+    def run(self, file):
+        """
+        Импортирует файл и возвращает отчет. В режиме atomic любая ошибка отменяет весь импорт.
+        """
+        stream = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            with transaction.atomic():
+                self._import(stream)
+                if self.errors and self.mode == IMPORT_MODE_ATOMIC:
+                    transaction.set_rollback(True)
+                    self.imported = 0
+                else:
+                    self._apply_balances()
+                    self.rollup.apply()
+                    schedule_budget_check(self.spending.apply())
+                    if self.imported:
+                        bump_data_version(self.user.pk)
+                        transactions_ingested('import', self.imported)
+        finally:
+            stream.detach()
+        return self.report()
+
+    def report(self):
+        return {
+            'mode': self.mode,
+            'imported': self.imported,
+            'failed': len(self.errors),
+            'errors': self.errors,
+        }
+
+    def _import(self, stream):
+        header = stream.readline()
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        reader = csv.reader(stream, delimiter=delimiter)
+        batch = []
+        # Строка 1 - заголовок
+        for line_number, row in enumerate(reader, start=2):
+            if not any(row):
+                continue
+            try:
+                batch.append(self._build_transaction(row))
+            except RowError as e:
+                self.errors.append({'line': line_number, 'row': row, 'error': str(e)})
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        self._flush(batch)
+
+    def _flush(self, batch):
+        # В режиме atomic после первой ошибки вставлять уже нечего, только собираем отчет
+        if not batch or (self.errors and self.mode == IMPORT_MODE_ATOMIC):
+            return
+        Transaction.objects.bulk_create(batch, batch_size=self.batch_size)
+        self.imported += len(batch)
+        for item in batch:
+            state = transaction_state(item)
+            self.rollup.add(state)
+            self.spending.add(state)
+            if item.account_id:
+                # Округляем каждую сумму так же, как при сохранении одиночной транзакции
+                delta = to_money(item.converted_amount)
+                self.balance_deltas[item.account_id] += delta if item.type == 'income' else -delta
+
+    def _apply_balances(self):
+        deltas = {pk: delta for pk, delta in self.balance_deltas.items() if delta}
+        if not deltas:
+            return
+        Account.objects.filter(pk__in=deltas).update(
+            balance=F('balance') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                output_field=DecimalField(),
+            )
+        )
+
+    def _build_transaction(self, row):
+        if len(row) < 5:
+            raise RowError('Ожидается минимум 5 колонок: Дата, Категория, Сумма, Тип, Описание.')
+        date, category_name, amount, transaction_type, description = (value.strip() for value in row[:5])
+        account_name = row[5].strip() if len(row) > 5 else ''
+        currency_code = row[6].strip().upper() if len(row) > 6 else ''
+
+        if transaction_type not in dict(Transaction.TRANSACTION_TYPE_CHOICES):
+            raise RowError(f'Неизвестный тип транзакции: {transaction_type}')
+
+        account = None
+        if account_name:
+            account = self.accounts.get(account_name)
+            if account is None:
+                raise RowError(f'Счет {account_name} не найден.')
+
+        currency = account.currency if account else None
+        if currency_code:
+            currency = self.currencies.get(currency_code)
+            if currency is None:
+                raise RowError(f'Валюта {currency_code} не найдена.')
+
+        category_id = None
+        if category_name:
+            if category_name in self.ambiguous_categories:
+                raise RowError(
+                    f'Категория {category_name} неоднозначна: в справочнике несколько категорий с таким именем.'
+                )
+            category_id = self.categories.get(category_name)
+            if category_id is None:
+                raise RowError(f'Категория {category_name} не найдена.')
+
+        item = Transaction(
+            user=self.user,
+            date=self._parse_date(date),
+            category_id=category_id,
+            amount=self._parse_amount(amount),
+            type=transaction_type,
+            description=description or None,
+            account=account,
+            currency=currency,
+        )
+        if account and currency != account.currency and account.currency.rate_to_base == 0:
+            raise RowError(f'Курс для {account.currency.code} не установлен')
+        return item
+
+    def _parse_date(self, value):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                day = parse_date(value)
+                if day is None:
+                    raise ValueError
+                parsed = datetime.combine(day, time.min)
+        except ValueError:
+            raise RowError(f'Неверный формат даты: {value}')
+        if is_naive(parsed):
+            parsed = make_aware(parsed, timezone=self.timezone)
+        return parsed
+
+    def _parse_amount(self, value):
+        try:
+            amount = Decimal(value.replace(' ', '').replace(',', '.')).quantize(CENTS)
+        except InvalidOperation:
+            raise RowError(f'Неверная сумма: {value}')
+        if not amount.is_finite() or amount <= 0 or amount > MAX_AMOUNT:
+            raise RowError(f'Сумма должна быть больше нуля и не больше {MAX_AMOUNT}.')
+        return amount
@@ -0,0 +1,256 @@
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+import requests
+from django.utils import timezone
+
+from .models import Account
+from .monitoring import percentile
+from .seeding import BENCHMARK_PASSWORD, benchmark_users
+
+REPORT_DAYS = 90
+
+
+class VirtualUser:
+    """Пользователь тестовых данных, от имени которого поток шлет запросы."""
+
+    def __init__(self, user_id, username, accounts):
+        self.user_id = user_id
+        self.username = username
+        self.accounts = accounts
+        self.token = None
+
+
+class Ledger:
+    """
+    Ожидаемые изменения остатков по успешным ответам сервера. Если ответ на изменяющий
+    запрос не получен (таймаут, обрыв), исход неизвестен - такие запросы считаются отдельно.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = defaultdict(Decimal)
+        self.unknown = 0
+
+    def add(self, account_id, delta):
+        with self.lock:
+            self.deltas[account_id] += delta
+
+    def add_unknown(self):
+        with self.lock:
+            self.unknown += 1
+
+
+def period(days):
+    end = timezone.localdate()
+    return {'start_date': (end - timedelta(days=days)).isoformat(), 'end_date': end.isoformat()}
+
+
+def list_transactions(user, rnd, ledger):
+    return 'get', '/api/v1/transactions/', {'params': {'page_size': 50}}, None
+
+
+def create_transaction(user, rnd, ledger):
+    account_id = rnd.choice(user.accounts)
+    kind = rnd.choice(['income', 'expense'])
+    amount = Decimal(rnd.randint(100, 5000)) / 100
+    data = {
+        'user': user.user_id, 'account': account_id, 'type': kind, 'amount': str(amount),
+        'description': 'Нагрузочный тест',
+    }
+
+    def on_success():
+        ledger.add(account_id, amount if kind == 'income' else -amount)
+    return 'post', '/api/v1/transactions/', {'json': data}, on_success
+
+
+def transfer(user, rnd, ledger):
+    sender, receiver = rnd.sample(user.accounts, 2)
+    amount = Decimal(rnd.randint(100, 2000)) / 100
+    data = {'sender_account': sender, 'receiver_account': receiver, 'amount': str(amount), 'description': 'Нагрузочный тест'}
+
+    def on_success():
+        ledger.add(sender, -amount)
+        ledger.add(receiver, amount)
+    return 'post', '/api/transfer/', {'json': data}, on_success
+
+
+def analytics(user, rnd, ledger):
+    return 'get', '/api/analytics/analytics/', {'params': period(365)}, None
+
+
+def trend(user, rnd, ledger):
+    return 'get', '/api/analytics/trend/', {'params': {**period(365), 'group_by': 'month'}}, None
+
+
+def export_csv(user, rnd, ledger):
+    return 'get', '/api/analytics/export-csv/', {'params': period(REPORT_DAYS), 'stream': True}, None
+
+
+# Название, вес в смеси запросов, построитель запроса. Смесь похожа на работу с дашбордом:
+# чаще всего - список транзакций и аналитика, реже - изменения и выгрузки.
+SCENARIOS = [
+    ('list-transactions', 35, list_transactions),
+    ('create-transaction', 15, create_transaction),
+    ('transfer', 10, transfer),
+    ('analytics', 20, analytics),
+    ('trend', 15, trend),
+    ('export-csv', 5, export_csv),
+]
+
+
+class LoadTest:
+    """
+    Генератор нагрузки на запущенный сервер (например, gunicorn Budget_Accounting.wsgi)
+    с базой из seed_benchmark_data. Каждый поток - отдельный виртуальный пользователь
+    со своим HTTP-соединением и JWT; между запросами - случайная пауза think_time.
+    Результаты пишутся в общий список под блокировкой.
+    """
+
+    def __init__(self, base_url, users, timeout=30, think_time=0.1, seed=42):
+        self.base_url = base_url.rstrip('/')
+        self.users = users
+        self.timeout = timeout
+        self.think_time = think_time
+        self.seed = seed
+        self.ledger = Ledger()
+        self.names = [name for name, _, _ in SCENARIOS]
+        self.weights = [weight for _, weight, _ in SCENARIOS]
+        self.builders = {name: build for name, _, build in SCENARIOS}
+
+    def login(self, session, user):
+        if user.token is None:
+            response = session.post(
+                f'{self.base_url}/api/v1/token/',
+                json={'username': user.username, 'password': BENCHMARK_PASSWORD}, timeout=self.timeout,
+            )
+            response.raise_for_status()
+            user.token = response.json()['access']
+        session.headers['Authorization'] = f'Bearer {user.token}'
+
+    def run_stage(self, concurrency, duration):
+        """Нагрузка concurrency потоками в течение duration секунд. Возвращает статистику стадии."""
+        samples = []
+        lock = threading.Lock()
+        # Access-токен живет недолго, поэтому каждая стадия начинается с нового входа
+        for user in self.users:
+            user.token = None
+        # Вход - до запуска потоков: исключение в потоке не дошло бы до вызывающего,
+        # и неудачный вход дал бы стадию без замеров вместо ошибки
+        with requests.Session() as session:
+            for user in self.users[:concurrency]:
+                self.login(session, user)
+        deadline = time.monotonic() + duration
+
+        def worker(number):
+            rnd = random.Random(self.seed * 1000 + number)
+            user = self.users[number % len(self.users)]
+            with requests.Session() as session:
+                self.login(session, user)
+                while time.monotonic() < deadline:
+                    name = rnd.choices(self.names, self.weights)[0]
+                    sample = self.request(session, name, user, rnd)
+                    with lock:
+                        samples.append(sample)
+                    if self.think_time:
+                        time.sleep(rnd.uniform(0, 2 * self.think_time))
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=worker, args=(number,), daemon=True) for number in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return summarize(samples, time.monotonic() - started, concurrency)
+
+    def request(self, session, name, user, rnd):
+        method, path, kwargs, on_success = self.builders[name](user, rnd, self.ledger)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+            if kwargs.get('stream'):
+                for _ in response.iter_content(chunk_size=65536):
+                    pass
+            status_code = response.status_code
+        except requests.RequestException:
+            status_code = None
+            if on_success:
+                self.ledger.add_unknown()
+        elapsed = (time.perf_counter() - started) * 1000
+        if on_success and status_code is not None and 200 <= status_code < 300:
+            on_success()
+        return name, status_code, elapsed
+
+
+def summarize(samples, elapsed, concurrency):
+    """
+    Статистика по эндпоинтам: число запросов, запросов в секунду, перцентили времени,
+    ошибки (5xx и сетевые) и отказы (4xx, например недостаточно средств).
+    """
+    by_name = defaultdict(list)
+    for name, status_code, latency in samples:
+        by_name[name].append((status_code, latency))
+    endpoints = {}
+    for name, rows in sorted(by_name.items()):
+        latencies = [latency for _, latency in rows]
+        endpoints[name] = {
+            'requests': len(rows),
+            'rps': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50), 1),
+            'p95_ms': round(percentile(latencies, 95), 1),
+            'p99_ms': round(percentile(latencies, 99), 1),
+            'mean_ms': round(statistics.mean(latencies), 1),
+            'errors': sum(1 for status_code, _ in rows if status_code is None or status_code >= 500),
+            'rejected': sum(1 for status_code, _ in rows if status_code is not None and 400 <= status_code < 500),
+        }
+    latencies = [latency for _, _, latency in samples]
+    errors = sum(item['errors'] for item in endpoints.values())
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(elapsed, 1),
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 2) if elapsed else 0,
+        'p95_ms': round(percentile(latencies, 95), 1) if latencies else None,
+        'error_rate': round(errors / len(samples), 4) if samples else 0,
+        'endpoints': endpoints,
+    }
+
+
+def load_virtual_users(count, seed=42):
+    """Случайная (воспроизводимая) выборка пользователей тестовых данных с двумя и более счетами."""
+    accounts = defaultdict(list)
+    for account_id, user_id in (
+        Account.objects.filter(user__in=benchmark_users()).order_by('id').values_list('id', 'user_id')
+    ):
+        accounts[user_id].append(account_id)
+    users = [
+        VirtualUser(user_id, username, accounts[user_id])
+        for user_id, username in benchmark_users().order_by('id').values_list('id', 'username')
+        if len(accounts[user_id]) > 1
+    ]
+    random.Random(seed).shuffle(users)
+    return users[:count]
+
+
+def account_balances(users):
+    account_ids = [account_id for user in users for account_id in user.accounts]
+    return dict(Account.objects.filter(pk__in=account_ids).values_list('id', 'balance'))
+
+
+def find_lost_updates(before, after, ledger):
+    """
+    Счета, у которых изменение остатка в базе не совпало с суммой подтвержденных
+    сервером операций: [(счет, было, стало, ожидалось)]. Если часть изменяющих запросов
+    завершилась без ответа (ledger.unknown), расхождения возможны и без потерянных обновлений.
+    """
+    anomalies = []
+    for account_id, balance in before.items():
+        expected = balance + ledger.deltas.get(account_id, Decimal(0))
+        if after.get(account_id) != expected:
+            anomalies.append((account_id, balance, after.get(account_id), expected))
+    return anomalies
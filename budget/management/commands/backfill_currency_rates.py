@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from budget.rates.fetch import date_range, update_rates
+
+
+class Command(BaseCommand):
+    help = "Загружает историю курсов валют за период (запросы по датам выполняются параллельно)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help='Начало периода (ГГГГ-ММ-ДД)')
+        parser.add_argument('--end', type=date.fromisoformat, help='Конец периода включительно, по умолчанию сегодня')
+        parser.add_argument(
+            '--provider', action='append', dest='providers',
+            help='Провайдер курсов (можно указать несколько, по приоритету); по умолчанию RATE_PROVIDERS',
+        )
+        parser.add_argument('--codes', help='Валюты через запятую; по умолчанию все валюты из базы')
+        parser.add_argument('--workers', type=int, help='Число потоков загрузки, по умолчанию RATE_FETCH_WORKERS')
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate()
+        if options['start'] > end:
+            raise CommandError("Начало периода позже конца.")
+        codes = None
+        if options['codes']:
+            codes = {code.strip().upper() for code in options['codes'].split(',') if code.strip()}
+
+        dates = date_range(options['start'], end)
+        self.stdout.write(f"Загрузка курсов за {len(dates)} дн. ...")
+        started = time.monotonic()
+        try:
+            saved, errors = update_rates(options['providers'], dates=dates, codes=codes, workers=options['workers'])
+        except ImportError as e:
+            raise CommandError(f"Неизвестный провайдер курсов: {e}")
+
+        for provider, on_date, error in sorted(errors, key=lambda item: (item[0], item[1])):
+            self.stderr.write(f"Ошибка запроса к {provider} на {on_date}: {error}")
+        for provider, updated in saved.items():
+            self.stdout.write(f"{provider}: валют {len(updated)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Готово за {time.monotonic() - started:.1f} с, ошибок: {len(errors)}"
+        ))
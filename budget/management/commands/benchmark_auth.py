@@ -0,0 +1,65 @@
+import base64
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from budget.authentication import StatelessJWTAuthentication
+from budget.serializers import ClaimsTokenObtainPairSerializer
+
+BENCHMARK_USERNAME = 'benchmark-auth'
+BENCHMARK_PASSWORD = 'benchmark-auth-password'
+
+
+class Command(BaseCommand):
+    help = "Замеряет стоимость аутентификации одного запроса: Basic, JWT с выборкой пользователя и JWT без базы"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Число замеров для каждого способа')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        if iterations < 1:
+            raise CommandError("Число замеров --iterations должно быть больше нуля.")
+        # Временный пользователь создается в транзакции, которая откатывается после замеров
+        with transaction.atomic():
+            user = User.objects.create_user(username=BENCHMARK_USERNAME, password=BENCHMARK_PASSWORD)
+            access = str(ClaimsTokenObtainPairSerializer.get_token(user).access_token)
+            basic = base64.b64encode(f'{BENCHMARK_USERNAME}:{BENCHMARK_PASSWORD}'.encode()).decode()
+            cases = [
+                ('Basic (PBKDF2 + выборка)', BasicAuthentication(), f'Basic {basic}'),
+                ('JWT + выборка пользователя', JWTAuthentication(), f'Bearer {access}'),
+                ('JWT, только подпись', StatelessJWTAuthentication(), f'Bearer {access}'),
+            ]
+            results = [self.measure(*case, iterations=iterations) for case in cases]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"{'Способ':<30}{'среднее, мс':>14}{'p95, мс':>10}{'запросов':>10}")
+        for name, timings, queries in results:
+            p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+            self.stdout.write(f"{name:<30}{statistics.mean(timings):>14.3f}{p95:>10.3f}{queries:>10}")
+        baseline = statistics.mean(results[0][1])
+        stateless = statistics.mean(results[-1][1])
+        if stateless:
+            self.stdout.write(self.style.SUCCESS(f"JWT без базы быстрее Basic в {baseline / stateless:.0f} раз"))
+
+    def measure(self, name, authenticator, header, iterations):
+        factory = APIRequestFactory()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                request = Request(factory.get('/api/v1/accounts/', HTTP_AUTHORIZATION=header))
+                started = time.perf_counter()
+                result = authenticator.authenticate(request)
+                timings.append((time.perf_counter() - started) * 1000)
+                # Замер без успешного входа ничего не говорит о стоимости аутентификации
+                if result is None or result[0].pk is None:
+                    raise CommandError(f"{name}: пользователь не аутентифицирован.")
+        return name, timings, len(queries) // iterations
@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from budget.benchmarks import ENDPOINTS, EndpointBenchmark, build_report, compare_reports, load_report, pick_users
+
+
+def parse_sizes(value):
+    try:
+        return [int(size) for size in value.split(',') if size.strip()]
+    except ValueError:
+        raise CommandError(f"Неверный список объемов: {value}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет основные эндпоинты на данных seed_benchmark_data: p50/p95, число SQL-запросов, "
+        "пиковую память и размер ответа для пользователей разного объема; пишет отчет в JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=parse_sizes, default=[1_000, 10_000, 100_000],
+            help='Объемы транзакций пользователя через запятую (берется ближайший пользователь)',
+        )
+        parser.add_argument('--repeat', type=int, default=10, help='Число замеров на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=2, help='Число прогревочных запросов')
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints', choices=[name for name, _ in ENDPOINTS],
+            help='Замерять только указанные эндпоинты (можно указать несколько)',
+        )
+        parser.add_argument('--output', help='Файл отчета, по умолчанию benchmarks/<дата>.json')
+        parser.add_argument('--compare', help='Сравнить с ранее сохраненным отчетом')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("Число замеров должно быть больше нуля.")
+        users = pick_users(options['sizes'])
+        if not users:
+            raise CommandError("Нет тестовых данных, сначала запустите seed_benchmark_data.")
+
+        results = EndpointBenchmark(options['repeat'], options['warmup'], options['endpoints']).run(users)
+        report = build_report(results, options['repeat'], options['warmup'])
+
+        self.stdout.write(
+            f"{'Эндпоинт':<16}{'объем':>9}{'код':>5}{'p50, мс':>10}{'p95, мс':>10}"
+            f"{'запросов':>10}{'память, КБ':>12}{'ответ, Б':>12}"
+        )
+        for row in results:
+            self.stdout.write(
+                f"{row['endpoint']:<16}{row['user_transactions']:>9}{row['status']:>5}{row['p50_ms']:>10}"
+                f"{row['p95_ms']:>10}{row['queries']:>10}{row['peak_memory_kb']:>12}{row['response_bytes']:>12}"
+            )
+
+        output = Path(options['output'] or f"benchmarks/{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"Отчет сохранен: {output}"))
+
+        if options['compare']:
+            try:
+                previous = load_report(options['compare'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Не удалось прочитать отчет {options['compare']}: {e}")
+            self.stdout.write(f"\nСравнение с {options['compare']} ({previous['meta'].get('commit')}):")
+            for endpoint, size, before, after, change, queries_before, queries_after in compare_reports(previous, report):
+                line = f"{endpoint:<16}{size:>9}{before:>10}{after:>10}{change:>+9.1f}%{queries_before:>6} -> {queries_after}"
+                self.stdout.write(self.style.ERROR(line) if change > 10 else line)
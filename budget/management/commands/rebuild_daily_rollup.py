@@ -0,0 +1,23 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.rollups import rebuild_daily_rollup
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает сводную таблицу DailyRollup по транзакциям"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Имя пользователя, для которого пересчитать данные')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {options['user']} не найден.")
+
+        self.stdout.write("Пересчет сводной таблицы...")
+        created = rebuild_daily_rollup(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Готово, записей: {created}"))
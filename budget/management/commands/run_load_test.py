@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from budget.benchmarks import git_commit
+from budget.loadtest import LoadTest, account_balances, find_lost_updates, load_virtual_users
+
+
+def parse_stages(value):
+    try:
+        stages = [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise CommandError(f"Неверный список стадий: {value}")
+    if not stages or min(stages) < 1:
+        raise CommandError("Число потоков в стадии должно быть больше нуля.")
+    return stages
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест запущенного сервера (например, gunicorn Budget_Accounting.wsgi) на данных "
+        "seed_benchmark_data: смесь запросов дашборда с растущим числом одновременных пользователей, "
+        "пропускная способность, перцентили и ошибки по эндпоинтам, проверка потерянных обновлений остатков. "
+        "Команда должна работать с той же базой, что и сервер"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument(
+            '--stages', type=parse_stages, default=[5, 10, 25, 50],
+            help='Число одновременных пользователей по стадиям через запятую',
+        )
+        parser.add_argument('--duration', type=float, default=30, help='Длительность стадии, с')
+        parser.add_argument('--users', type=int, default=20, help='Сколько пользователей тестовых данных задействовать')
+        parser.add_argument('--think-time', type=float, default=0.1, help='Средняя пауза между запросами, с')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут запроса, с')
+        parser.add_argument('--p95-limit', type=float, default=500, help='Допустимый p95, мс')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Сохранить отчет в JSON')
+
+    def handle(self, *args, **options):
+        users = load_virtual_users(options['users'], options['seed'])
+        if not users:
+            raise CommandError("Нет тестовых данных, сначала запустите seed_benchmark_data.")
+        load_test = LoadTest(
+            options['base_url'], users, timeout=options['timeout'], think_time=options['think_time'],
+            seed=options['seed'],
+        )
+
+        before = account_balances(users)
+        stages = []
+        for concurrency in options['stages']:
+            self.stdout.write(f"Стадия: {concurrency} польз., {options['duration']:.0f} с ...")
+            try:
+                stage = load_test.run_stage(concurrency, options['duration'])
+            except requests.RequestException as e:
+                raise CommandError(f"Не удалось войти на {options['base_url']}: {e}")
+            stages.append(stage)
+            self.write_stage(stage, options['p95_limit'])
+        after = account_balances(users)
+        anomalies = find_lost_updates(before, after, load_test.ledger)
+
+        sustained = [stage['concurrency'] for stage in stages
+                     if stage['p95_ms'] is not None and stage['p95_ms'] <= options['p95_limit']
+                     and stage['error_rate'] < 0.01]
+        if sustained:
+            self.stdout.write(self.style.SUCCESS(
+                f"Выдерживает до {max(sustained)} одновременных пользователей при p95 <= {options['p95_limit']:.0f} мс"
+            ))
+        else:
+            self.stdout.write(self.style.ERROR(f"Ни одна стадия не уложилась в p95 {options['p95_limit']:.0f} мс"))
+
+        if options['output']:
+            report = {
+                'meta': {
+                    'created_at': timezone.now().isoformat(), 'commit': git_commit(),
+                    'base_url': options['base_url'], 'duration_s': options['duration'],
+                    'think_time_s': options['think_time'], 'users': len(users),
+                },
+                'stages': stages,
+                'unknown_outcomes': load_test.ledger.unknown,
+                'lost_updates': [
+                    {'account': account, 'before': str(old), 'after': str(new), 'expected': str(expected)}
+                    for account, old, new, expected in anomalies
+                ],
+            }
+            output = Path(options['output'])
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+            self.stdout.write(f"Отчет сохранен: {output}")
+
+        if load_test.ledger.unknown:
+            self.stdout.write(self.style.WARNING(
+                f"Запросов с неизвестным исходом: {load_test.ledger.unknown}, расхождения остатков возможны"
+            ))
+        if anomalies:
+            for account, old, new, expected in anomalies:
+                self.stderr.write(f"Счет {account}: было {old}, стало {new}, ожидалось {expected}")
+            raise CommandError(f"Потерянные обновления остатков: {len(anomalies)} счетов")
+        self.stdout.write(self.style.SUCCESS(f"Остатки сходятся на {len(before)} счетах"))
+
+    def write_stage(self, stage, p95_limit):
+        self.stdout.write(
+            f"  всего {stage['requests']} запросов, {stage['rps']} в с, p95 {stage['p95_ms']} мс, "
+            f"ошибок {stage['error_rate']:.2%}"
+        )
+        self.stdout.write(
+            f"  {'Эндпоинт':<20}{'запросов':>9}{'в с':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'ошибок':>8}{'отказов':>9}"
+        )
+        for name, row in stage['endpoints'].items():
+            line = (
+                f"  {name:<20}{row['requests']:>9}{row['rps']:>8}{row['p50_ms']:>8}{row['p95_ms']:>8}"
+                f"{row['p99_ms']:>8}{row['errors']:>8}{row['rejected']:>9}"
+            )
+            self.stdout.write(self.style.WARNING(line) if row['p95_ms'] > p95_limit else line)
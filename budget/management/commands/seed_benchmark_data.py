@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from budget.dates import parse_date_safe
+from budget.seeding import BENCHMARK_PASSWORD, BenchmarkSeeder, benchmark_users, flush_benchmark_data
+
+
+class Command(BaseCommand):
+    help = (
+        "Создает воспроизводимые тестовые данные для замеров производительности: пользователи "
+        "с неравномерным числом транзакций, счета в нескольких валютах, бюджеты, долги, история курсов"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='Число пользователей')
+        parser.add_argument('--transactions', type=int, default=100_000, help='Общее число транзакций')
+        parser.add_argument('--days', type=int, default=730, help='Глубина истории в днях')
+        parser.add_argument('--seed', type=int, default=42, help='Начальное значение генератора')
+        parser.add_argument(
+            '--end-date', help='Последний день истории YYYY-MM-DD (по умолчанию сегодня); с ним данные не зависят от дня запуска',
+        )
+        parser.add_argument('--batch-size', type=int, default=10_000, help='Размер пачки вставки')
+        parser.add_argument('--flush', action='store_true', help='Удалить ранее созданные тестовые данные')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['transactions'] < 1 or options['days'] < 1:
+            raise CommandError("Число пользователей, транзакций и дней должно быть больше нуля.")
+        end_date = None
+        if options['end_date']:
+            end_date = parse_date_safe(options['end_date'])
+            if end_date is None:
+                raise CommandError("Неверный формат --end-date. Используйте YYYY-MM-DD.")
+        if options['flush']:
+            removed = flush_benchmark_data()
+            self.stdout.write(f"Удалено пользователей: {removed}")
+        elif benchmark_users().exists():
+            raise CommandError("Тестовые данные уже есть, используйте --flush, чтобы создать их заново.")
+
+        started = time.monotonic()
+        seeder = BenchmarkSeeder(
+            users=options['users'], transactions=options['transactions'], days=options['days'],
+            seed=options['seed'], batch_size=options['batch_size'], log=self.stdout.write, end_date=end_date,
+        )
+        stats = seeder.run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано пользователей: {stats['users']}, транзакций: {stats['transactions']} "
+            f"за {time.monotonic() - started:.1f} с. Пароль пользователей: {BENCHMARK_PASSWORD}"
+        ))
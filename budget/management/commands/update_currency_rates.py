@@ -1,55 +1,40 @@
-import requests
-from django.core.management.base import BaseCommand
-from budget.models import Currency
+from datetime import date
 
-# API НБРБ для получения курсов валют
-NBRB_API_URL = "https://www.nbrb.by/api/exrates/rates?periodicity=0"
+from django.core.management.base import BaseCommand, CommandError
 
-class Command(BaseCommand):
-    help = "Обновление курсов валют из API НБРБ"
+from budget.rates.fetch import update_rates
 
-    def handle(self, *args, **kwargs):
-        supported_currencies = ['EUR', 'USD']  # Поддерживаемые валюты
-        self.stdout.write("Запрос курсов валют из API НБРБ...")
 
-        # Отправляем запрос к API
+class Command(BaseCommand):
+    help = "Обновление курсов валют (по умолчанию из API НБРБ)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--provider', action='append', dest='providers',
+            help='Провайдер курсов (можно указать несколько, по приоритету); по умолчанию RATE_PROVIDERS',
+        )
+        parser.add_argument('--date', type=date.fromisoformat, help='Дата курсов (ГГГГ-ММ-ДД), по умолчанию сегодня')
+        parser.add_argument(
+            '--codes', default='EUR,USD',
+            help='Поддерживаемые валюты через запятую; пустое значение - все валюты из базы',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Запрос курсов валют...")
+        codes = {code.strip().upper() for code in options['codes'].split(',') if code.strip()}
         try:
-            response = requests.get(NBRB_API_URL)
-            response.raise_for_status()
-            rates_data = response.json()
-        except requests.RequestException as e:
-            self.stderr.write(f"Ошибка запроса к API НБРБ: {e}")
-            return
-
-        # Обрабатываем данные и обновляем курсы
-        for rate_info in rates_data:
-            currency_code = rate_info["Cur_Abbreviation"]
-
-            # Проверяем, входит ли валюта в список поддерживаемых
-            if currency_code in supported_currencies:
-                official_rate = rate_info["Cur_OfficialRate"]
-                scale = rate_info["Cur_Scale"]
-
-                try:
-                    # Проверяем scale на корректность
-                    if scale == 0:
-                        self.stderr.write(f"Ошибка данных для {currency_code}: scale = 0")
-                        continue
-
-                    # Переводим курс к одной единице валюты
-                    normalized_rate = official_rate / scale
-
-                    # Обновляем курс в базе данных
-                    currency = Currency.objects.get(code=currency_code)
-                    currency.rate_to_base = normalized_rate  # Обновляем курс относительно BYN
-                    currency.save()
-
-                    self.stdout.write(
-                        f"Обновлено: {currency_code} = {normalized_rate:.4f} BYN (за {scale} ед.)"
-                    )
-                except Currency.DoesNotExist:
-                    self.stderr.write(f"Валюта {currency_code} не найдена в базе.")
-                except Exception as e:
-                    self.stderr.write(f"Ошибка обработки валюты {currency_code}: {e}")
-
+            saved, errors = update_rates(
+                options['providers'], dates=[options['date']] if options['date'] else None, codes=codes,
+            )
+        except ImportError as e:
+            raise CommandError(f"Неизвестный провайдер курсов: {e}")
+
+        for provider, on_date, error in errors:
+            self.stderr.write(f"Ошибка запроса к {provider} на {on_date}: {error}")
+        for provider, updated in saved.items():
+            self.stdout.write(f"{provider}: обновлено {', '.join(sorted(updated)) or 'ничего'}")
+            for code in sorted(codes - set(updated)):
+                self.stderr.write(f"Валюта {code} не найдена в базе или в ответе {provider}.")
+        if errors and not saved:
+            raise CommandError("Курсы не получены.")
         self.stdout.write("Обновление курсов завершено.")
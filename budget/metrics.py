@@ -0,0 +1,115 @@
+"""
+Метрики Prometheus. Если задана переменная окружения PROMETHEUS_MULTIPROC_DIR, каждый процесс
+(воркеры gunicorn, воркеры Celery) пишет значения в файлы этого каталога, а /metrics собирает
+их вместе (prometheus_client.multiprocess); без нее метрики живут в памяти процесса.
+"""
+import os
+import time
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+
+REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TASK_BUCKETS = (0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 600)
+
+# Каталог создает gunicorn (gunicorn.conf.py), но переменная видна и другим процессам образа:
+# runserver, воркерам Celery, командам manage.py. Без каталога первая же запись метрики падает
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+REQUEST_DURATION = Histogram(
+    'budget_http_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['view', 'action', 'method', 'status'], buckets=REQUEST_BUCKETS,
+)
+DB_QUERIES = Counter('budget_db_queries_total', 'Запросы к базе', ['view', 'action'])
+DB_DUPLICATE_QUERIES = Counter('budget_db_duplicate_queries_total', 'Повторы одинакового SQL (N+1)', ['view', 'action'])
+DB_QUERY_SECONDS = Counter('budget_db_query_seconds_total', 'Время запросов к базе', ['view', 'action'])
+SLOW_QUERIES = Counter('budget_db_slow_queries_total', 'Запросы к базе дольше SLOW_QUERY_MS', ['view'])
+CACHE_REQUESTS = Counter('budget_analytics_cache_requests_total', 'Обращения к кэшу аналитики', ['result'])
+
+TASK_DURATION = Histogram(
+    'budget_celery_task_duration_seconds', 'Время выполнения задачи Celery', ['task'], buckets=TASK_BUCKETS,
+)
+TASKS = Counter('budget_celery_tasks_total', 'Завершенные задачи Celery по исходу', ['task', 'outcome'])
+
+RATE_UPDATES = Counter('budget_rate_updates_total', 'Загрузки курсов по провайдерам и исходу', ['provider', 'outcome'])
+RATE_UPDATE_LAST_SUCCESS = Gauge(
+    'budget_rate_update_last_success_timestamp_seconds', 'Время последней успешной загрузки курсов',
+    ['provider'], multiprocess_mode='max',
+)
+EXPORT_JOBS = Counter('budget_export_jobs_total', 'Фоновые выгрузки по исходу', ['kind', 'format', 'status'])
+EXPORT_DURATION = Histogram(
+    'budget_export_job_duration_seconds', 'Время построения фоновой выгрузки', ['kind', 'format'],
+    buckets=TASK_BUCKETS,
+)
+EXPORT_ROWS = Counter('budget_export_rows_total', 'Строки фоновых выгрузок', ['kind', 'format'])
+TRANSACTIONS_INGESTED = Counter(
+    'budget_transactions_ingested_total', 'Записанные транзакции (rate() - транзакций в секунду)', ['source'],
+)
+
+_task_started = {}
+
+
+def observe_request(record):
+    labels = (record['view'], record['action'])
+    REQUEST_DURATION.labels(*labels, record['method'], str(record['status'])).observe(record['wall_ms'] / 1000)
+    DB_QUERIES.labels(*labels).inc(record['queries'])
+    DB_DUPLICATE_QUERIES.labels(*labels).inc(record['duplicate_queries'])
+    DB_QUERY_SECONDS.labels(*labels).inc(record['db_ms'] / 1000)
+
+
+def task_started(task_id):
+    _task_started[task_id] = time.monotonic()
+
+
+def task_finished(task_id, task_name, outcome):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task_name).observe(time.monotonic() - started)
+    TASKS.labels(task_name, outcome).inc()
+
+
+def transactions_ingested(source, count=1):
+    # Считаются только зафиксированные транзакции
+    if count:
+        transaction.on_commit(lambda: TRANSACTIONS_INGESTED.labels(source).inc(count))
+
+
+class BusinessCollector:
+    """Значения из базы на момент опроса: выгрузки по статусам, превышенные бюджеты, возраст курсов."""
+
+    def collect(self):
+        from .models import Budget, Currency, ExportJob
+
+        jobs = GaugeMetricFamily('budget_export_jobs', 'Фоновые выгрузки по статусу', labels=['status'])
+        counts = dict(ExportJob.objects.values('status').annotate(count=Count('id')).values_list('status', 'count'))
+        for status, _ in ExportJob.STATUS_CHOICES:
+            jobs.add_metric([status], counts.get(status, 0))
+        yield jobs
+
+        yield GaugeMetricFamily(
+            'budget_exceeded_budgets', 'Действующие бюджеты с превышением',
+            value=Budget.objects.active().filter(spent__gt=F('amount')).count(),
+        )
+
+        age = GaugeMetricFamily('budget_currency_rate_age_seconds', 'Сколько секунд курс не обновлялся', labels=['currency'])
+        now = timezone.now()
+        for code, updated_at in Currency.objects.values_list('code', 'updated_at'):
+            age.add_metric([code], (now - updated_at).total_seconds())
+        yield age
+
+
+def render_metrics():
+    """Текст метрик в формате Prometheus: все процессы в режиме multiprocess и значения из базы."""
+    registry = CollectorRegistry()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    # Значения из базы собираются только при опросе, поэтому коллектор не добавляется в общий REGISTRY
+    registry.register(BusinessCollector())
+    return generate_latest(registry)
@@ -0,0 +1,78 @@
+import time
+
+from django.conf import settings
+
+from budget.monitoring import QueryRecorder, finish_request, measured_stream, view_label
+from budget.profiling import ProfileSession, profile_mode
+from budget.rates.snapshot import rate_scope
+
+
+class RateSnapshotMiddleware:
+    """Каждый запрос один раз сверяет версию снимка курсов (budget.rates.snapshot)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with rate_scope():
+            return self.get_response(request)
+
+
+class PerformanceMiddleware:
+    """
+    Замеры каждого запроса: общее время, время и число запросов к базе, повторы SQL,
+    строки и размер ответа. Результат - в журнал budget.performance (JSON), в сводку
+    процесса (budget.monitoring.stats) и в заголовок Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERFORMANCE_MONITORING', True)
+        self.slow_query_ms = getattr(settings, 'SLOW_QUERY_MS', 200)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        recorder = QueryRecorder(self.slow_query_ms, label=request.path)
+        started = time.perf_counter()
+        with recorder.installed():
+            response = self.get_response(request)
+        recorder.label = '{}.{}'.format(*view_label(request))
+
+        if response.streaming:
+            response.streaming_content = measured_stream(response.streaming_content, request, response, recorder, started)
+            return response
+        record = finish_request(request, response, recorder, started, len(response.content))
+        response['Server-Timing'] = f"db;dur={record['db_ms']}, app;dur={record['wall_ms']}"
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запроса администратора по ?profile=cpu или ?profile=sql (budget.profiling).
+    Без параметра - одна проверка строки запроса. Идентификатор профиля - в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if 'profile=' not in request.META.get('QUERY_STRING', ''):
+            return self.get_response(request)
+        mode, user = profile_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        session = ProfileSession(request, mode, user)
+        session.start()
+        try:
+            response = self.get_response(request)
+        except Exception:
+            session.finish(None)
+            raise
+        response['X-Profile-Id'] = str(session.capture.pk)
+        if response.streaming:
+            response.streaming_content = session.stream(response.streaming_content, response)
+        else:
+            session.finish(response)
+        return response
@@ -0,0 +1,56 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def fill_daily_rollup(apps, schema_editor):
+    # Начальное заполнение сводки по уже существующим транзакциям, как командой rebuild_daily_rollup
+    DailyRollup = apps.get_model('budget', 'DailyRollup')
+    Transaction = apps.get_model('budget', 'Transaction')
+    rows = (
+        Transaction.objects.annotate(day=TruncDate('date'))
+        .values('user_id', 'day', 'category_id', 'type', 'currency_id')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create(
+        (
+            DailyRollup(
+                user_id=row['user_id'], date=row['day'], category_id=row['category_id'], type=row['type'],
+                currency_id=row['currency_id'], total=row['total'], count=row['count'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0002_currency_alter_transaction_date_account_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('type', models.CharField(choices=[('income', 'Income'), ('expense', 'Expence')], max_length=7)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='budget.category')),
+                ('currency', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='budget.currency')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'date'], name='budget_rollup_user_date_idx')],
+            },
+        ),
+        migrations.RunPython(fill_daily_rollup, migrations.RunPython.noop),
+    ]
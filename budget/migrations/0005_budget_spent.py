@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-17 11:25
+
+from django.db import migrations, models
+
+
+def fill_budget_spent(apps, schema_editor):
+    # Начальное значение счетчика для уже существующих бюджетов
+    Budget = apps.get_model('budget', 'Budget')
+    Transaction = apps.get_model('budget', 'Transaction')
+    for budget in Budget.objects.all():
+        budget.spent = Transaction.objects.filter(
+            user_id=budget.user_id,
+            category_id=budget.category_id,
+            type='expense',
+            date__date__gte=budget.start_date,
+            date__date__lte=budget.end_date,
+        ).aggregate(total=models.Sum('amount'))['total'] or 0
+        budget.save(update_fields=['spent'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0004_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_budget_spent, migrations.RunPython.noop),
+    ]
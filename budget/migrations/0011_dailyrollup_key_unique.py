@@ -0,0 +1,41 @@
+# Generated by Django 5.1.15 on 2026-10-17 12:31
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_rollups(apps, schema_editor):
+    # Дубликаты ключа (одновременные первые вставки, удаленные категории) сливаются в строку с меньшим id.
+    # GROUP BY объединяет и строки с NULL в категории или валюте
+    DailyRollup = apps.get_model('budget', 'DailyRollup')
+    key_fields = ('user_id', 'date', 'category_id', 'type', 'currency_id')
+    duplicates = (
+        DailyRollup.objects.values(*key_fields)
+        .annotate(rows=models.Count('id'), keep=models.Min('id'), total_sum=models.Sum('total'), count_sum=models.Sum('count'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in duplicates:
+        rows = DailyRollup.objects.filter(**{field: duplicate[field] for field in key_fields})
+        rows.exclude(pk=duplicate['keep']).delete()
+        if duplicate['count_sum'] > 0:
+            rows.filter(pk=duplicate['keep']).update(total=duplicate['total_sum'], count=duplicate['count_sum'])
+        else:
+            rows.filter(pk=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0010_profilecapture'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailyrollup',
+            constraint=models.UniqueConstraint(models.F('user'), models.F('date'), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('category', models.BigIntegerField()), 0), models.F('type'), django.db.models.functions.comparison.Coalesce(django.db.models.functions.comparison.Cast('currency', models.BigIntegerField()), 0), name='budget_rollup_key_unique'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def rebuild_rollups_in_account_currency(apps, schema_editor):
+    # Транзакции без валюты раньше попадали в строки сводки без валюты; теперь они учитываются
+    # в валюте счета. Сводка пересчитывается целиком, как командой rebuild_daily_rollup
+    DailyRollup = apps.get_model('budget', 'DailyRollup')
+    Transaction = apps.get_model('budget', 'Transaction')
+    if not Transaction.objects.filter(currency__isnull=True, account__isnull=False).exists():
+        return
+    DailyRollup.objects.all().delete()
+    rows = (
+        Transaction.objects.annotate(day=TruncDate('date'), rollup_currency=Coalesce('currency', 'account__currency'))
+        .values('user_id', 'day', 'category_id', 'type', 'rollup_currency')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+    DailyRollup.objects.bulk_create(
+        (
+            DailyRollup(
+                user_id=row['user_id'], date=row['day'], category_id=row['category_id'], type=row['type'],
+                currency_id=row['rollup_currency'], total=row['total'], count=row['count'],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0011_dailyrollup_key_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollups_in_account_currency, migrations.RunPython.noop),
+    ]
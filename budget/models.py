@@ -1,7 +1,36 @@
+import uuid
+from datetime import datetime, time, timedelta
 from decimal import Decimal
-from django.db import models
+from pathlib import Path
+
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
-from django.db.models import Sum
+from django.db.models import ExpressionWrapper, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+
+def day_start(day):
+    # Начало дня в текущем часовом поясе, для сравнения с DateTimeField без приведения колонки
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class ClaimsUser(User):
+    """
+    Пользователь, восстановленный из claims JWT без запроса к базе
+    (budget.authentication.StatelessJWTAuthentication). Годится для фильтров
+    и внешних ключей (user=request.user), но не для сохранения: остальных полей в токене нет.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError('Пользователь из токена доступен только для чтения.')
+
+    def delete(self, *args, **kwargs):
+        raise TypeError('Пользователь из токена доступен только для чтения.')
 
 
 class Category(models.Model):
@@ -22,6 +51,25 @@ class Currency(models.Model):
         return f'{self.name} ({self.code})'
 
 
+class CurrencyRate(models.Model):
+    """
+    История курсов: сколько базовых единиц стоит 1 единица валюты на дату
+    (в том же смысле, что Currency.rate_to_base). Заполняется rates.save_rates.
+    """
+    currency = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name='rates')
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=18, decimal_places=8)
+    source = models.CharField(max_length=30, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['currency', 'date'], name='budget_currency_rate_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.currency_id} - {self.date} - {self.rate}'
+
+
 class Account(models.Model):
     ACCOUNT_TYPE_CHOICES = [
         ('cash', 'Наличные'),
@@ -40,9 +88,10 @@ class Account(models.Model):
         return f'{self.name} - {self.user.username} - {self.balance} {self.currency.code}'
 
     def update_balance(self, amount: float):
-        # Обновление остатка на счете
-        self.balance += Decimal(amount)
-        self.save()
+        # Обновление остатка на счете атомарным UPDATE, затем подтягиваем актуальное значение
+        from .services import change_balance
+        change_balance(self.pk, amount)
+        self.refresh_from_db(fields=['balance', 'updated_at'])
 
     def get_transactions(self):
         # Получение транзакций, связанных с этим счетом
@@ -57,38 +106,85 @@ class Transaction(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='transactions')
     type = models.CharField(max_length=7, choices=TRANSACTION_TYPE_CHOICES)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
-    date = models.DateTimeField(auto_now_add=True)
+    date = models.DateTimeField(default=timezone.now)
     description = models.TextField(blank=True, null=True)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     tags = models.ManyToManyField('Tag', blank=True)
     account = models.ForeignKey(Account, related_name='transactions', on_delete=models.SET_NULL, null=True, blank=True)
     currency = models.ForeignKey(Currency, related_name='transactions', on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Список транзакций пользователя и выборки за период
+            models.Index(fields=['user', 'date'], name='budget_tx_user_date_idx'),
+            # Аналитика по доходам/расходам за период
+            models.Index(fields=['user', 'type', 'date'], name='budget_tx_user_type_date_idx'),
+            # Расходы по категории за период (бюджеты, топ категорий)
+            models.Index(
+                fields=['user', 'category', 'date'],
+                condition=models.Q(type='expense'),
+                name='budget_tx_expense_cat_date_idx',
+            ),
+        ]
+
     def __str__(self):
         category_name = self.category.name if self.category else "Без категории"
         return f'{self.account.name} - {category_name} - {self.amount} {self.currency.code} - {self.date}'
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # Если транзакция новая
-            if self.account:  # Обновляем баланс только если указан счет
-                # Получаем конвертированную сумму, если валюты разные
-                converted_amount = self.converted_amount
+        with transaction.atomic():
+            if not self.pk:  # Если транзакция новая
+                if self.account:  # Обновляем баланс только если указан счет
+                    # Получаем конвертированную сумму, если валюты разные
+                    converted_amount = self.converted_amount
 
-                # Обновляем баланс в зависимости от типа транзакции
-                if self.type == 'expense':
-                    self.account.update_balance(-converted_amount)  # Изменяем на сумму расхода
-                elif self.type == 'income':
-                    self.account.update_balance(converted_amount)  # Изменяем на сумму дохода
+                    # Обновляем баланс в зависимости от типа транзакции
+                    if self.type == 'expense':
+                        self.account.update_balance(-converted_amount)  # Изменяем на сумму расхода
+                    elif self.type == 'income':
+                        self.account.update_balance(converted_amount)  # Изменяем на сумму дохода
 
-        super().save(*args, **kwargs)
+            super().save(*args, **kwargs)
 
     @property
     def converted_amount(self):
-        """ Возвращает сумму, конвертированную в валюту счета. """
-        if self.account.currency != self.currency:
-            conversion_rate = self.currency.rate_to_base / self.account.currency.rate_to_base
-            return self.amount * Decimal(conversion_rate)
-        return self.amount  # Если валюта транзакции совпадает с валютой счета
+        """ Возвращает сумму, конвертированную в валюту счета (по снимку курсов, без запросов к Currency). """
+        if self.currency_id is None or self.account.currency_id == self.currency_id:
+            return self.amount  # Если валюта транзакции совпадает с валютой счета
+        from .rates.snapshot import convert_amount
+        return convert_amount(self.amount, self.currency_id, self.account.currency_id)
+
+
+class DailyRollup(models.Model):
+    """
+    Предрасчитанные суммы транзакций за день в разрезе пользователя, категории, типа и валюты
+    (транзакции без своей валюты учитываются в валюте счета).
+    Поддерживается сигналами при изменении транзакций, полностью пересчитывается
+    командой rebuild_daily_rollup. Аналитика читает эту таблицу вместо Transaction.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    type = models.CharField(max_length=7, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+    currency = models.ForeignKey(Currency, on_delete=models.SET_NULL, null=True, blank=True)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date'], name='budget_rollup_user_date_idx'),
+        ]
+        constraints = [
+            # Одна строка на ключ; строки без категории или валюты тоже не дублируются (NULL -> 0)
+            models.UniqueConstraint(
+                'user', 'date', Coalesce(Cast('category', models.BigIntegerField()), 0), 'type',
+                Coalesce(Cast('currency', models.BigIntegerField()), 0),
+                name='budget_rollup_key_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} - {self.date} - {self.type} - {self.total}'
 
 
 class Tag(models.Model):
@@ -118,12 +214,50 @@ class Transfer(models.Model):
             raise ValueError('Нельзя перевести средства между одинаковыми счетами.')
         if self.amount <=0:
             raise ValueError('Сумма перевода должна быть больше нуля.')
-        if self.sender_account.balance < self.amount:
-            raise ValueError('Недостаточно средств на счете отправителя.')
 
-        self.sender_account.update_balance(-self.amount)
-        self.receiver_account.update_balance(self.amount)
-        super().save(*args, **kwargs)
+        from .services import transfer_funds
+        is_new = not self.pk
+        with transaction.atomic():
+            if is_new:
+                # Проверка остатка и списание выполняются под блокировкой счетов
+                transfer_funds(self.sender_account_id, self.receiver_account_id, self.amount)
+            super().save(*args, **kwargs)
+        if is_new:
+            self.sender_account.refresh_from_db(fields=['balance', 'updated_at'])
+            self.receiver_account.refresh_from_db(fields=['balance', 'updated_at'])
+
+
+class BudgetQuerySet(models.QuerySet):
+    def active(self, on_date=None):
+        # Бюджеты, действующие на указанную дату (по умолчанию сегодня)
+        on_date = on_date or timezone.localdate()
+        return self.filter(start_date__lte=on_date, end_date__gte=on_date)
+
+    def with_total_expenses(self):
+        """
+        Добавляет total_expenses - сумму расходов по категории бюджета за его период.
+        Считается коррелированным подзапросом, поэтому весь список бюджетов - один запрос.
+        """
+        expenses = (
+            Transaction.objects.filter(
+                user=OuterRef('user'),
+                category=OuterRef('category'),
+                type='expense',
+                date__gte=OuterRef('start_date'),
+                date__lt=ExpressionWrapper(OuterRef('end_date') + timedelta(days=1), output_field=models.DateField()),
+            )
+            .order_by()
+            .values('user')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        return self.annotate(
+            total_expenses=Coalesce(
+                Subquery(expenses, output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+                Value(Decimal(0)),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            )
+        )
 
 
      #  Бюджет на траты для определенной категории
@@ -133,17 +267,39 @@ class Budget(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     start_date = models.DateField()
     end_date = models.DateField()
+    # Расходы по категории за период; поддерживается по разнице при изменении транзакций (spending.py)
+    spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    objects = BudgetQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'category', 'start_date', 'end_date'], name='budget_budget_period_idx'),
+        ]
 
     def __str__(self):
         return f'{self.category.name} - {self.amount}'
 
+    def save(self, *args, **kwargs):
+        # Категория или период могли измениться, поэтому счетчик расходов пересчитывается целиком
+        if kwargs.get('update_fields') is None:
+            self.spent = self.calculate_spent()
+        super().save(*args, **kwargs)
+
     def get_total_expenses(self):
-        # общая сумма расходов по данной категории
+        # общая сумма расходов по данной категории, если она не посчитана в запросе (with_total_expenses)
+        if hasattr(self, 'total_expenses'):
+            return self.total_expenses
+        return self.calculate_spent()
+
+    def calculate_spent(self):
+        # Сумма расходов по категории за период, посчитанная по транзакциям
         return Transaction.objects.filter(
-            user=self.user,
-            category=self.category,
+            user_id=self.user_id,
+            category_id=self.category_id,
             type='expense',
-            date__range=(self.start_date, self.end_date)
+            date__gte=day_start(self.start_date),
+            date__lt=day_start(self.end_date + timedelta(days=1)),
         ).aggregate(total=Sum('amount'))['total'] or 0
 
     def is_exceeded(self):
@@ -178,6 +334,11 @@ class Loan(models.Model):
     is_settled = models.BooleanField(default=False)
     remaining_amount = models.DecimalField(max_digits=10, decimal_places=2, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['counterparty', 'is_settled'], name='budget_loan_cp_settled_idx'),
+        ]
+
     def __str__(self):
         status= 'Погашен' if self.is_settled else 'Не погашен'
         return f'{self.get_loan_type_display()} - {self.principal_amount} {self.currency.code} ({status}'
@@ -204,29 +365,164 @@ class Loan(models.Model):
         return principal + interest
 
     def make_payment(self, amount, payment_account=None):
-        if self.is_settled:
-            raise ValueError('Данный кредит уже погашен')
-        if amount <= 0:
-            raise ValueError('Сумма погашения должна быть больше 0')
-        if amount > self.remaining_amount:
-            raise ValueError('Сумма погашения превышает оставшуюся задолженность')
-        # Уменьшаем остаток кредита
-        self.remaining_amount -= amount
-        # Обновляем баланс счета, если указан
+        from .services import change_balance, withdraw
+        with transaction.atomic():
+            # Блокируем кредит и берем актуальный остаток, чтобы параллельные платежи не потерялись
+            current = Loan.objects.select_for_update().only('remaining_amount', 'is_settled').get(pk=self.pk)
+            self.remaining_amount, self.is_settled = current.remaining_amount, current.is_settled
+
+            if self.is_settled:
+                raise ValueError('Данный кредит уже погашен')
+            if amount <= 0:
+                raise ValueError('Сумма погашения должна быть больше 0')
+            if amount > self.remaining_amount:
+                raise ValueError('Сумма погашения превышает оставшуюся задолженность')
+            # Уменьшаем остаток кредита
+            self.remaining_amount -= amount
+            # Обновляем баланс счета, если указан
+            if payment_account:
+                if self.loan_type == 'received':
+                    withdraw(payment_account.pk, amount, 'Недостаточно средств на счете для погашения кредита')
+                elif self.loan_type == 'given':
+                    change_balance(payment_account.pk, amount)
+
+            # Проверяем, полностью ли погашен кредит
+            if self.remaining_amount == 0:
+                self.is_settled = True
+
+            self.save(update_fields=['remaining_amount', 'is_settled'])
         if payment_account:
-            if self.loan_type == 'received':
-                if payment_account.balance < amount:
-                    raise ValueError('Недостаточно средств на счете для погашения кредита')
-                payment_account.balance -= amount
-            elif self.loan_type == 'given':
-                payment_account.balance += amount
-                payment_account.save()
-
-        # Проверяем, полностью ли погашен кредит
-        if self.remaining_amount == 0:
-            self.is_settled = True
-
-        self.save()
+            payment_account.refresh_from_db(fields=['balance', 'updated_at'])
 
     def settle(self, payment_account=None):
         self.make_payment(self.remaining_amount, payment_account)
+
+
+class DataVersion(models.Model):
+    """
+    Номер версии данных пользователя. Увеличивается при любом изменении его транзакций,
+    счетов и бюджетов (versioning.bump_data_version), по нему кэшированные отчеты
+    и ответы понимают, что данные не изменились.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='data_version')
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.user_id} - {self.version}'
+
+
+class CatalogVersion(models.Model):
+    """
+    Номер версии общего справочника (категории, теги, валюты). Увеличивается при любом
+    изменении справочника, по нему ответы, включающие его данные, понимают, что он не менялся.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} - {self.version}'
+
+
+class ExportJob(models.Model):
+    """
+    Фоновая выгрузка отчета (CSV или PDF). Файл строится задачей Celery в EXPORT_ROOT
+    и хранится EXPORT_TTL, одинаковые запросы к неизменившимся данным получают готовый файл.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Формируется'),
+        (STATUS_DONE, 'Готово'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    FORMAT_CHOICES = [('csv', 'CSV'), ('pdf', 'PDF')]
+    KIND_CHOICES = [('transactions', 'Все транзакции'), ('analytics', 'Транзакции за период')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    format = models.CharField(max_length=3, choices=FORMAT_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    # Ключ одинаковых запросов: вид, формат и параметры
+    params_key = models.CharField(max_length=64)
+    data_version = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    rows_done = models.PositiveIntegerField(default=0)
+    filename = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'params_key', 'data_version'], name='budget_export_dedup_idx'),
+            models.Index(fields=['expires_at'], name='budget_export_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}.{self.format} - {self.status}'
+
+    @property
+    def progress(self):
+        # Процент готовности, пока количество строк неизвестно - 0
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.rows_total:
+            return 0
+        return min(99, self.rows_done * 100 // self.rows_total)
+
+    @property
+    def artifact_path(self):
+        return Path(settings.EXPORT_ROOT) / str(self.user_id) / f'{self.id}.{self.format}'
+
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+
+
+class ProfileCapture(models.Model):
+    """
+    Профиль одного запроса администратора с ?profile=cpu или ?profile=sql (budget.profiling).
+    Стеки в свернутом формате flame graph (flamegraph.pl, speedscope) и трасса SQL
+    хранятся файлами в PROFILE_ROOT.
+    """
+    MODE_CPU = 'cpu'
+    MODE_SQL = 'sql'
+    MODE_CHOICES = [
+        (MODE_CPU, 'CPU (выборка стеков)'),
+        (MODE_SQL, 'SQL (время запросов по стекам)'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='profile_captures')
+    mode = models.CharField(max_length=3, choices=MODE_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    query_string = models.TextField(blank=True)
+    view = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    duration_ms = models.FloatField(default=0)
+    db_ms = models.FloatField(default=0)
+    queries = models.PositiveIntegerField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.mode} {self.method} {self.path} - {self.duration_ms:.0f} мс'
+
+    @property
+    def stacks_path(self):
+        return Path(settings.PROFILE_ROOT) / f'{self.id}.folded'
+
+    @property
+    def sql_path(self):
+        return Path(settings.PROFILE_ROOT) / f'{self.id}.sql.json'
@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import SLOW_QUERIES, observe_request
+
+logger = logging.getLogger('budget.performance')
+slow_query_logger = logging.getLogger('budget.performance.slow_query')
+
+# Сколько последних длительностей хранить на каждый view для перцентилей
+DURATION_SAMPLES = 500
+STACK_DEPTH = 8
+
+
+def percentile(values, q):
+    """Перцентиль по методу ближайшего ранга (q от 0 до 100)."""
+    ordered = sorted(values)
+    rank = max(1, round(q / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def project_stack():
+    """Последние кадры стека из кода проекта (без библиотек) - откуда выполнен запрос к базе."""
+    root = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(root) and 'site-packages' not in frame.filename
+    ]
+    return [f'{frame.filename[len(root) + 1:]}:{frame.lineno} in {frame.name}' for frame in frames[-STACK_DEPTH:]]
+
+
+class QueryRecorder:
+    """
+    Обертка execute_wrapper: считает запросы одного HTTP-запроса, их время, строки
+    (rowcount драйвера; SQLite для SELECT его не сообщает) и повторы одинакового SQL -
+    признак N+1. Запросы дольше порога пишутся в журнал вместе с SQL и стеком.
+    """
+
+    def __init__(self, slow_query_ms, label=''):
+        self.slow_query_ms = slow_query_ms
+        self.label = label
+        self.count = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.db_time += duration
+            self.statements[sql] += 1
+            rowcount = getattr(context['cursor'], 'rowcount', -1)
+            if rowcount and rowcount > 0:
+                self.rows += rowcount
+            if duration >= self.slow_query_ms:
+                self.sample_slow_query(sql, params, duration)
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    @contextmanager
+    def installed(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def sample_slow_query(self, sql, params, duration):
+        sample = {
+            'view': self.label,
+            'duration_ms': round(duration, 2),
+            'sql': sql,
+            'params': repr(params)[:500],
+            'stack': project_stack(),
+        }
+        stats.add_slow_query(sample)
+        SLOW_QUERIES.labels(self.label).inc()
+        slow_query_logger.warning(json.dumps(sample, ensure_ascii=False), extra={'performance': sample})
+
+
+class PerformanceStats:
+    """Сводка замеров в памяти процесса по view и действию."""
+
+    def __init__(self, slow_query_samples=100):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.slow_queries = deque(maxlen=slow_query_samples)
+
+    def add(self, record):
+        key = (record['view'], record['action'])
+        with self.lock:
+            item = self.views.get(key)
+            if item is None:
+                item = self.views[key] = {
+                    'requests': 0, 'errors': 0, 'wall_ms': 0.0, 'db_ms': 0.0, 'queries': 0,
+                    'duplicate_queries': 0, 'rows': 0, 'response_bytes': 0, 'max_queries': 0,
+                    'durations': deque(maxlen=DURATION_SAMPLES),
+                }
+            item['requests'] += 1
+            item['errors'] += record['status'] >= 500
+            item['wall_ms'] += record['wall_ms']
+            item['db_ms'] += record['db_ms']
+            item['queries'] += record['queries']
+            item['duplicate_queries'] += record['duplicate_queries']
+            item['rows'] += record['rows']
+            item['response_bytes'] += record['response_bytes'] or 0
+            item['max_queries'] = max(item['max_queries'], record['queries'])
+            item['durations'].append(record['wall_ms'])
+
+    def add_slow_query(self, sample):
+        with self.lock:
+            self.slow_queries.append(sample)
+
+    def snapshot(self):
+        with self.lock:
+            views = [
+                {
+                    'view': view, 'action': action,
+                    'requests': item['requests'],
+                    'errors': item['errors'],
+                    'mean_ms': round(item['wall_ms'] / item['requests'], 2),
+                    'p95_ms': round(percentile(item['durations'], 95), 2),
+                    'mean_db_ms': round(item['db_ms'] / item['requests'], 2),
+                    'mean_queries': round(item['queries'] / item['requests'], 2),
+                    'max_queries': item['max_queries'],
+                    'duplicate_queries': item['duplicate_queries'],
+                    'rows': item['rows'],
+                    'response_bytes': item['response_bytes'],
+                }
+                for (view, action), item in self.views.items()
+            ]
+            slow_queries = list(self.slow_queries)
+        views.sort(key=lambda row: row['mean_ms'] * row['requests'], reverse=True)
+        return {'views': views, 'slow_queries': slow_queries}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.slow_queries.clear()
+
+
+stats = PerformanceStats(getattr(settings, 'SLOW_QUERY_SAMPLES', 100))
+
+
+def view_label(request):
+    """(имя маршрута, действие): для ViewSet - действие (list, retrieve, import_csv), иначе HTTP-метод."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved', request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower()) or request.method.lower()
+    return match.view_name or match._func_path, action
+
+
+def finish_request(request, response, recorder, started, response_bytes):
+    view, action = view_label(request)
+    record = {
+        'view': view,
+        'action': action,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'wall_ms': round((time.perf_counter() - started) * 1000, 2),
+        'db_ms': round(recorder.db_time, 2),
+        'queries': recorder.count,
+        'duplicate_queries': recorder.duplicates,
+        'rows': recorder.rows,
+        'response_bytes': response_bytes,
+    }
+    stats.add(record)
+    observe_request(record)
+    logger.info(json.dumps(record, ensure_ascii=False), extra={'performance': record})
+    return record
+
+
+def measured_stream(content, request, response, recorder, started):
+    # Запросы потоковых выгрузок выполняются при чтении ответа, поэтому замер продолжается до конца потока
+    size = 0
+    try:
+        iterator = iter(content)
+        while True:
+            with recorder.installed():
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+            size += len(chunk)
+            yield chunk
+    finally:
+        finish_request(request, response, recorder, started, size)
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация списка транзакций (CursorPagination DRF): курсор хранит значение
+    первого поля сортировки, и следующая страница выбирается условием на это поле, а не
+    OFFSET от начала списка, поэтому стоимость почти не растет с номером страницы.
+    Строки с тем же значением, что и у последней строки страницы, пропускаются смещением
+    внутри этого значения: при сортировке по дате оно мало, при ?ordering=amount и большом
+    числе одинаковых сумм растет.
+    """
+    ordering = ('-date', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_ordering(self, request, queryset, view):
+        # Сортировка из ?ordering= (например, по сумме) не уникальна: без id порядок равных
+        # значений не определен, и строки на границе страниц теряются или повторяются
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[0].startswith('-') else 'id',)
+        return ordering
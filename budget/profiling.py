@@ -0,0 +1,208 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.exceptions import APIException
+
+from .models import ProfileCapture
+
+PROFILE_MODES = (ProfileCapture.MODE_CPU, ProfileCapture.MODE_SQL)
+# Длина SQL в имени кадра flame graph
+SQL_FRAME_LENGTH = 120
+
+
+def frame_name(frame):
+    """Кадр flame graph: функция и файл (от корня проекта или site-packages) со строкой начала функции."""
+    code = frame.f_code
+    filename = code.co_filename
+    root = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(root):
+        filename = filename[len(root):]
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[-1]
+    # ';' разделяет кадры в свернутом формате
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+
+
+def fold(frame):
+    """Стек от корня к frame в свернутом формате: 'a;b;c'."""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Выборочный профилировщик: отдельный поток раз в interval снимает стек потока запроса
+    (sys._current_frames) и считает одинаковые стеки. Сам запрос не замедляется трассировкой.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+                self.samples += 1
+
+
+class SQLTrace:
+    """Обертка execute_wrapper: каждый запрос к базе с параметрами, временем и стеком вызова."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': repr(params)[:500],
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                # Стек без кадра самой обертки
+                'stack': fold(sys._getframe(1)),
+            })
+
+    @property
+    def db_ms(self):
+        return sum(query['duration_ms'] for query in self.queries)
+
+    def folded(self):
+        # Вес стека - время запроса в микросекундах, последний кадр - сам SQL
+        stacks = Counter()
+        for query in self.queries:
+            statement = ' '.join(query['sql'].split())[:SQL_FRAME_LENGTH].replace(';', ',')
+            stacks[f"{query['stack']};SQL {statement}"] += max(1, round(query['duration_ms'] * 1000))
+        return stacks
+
+
+def profile_mode(request):
+    """
+    Режим профилирования запроса или None. Параметр profile учитывается только для администраторов:
+    пользователь сессии или (для API) JWT, проверенный без запроса к базе.
+    """
+    mode = request.GET.get('profile')
+    if mode not in PROFILE_MODES:
+        return None, None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from .authentication import StatelessJWTAuthentication
+        try:
+            result = StatelessJWTAuthentication().authenticate(request)
+        except APIException:
+            result = None
+        user = result[0] if result else None
+    if user is None or not user.is_staff:
+        return None, None
+    return mode, user
+
+
+class ProfileSession:
+    """Профилирование одного запроса: запуск, остановка и сохранение файлов и ProfileCapture."""
+
+    def __init__(self, request, mode, user):
+        self.request = request
+        self.capture = ProfileCapture(
+            user_id=user.pk, mode=mode, method=request.method, path=request.path[:500],
+            query_string=request.META.get('QUERY_STRING', ''),
+        )
+        self.trace = SQLTrace()
+        self.sampler = None
+        self._stack = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.capture.mode == ProfileCapture.MODE_CPU:
+            self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+            self.sampler.start()
+        self.resume()
+
+    def resume(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self.trace))
+
+    def pause(self):
+        self._stack.close()
+
+    def finish(self, response):
+        self.pause()
+        if self.sampler:
+            self.sampler.stop()
+        capture = self.capture
+        capture.duration_ms = round((time.perf_counter() - self._started) * 1000, 2)
+        capture.status_code = response.status_code if response is not None else None
+        match = getattr(self.request, 'resolver_match', None)
+        capture.view = (match.view_name or match._func_path)[:200] if match else ''
+        capture.queries = len(self.trace.queries)
+        capture.db_ms = round(self.trace.db_ms, 2)
+
+        stacks = self.sampler.stacks if self.sampler else self.trace.folded()
+        capture.samples = self.sampler.samples if self.sampler else capture.queries
+        Path(settings.PROFILE_ROOT).mkdir(parents=True, exist_ok=True)
+        with open(capture.stacks_path, 'w', encoding='utf-8') as output:
+            for stack, weight in stacks.most_common():
+                output.write(f'{stack} {weight}\n')
+        with open(capture.sql_path, 'w', encoding='utf-8') as output:
+            json.dump(self.trace.queries, output, ensure_ascii=False, indent=1)
+        capture.save()
+        return capture
+
+    def stream(self, content, response):
+        # Потоковый ответ формируется при чтении, поэтому профиль пишется по окончании потока
+        try:
+            iterator = iter(content)
+            while True:
+                self.resume()
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    self.pause()
+                yield chunk
+        finally:
+            self.resume()
+            self.finish(response)
+
+
+def top_queries(capture, limit=20):
+    """Самые затратные SQL профиля: [(SQL, число выполнений, суммарное время мс)]."""
+    try:
+        with open(capture.sql_path, encoding='utf-8') as source:
+            queries = json.load(source)
+    except (OSError, ValueError):
+        return []
+    totals = {}
+    for query in queries:
+        count, total = totals.get(query['sql'], (0, 0.0))
+        totals[query['sql']] = (count + 1, total + query['duration_ms'])
+    rows = [(sql, count, round(total, 3)) for sql, (count, total) in totals.items()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:limit]
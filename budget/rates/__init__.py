@@ -0,0 +1,4 @@
+"""Курсы валют: история курсов и их загрузка."""
+from .store import rate_as_of, rate_on, save_rate_series, save_rates
+
+__all__ = ['rate_as_of', 'rate_on', 'save_rate_series', 'save_rates']
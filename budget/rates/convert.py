@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce, Round
+
+from budget.models import Currency, CurrencyRate
+
+from .store import rate_as_of
+
+RATE_FIELD = DecimalField(max_digits=18, decimal_places=8)
+MONEY_FIELD = DecimalField(max_digits=20, decimal_places=2)
+
+
+def source_rate(currency_ref='currency', date_ref='date', fallback_ref=None):
+    """
+    Курс валюты строки на ее дату: курс из истории, иначе текущий rate_to_base.
+    Строки без валюты считаются в валюте fallback_ref (для транзакций - валюта счета),
+    а без нее - в базовой валюте (курс 1).
+    """
+    rates = [rate_as_of(currency_ref, date_ref), F(f'{currency_ref}__rate_to_base')]
+    if fallback_ref:
+        rates += [rate_as_of(fallback_ref, date_ref), F(f'{fallback_ref}__rate_to_base')]
+    return Coalesce(*rates, Value(Decimal(1)), output_field=RATE_FIELD)
+
+
+def target_rate(code, date_ref='date'):
+    """Курс валюты отчета code на дату строки; NULL, если такой валюты нет."""
+    return Coalesce(
+        Subquery(
+            CurrencyRate.objects.filter(currency__code=code, date__lte=OuterRef(date_ref))
+            .order_by('-date').values('rate')[:1]
+        ),
+        Subquery(Currency.objects.filter(code=code).values('rate_to_base')[:1]),
+        output_field=RATE_FIELD,
+    )
+
+
+def converted(amount, code, currency_ref='currency', date_ref='date', fallback_ref=None):
+    """
+    Выражение: сумма amount (имя поля) в валюте currency_ref, пересчитанная в валюту code
+    по курсам на дату date_ref. Пересчет идет внутри запроса (подзапросы по индексу
+    (currency, date)), поэтому агрегаты по нему стоят столько же запросов, сколько без пересчета.
+    Строки без валюты считаются в валюте fallback_ref (см. source_rate).
+    Суммы в самой валюте отчета не пересчитываются. Для неизвестной валюты code дает NULL.
+    """
+    same_currency = [When(**{f'{currency_ref}__code': code}, then=F(amount))]
+    if fallback_ref:
+        same_currency.append(When(**{f'{currency_ref}__isnull': True, f'{fallback_ref}__code': code}, then=F(amount)))
+    return Case(
+        *same_currency,
+        default=Round(F(amount) * source_rate(currency_ref, date_ref, fallback_ref) / target_rate(code, date_ref), 2),
+        output_field=MONEY_FIELD,
+    )
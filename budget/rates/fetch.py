@@ -0,0 +1,86 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from ..metrics import RATE_UPDATE_LAST_SUCCESS, RATE_UPDATES
+from .http import get_session
+from .providers import get_providers
+from .store import save_rate_series
+
+logger = logging.getLogger(__name__)
+
+
+def date_range(start, end):
+    """Даты с start по end включительно."""
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def fetch_rates(providers, dates, workers=None, session=None):
+    """
+    Загружает курсы по всем парам (провайдер, дата) параллельно в пуле потоков
+    через общую сессию. Провайдеры без истории запрашиваются один раз - на последнюю дату.
+    Возвращает ({имя провайдера: {дата: {код: курс}}}, [(имя провайдера, дата, ошибка)]).
+    Ошибка одного запроса не прерывает остальные.
+    """
+    session = session or get_session()
+    requests_to_send = [
+        (provider, on_date)
+        for provider in providers
+        for on_date in (dates if provider.supports_history else [max(dates)])
+    ]
+    series, errors = {}, []
+    if not requests_to_send:
+        return series, errors
+
+    workers = min(workers or settings.RATE_FETCH_WORKERS, len(requests_to_send))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(provider.fetch, on_date, session): (provider, on_date)
+            for provider, on_date in requests_to_send
+        }
+        for future in as_completed(futures):
+            provider, on_date = futures[future]
+            try:
+                rate_date, rates = future.result()
+            except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+                logger.warning('Не удалось получить курсы %s на %s: %s', provider.name, on_date, e)
+                errors.append((provider.name, on_date, e))
+                continue
+            series.setdefault(provider.name, {})[rate_date] = rates
+    return series, errors
+
+
+def update_rates(provider_names=None, dates=None, codes=None, workers=None, create_missing=False):
+    """
+    Загружает и сохраняет курсы: по умолчанию - на сегодня от RATE_PROVIDERS.
+    Курсы каждого провайдера сохраняются одним upsert; если на дату курс есть у нескольких
+    провайдеров, остается курс провайдера, указанного раньше. codes ограничивает список валют.
+    Возвращает ({имя провайдера: сохраненные коды}, ошибки fetch_rates).
+    """
+    providers = get_providers(provider_names)
+    series, errors = fetch_rates(providers, dates or [timezone.localdate()], workers=workers)
+    saved = {}
+    for provider in reversed(providers):
+        provider_series = series.get(provider.name)
+        if not provider_series:
+            continue
+        if codes:
+            provider_series = {
+                on_date: {code: rate for code, rate in rates.items() if code in codes}
+                for on_date, rates in provider_series.items()
+            }
+        saved[provider.name] = save_rate_series(provider_series, source=provider.name, create_missing=create_missing)
+
+    failed = {provider_name for provider_name, _, _ in errors}
+    for provider in providers:
+        if provider.name in saved:
+            RATE_UPDATES.labels(provider.name, 'partial' if provider.name in failed else 'success').inc()
+            RATE_UPDATE_LAST_SUCCESS.labels(provider.name).set(time.time())
+        else:
+            RATE_UPDATES.labels(provider.name, 'failure').inc()
+    return saved, errors
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Ответы с ETag/Last-Modified хранятся в кэше, чтобы повторять запрос условным
+CONDITIONAL_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session(pool_size=None, retries=None, backoff=None):
+    """
+    Сессия requests с пулом соединений и повторами: соединения с провайдером переиспользуются,
+    ошибки соединения и ответы RETRY_STATUSES повторяются с экспоненциальной задержкой
+    (учитывая Retry-After).
+    """
+    pool_size = pool_size or settings.RATE_FETCH_WORKERS
+    retry = Retry(
+        total=settings.RATE_FETCH_RETRIES if retries is None else retries,
+        backoff_factor=settings.RATE_FETCH_BACKOFF if backoff is None else backoff,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['Accept'] = 'application/json'
+    return session
+
+
+def get_session():
+    """Общая сессия процесса: один пул соединений на все потоки загрузки."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def _conditional_key(url, params):
+    raw = requests.Request('GET', url, params=params).prepare().url
+    return 'rates:http:' + hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def get_json(url, params=None, session=None, timeout=None):
+    """
+    GET с разбором JSON. Если ответ на тот же запрос уже приходил с ETag или Last-Modified,
+    запрос отправляется условным, и на 304 возвращается сохраненный ответ.
+    Ошибки HTTP (после всех повторов) поднимаются как requests.RequestException.
+    """
+    session = session or get_session()
+    key = _conditional_key(url, params)
+    cached = cache.get(key)
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+    response = session.get(url, params=params, headers=headers, timeout=timeout or settings.RATE_FETCH_TIMEOUT)
+    if response.status_code == 304 and cached:
+        return cached['payload']
+    response.raise_for_status()
+    payload = response.json()
+    etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if etag or last_modified:
+        cache.set(
+            key, {'etag': etag, 'last_modified': last_modified, 'payload': payload}, CONDITIONAL_CACHE_TIMEOUT,
+        )
+    return payload
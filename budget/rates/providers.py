@@ -0,0 +1,81 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .http import get_json
+
+# Базовая валюта приложения: rate_to_base - сколько BYN стоит 1 единица валюты
+BASE_CURRENCY = 'BYN'
+
+
+class RateProvider:
+    """
+    Источник курсов. fetch(on_date, session) возвращает (дата курсов, {код: BYN за 1 единицу}).
+    Адрес API переопределяется через RATE_PROVIDER_URLS (например, на локальную заглушку).
+    """
+    name = ''
+    base_url = ''
+    # Умеет ли источник отдавать курсы на прошедшую дату
+    supports_history = True
+
+    @property
+    def url(self):
+        return settings.RATE_PROVIDER_URLS.get(self.name, self.base_url)
+
+    def fetch(self, on_date, session=None):
+        raise NotImplementedError
+
+
+class NBRBProvider(RateProvider):
+    """Официальные курсы НБРБ, в том числе на прошедшие даты."""
+    name = 'nbrb'
+    base_url = 'https://api.nbrb.by/exrates/rates'
+
+    def fetch(self, on_date, session=None):
+        data = get_json(self.url, {'ondate': on_date.isoformat(), 'periodicity': 0}, session=session)
+        rates = {}
+        for rate_info in data:
+            # Курс указан за Cur_Scale единиц валюты
+            if rate_info.get('Cur_Scale'):
+                rates[rate_info['Cur_Abbreviation']] = (
+                    Decimal(str(rate_info['Cur_OfficialRate'])) / rate_info['Cur_Scale']
+                )
+            if rate_info.get('Date'):
+                on_date = datetime.fromisoformat(rate_info['Date']).date()
+        return on_date, rates
+
+
+class ExchangeRateAPIProvider(RateProvider):
+    """Курсы exchangerate-api относительно USD, пересчитанные к BYN. Только текущие курсы."""
+    name = 'exchangerate-api'
+    base_url = 'https://api.exchangerate-api.com/v4/latest/USD'
+    supports_history = False
+
+    def fetch(self, on_date, session=None):
+        data = get_json(self.url, session=session)
+        quotes = data['rates']  # единиц валюты за 1 USD
+        if not quotes.get(BASE_CURRENCY):
+            raise ValueError(f'В ответе {self.name} нет курса {BASE_CURRENCY}')
+        base = Decimal(str(quotes[BASE_CURRENCY]))
+        if data.get('date'):
+            on_date = date.fromisoformat(data['date'])
+        return on_date, {code: base / Decimal(str(rate)) for code, rate in quotes.items() if rate}
+
+
+PROVIDERS = {
+    NBRBProvider.name: NBRBProvider,
+    ExchangeRateAPIProvider.name: ExchangeRateAPIProvider,
+}
+
+
+def get_provider(name):
+    """Провайдер по имени из PROVIDERS или по пути к классу (для собственных источников)."""
+    provider_class = PROVIDERS.get(name) or import_string(name)
+    return provider_class()
+
+
+def get_providers(names=None):
+    """Провайдеры из списка имен, по умолчанию - RATE_PROVIDERS из настроек."""
+    return [get_provider(name) for name in (names or settings.RATE_PROVIDERS)]
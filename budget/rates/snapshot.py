@@ -0,0 +1,126 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+
+from budget.models import Currency
+from budget.versioning import CATALOG_CURRENCIES, format_stamp, get_catalog_state
+
+_snapshot = None
+_lock = threading.Lock()
+# Отметка уже сверена в текущем запросе или задаче Celery; None - вне запроса и задачи
+_verified = ContextVar('rate_snapshot_verified', default=None)
+
+
+class RateSnapshot:
+    """
+    Неизменяемая таблица текущих курсов (Currency.rate_to_base) для отметки версии
+    справочника валют. Коэффициенты пересчета для пар валют считаются один раз.
+    """
+
+    def __init__(self, stamp, currencies):
+        self.stamp = stamp
+        self.rates = {}
+        self.ids = {}
+        for pk, code, rate in currencies:
+            self.rates[pk] = rate
+            self.ids[code] = pk
+        self._factors = {}
+
+    def factor(self, from_id, to_id):
+        """Коэффициент пересчета суммы из валюты from_id в to_id. KeyError - валюты нет в снимке."""
+        key = (from_id, to_id)
+        factor = self._factors.get(key)
+        if factor is None:
+            if from_id is None or to_id is None or from_id == to_id:
+                factor = Decimal(1)
+            else:
+                from_rate, to_rate = self.rates[from_id], self.rates[to_id]
+                if not from_rate or not to_rate:
+                    raise ValueError(f'Курс для валюты {from_id if not from_rate else to_id} не установлен')
+                # rate_to_base - базовых единиц за 1 единицу валюты
+                factor = from_rate / to_rate
+            self._factors[key] = factor
+        return factor
+
+    def convert(self, amount, from_id, to_id):
+        return Decimal(amount) * self.factor(from_id, to_id)
+
+    def convert_many(self, amounts, from_id, to_id):
+        """Пересчет списка сумм одной пары валют: один поиск коэффициента на весь список."""
+        factor = self.factor(from_id, to_id)
+        return [Decimal(amount) * factor for amount in amounts]
+
+
+def _load(stamp):
+    global _snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.stamp != stamp:
+            _snapshot = RateSnapshot(stamp, Currency.objects.values_list('id', 'code', 'rate_to_base'))
+        return _snapshot
+
+
+def get_rates(stamp=None):
+    """
+    Снимок курсов процесса. Курсы читаются одним запросом и живут, пока не изменится
+    версия справочника валют (ее поднимают сигналы Currency и загрузка курсов), поэтому
+    все воркеры gunicorn и Celery видят одни курсы. Версия сверяется один раз за запрос
+    или задачу (см. rate_scope); stamp - уже прочитанная отметка, тогда сверка бесплатна.
+    Вне запроса и задачи версия сверяется при каждом вызове.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and (snapshot.stamp == stamp or stamp is None and _verified.get()):
+        return snapshot
+    if stamp is None:
+        stamp = format_stamp(get_catalog_state(CATALOG_CURRENCIES))
+    if snapshot is None or snapshot.stamp != stamp:
+        snapshot = _load(stamp)
+    # Вне запроса и задачи (shell, команды управления) сверка не запоминается
+    if _verified.get() is not None:
+        _verified.set(True)
+    return snapshot
+
+
+def request_rates(request):
+    """Снимок курсов для запроса DRF: отметка берется из версий, уже прочитанных для ETag и кэша."""
+    from budget.conditional import request_version_states
+    [state] = request_version_states(request, user_data=False, catalogs=(CATALOG_CURRENCIES,))
+    return get_rates(format_stamp(state))
+
+
+def invalidate():
+    """Сбрасывает снимок процесса; вызывается при изменении курсов в этом процессе."""
+    global _snapshot
+    _snapshot = None
+
+
+def begin_scope():
+    """Начало запроса или задачи: версия курсов будет сверена заново при первом пересчете."""
+    return _verified.set(False)
+
+
+def end_scope(token):
+    """Конец запроса или задачи (token - результат begin_scope): дальше версия сверяется при каждом вызове."""
+    _verified.reset(token)
+
+
+@contextmanager
+def rate_scope():
+    """Пересчеты внутри блока сверяют версию курсов один раз."""
+    token = begin_scope()
+    try:
+        yield
+    finally:
+        _verified.reset(token)
+
+
+def convert_amount(amount, from_id, to_id):
+    """
+    Пересчитывает сумму между валютами по снимку курсов, без запросов к Currency.
+    Если валюты нет в снимке (создана после его загрузки), снимок перечитывается.
+    """
+    try:
+        return get_rates().convert(amount, from_id, to_id)
+    except KeyError:
+        invalidate()
+        return get_rates(format_stamp(get_catalog_state(CATALOG_CURRENCIES))).convert(amount, from_id, to_id)
@@ -0,0 +1,115 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from budget.models import Currency, CurrencyRate
+from budget.versioning import CATALOG_CURRENCIES, bump_catalog_version
+
+from .snapshot import invalidate
+
+# Точность истории курсов и курса на модели Currency
+HISTORY_PRECISION = Decimal('0.00000001')
+CURRENT_PRECISION = Decimal('0.0001')
+
+
+def save_rates(rates, on_date, source='', create_missing=False):
+    """
+    Сохраняет курсы {код: базовых единиц за 1 единицу валюты} на дату on_date.
+    Возвращает коды валют, курсы которых сохранены (см. save_rate_series).
+    """
+    return save_rate_series({on_date: rates}, source=source, create_missing=create_missing)
+
+
+def save_rate_series(series, source='', create_missing=False):
+    """
+    Сохраняет курсы за несколько дат: {дата: {код: базовых единиц за 1 единицу валюты}}.
+
+    История пишется одним bulk_create(update_conflicts=True): повторная загрузка той же даты
+    перезаписывает курс. Курс на Currency обновляется одним UPDATE, только если дата курса -
+    самая поздняя известная для валюты (загрузка прошлых дат не портит текущий курс).
+    Валюты, которых нет в базе, пропускаются или создаются (create_missing).
+    Возвращает коды валют, курсы которых сохранены.
+    """
+    series = {
+        on_date: {code: Decimal(str(rate)) for code, rate in rates.items() if rate}
+        for on_date, rates in series.items()
+    }
+    latest = {}
+    for on_date in sorted(series):
+        for code, rate in series[on_date].items():
+            latest[code] = (on_date, rate)
+    if not latest:
+        return []
+    with transaction.atomic():
+        currency_ids = dict(Currency.objects.filter(code__in=latest).values_list('code', 'id'))
+        missing = [code for code in latest if code not in currency_ids]
+        if create_missing and missing:
+            Currency.objects.bulk_create(
+                [
+                    Currency(code=code, name=code, rate_to_base=latest[code][1].quantize(CURRENT_PRECISION, ROUND_HALF_UP))
+                    for code in missing
+                ],
+                ignore_conflicts=True,
+            )
+            currency_ids = dict(Currency.objects.filter(code__in=latest).values_list('code', 'id'))
+
+        CurrencyRate.objects.bulk_create(
+            [
+                CurrencyRate(
+                    currency_id=currency_ids[code], date=on_date, source=source,
+                    rate=rate.quantize(HISTORY_PRECISION, ROUND_HALF_UP),
+                )
+                for on_date, rates in series.items()
+                for code, rate in rates.items() if code in currency_ids
+            ],
+            update_conflicts=True, unique_fields=['currency', 'date'], update_fields=['rate', 'source'],
+        )
+
+        saved = {currency_ids[code]: latest[code] for code in latest if code in currency_ids}
+        newer = Q()
+        for currency_id, (on_date, rate) in saved.items():
+            newer |= Q(currency_id=currency_id, date__gt=on_date)
+        newer = set(CurrencyRate.objects.filter(newer).values_list('currency_id', flat=True))
+        current = {
+            currency_id: rate.quantize(CURRENT_PRECISION, ROUND_HALF_UP)
+            for currency_id, (on_date, rate) in saved.items() if currency_id not in newer
+        }
+        if current:
+            Currency.objects.filter(pk__in=current).update(
+                rate_to_base=Case(
+                    *[When(pk=pk, then=Value(rate)) for pk, rate in current.items()],
+                    output_field=DecimalField(),
+                ),
+                updated_at=timezone.now(),
+            )
+        # bulk-операции не вызывают сигналы, версию справочника поднимаем сами
+        bump_catalog_version(CATALOG_CURRENCIES)
+    invalidate()
+    return [code for code in latest if code in currency_ids]
+
+
+def rate_on(currency, day):
+    """
+    Курс валюты на дату: последний известный курс не позже day,
+    без истории - текущий Currency.rate_to_base.
+    """
+    rate = (
+        CurrencyRate.objects.filter(currency=currency, date__lte=day)
+        .order_by('-date').values_list('rate', flat=True).first()
+    )
+    return rate if rate is not None else currency.rate_to_base
+
+
+def rate_as_of(currency_ref, date_ref):
+    """
+    Подзапрос «курс на дату» для аннотаций: последний курс валюты currency_ref
+    не позже date_ref (имена полей внешнего запроса). Идет по индексу (currency, date).
+    Если истории нет, возвращает NULL - оберните в Coalesce с rate_to_base.
+    """
+    return Subquery(
+        CurrencyRate.objects.filter(currency=OuterRef(currency_ref), date__lte=OuterRef(date_ref))
+        .order_by('-date').values('rate')[:1],
+        output_field=DecimalField(max_digits=18, decimal_places=8),
+    )
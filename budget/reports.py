@@ -0,0 +1,245 @@
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.timezone import localtime
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from .dates import date_window, parse_timezone
+from .exports import EXPORT_CHUNK_SIZE, iter_csv_rows
+from .models import Transaction
+
+FONT_NAME = 'DejaVuSans'
+FONT_PATH = Path(settings.BASE_DIR) / 'static' / 'fonts' / 'DejaVuSans.ttf'
+
+FONT_SIZE = 9
+TITLE_FONT_SIZE = 12
+LINE_HEIGHT = 14
+MARGIN = 40
+
+TYPE_LABELS = {'income': 'Доход', 'expense': 'Расход'}
+
+
+def register_fonts():
+    """Регистрирует шрифт с кириллицей один раз на процесс."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+def fit_text(text, width, font_size=FONT_SIZE):
+    """Обрезает текст так, чтобы он поместился в колонку шириной width."""
+    if pdfmetrics.stringWidth(text, FONT_NAME, font_size) <= width:
+        return text
+    while text and pdfmetrics.stringWidth(text + '…', FONT_NAME, font_size) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+class PDFReport:
+    """
+    Постраничный PDF-отчет по транзакциям.
+
+    columns - список (заголовок, поле ORM, форматирование или None, ширина колонки).
+    Объект хранит состояние разметки, поэтому на каждый отчет создается новый.
+    Строки читаются из БД пачками через iterator(), поэтому память не зависит от размера
+    выборки. На каждой странице печатаются заголовок отчета, шапка таблицы и номер страницы,
+    в конце - итоги по доходам и расходам.
+    """
+
+    def __init__(self, columns, title, pagesize=letter):
+        self.columns = columns
+        self.title = title
+        self.pagesize = pagesize
+
+    def render(self, queryset, output, progress=None):
+        register_fonts()
+        fields = [field for _, field, _, _ in self.columns]
+        # Тип и сумма нужны для итогов, даже если их нет среди колонок
+        rows = queryset.values_list('type', 'amount', *fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+        self.pdf = canvas.Canvas(output, pagesize=self.pagesize)
+        self.page = 0
+        self.start_page()
+        totals = {'income': Decimal(0), 'expense': Decimal(0)}
+        count = 0
+        for transaction_type, amount, *values in rows:
+            if self.y < MARGIN + LINE_HEIGHT:
+                self.finish_page()
+                self.start_page()
+            self.draw_row(values)
+            totals[transaction_type] = totals.get(transaction_type, Decimal(0)) + amount
+            count += 1
+            if progress and count % EXPORT_CHUNK_SIZE == 0:
+                progress(count)
+        self.draw_totals(count, totals)
+        self.finish_page()
+        self.pdf.save()
+        if progress:
+            progress(count)
+        return count
+
+    def start_page(self):
+        width, height = self.pagesize
+        self.page += 1
+        self.y = height - MARGIN
+        self.pdf.setFont(FONT_NAME, TITLE_FONT_SIZE)
+        self.pdf.drawString(MARGIN, self.y, self.title)
+        self.y -= LINE_HEIGHT * 2
+        self.pdf.setFont(FONT_NAME, FONT_SIZE)
+        self.draw_cells([header for header, _, _, _ in self.columns])
+        self.pdf.line(MARGIN, self.y + LINE_HEIGHT - 4, width - MARGIN, self.y + LINE_HEIGHT - 4)
+
+    def finish_page(self):
+        width, _ = self.pagesize
+        self.pdf.setFont(FONT_NAME, FONT_SIZE)
+        self.pdf.drawRightString(width - MARGIN, MARGIN / 2, f'Стр. {self.page}')
+        self.pdf.showPage()
+
+    def draw_row(self, values):
+        self.draw_cells([
+            formatter(value) if formatter else str(value)
+            for (_, _, formatter, _), value in zip(self.columns, values)
+        ])
+
+    def draw_cells(self, texts):
+        x = MARGIN
+        for (_, _, _, column_width), text in zip(self.columns, texts):
+            self.pdf.drawString(x, self.y, fit_text(text, column_width - 4))
+            x += column_width
+        self.y -= LINE_HEIGHT
+
+    def draw_totals(self, count, totals):
+        lines = [
+            f'Всего транзакций: {count}',
+            f'Доходы: {totals["income"]}',
+            f'Расходы: {totals["expense"]}',
+            f'Итого: {totals["income"] - totals["expense"]}',
+        ]
+        if self.y < MARGIN + LINE_HEIGHT * (len(lines) + 1):
+            self.finish_page()
+            self.start_page()
+        self.y -= LINE_HEIGHT
+        for line in lines:
+            self.pdf.drawString(MARGIN, self.y, line)
+            self.y -= LINE_HEIGHT
+
+
+def local_time(pattern, tz=None):
+    """Форматирование даты транзакции: локальное время в поясе tz (None - пояс сервера)."""
+    return lambda date: localtime(date, tz).strftime(pattern)
+
+
+# Колонки отчетов строятся для пояса tz периода: дата строки печатается в том же поясе,
+# в котором по ней отобраны строки (см. DateWindow)
+# PDF: (заголовок, поле, форматирование, ширина)
+def transactions_pdf_columns(tz=None):
+    return [
+        ('Дата', 'date', local_time('%Y-%m-%d', tz), 70),
+        ('Категория', 'category__name', lambda name: name or '', 120),
+        ('Сумма', 'amount', None, 70),
+        ('Тип', 'type', lambda transaction_type: TYPE_LABELS.get(transaction_type, transaction_type), 50),
+        ('Описание', 'description', lambda description: description or '', 222),
+    ]
+
+
+def analytics_pdf_columns(tz=None):
+    return [
+        ('Дата', 'date', local_time('%Y-%m-%d %H:%M', tz), 85),
+        ('Тип', 'type', lambda transaction_type: TYPE_LABELS.get(transaction_type, transaction_type), 50),
+        ('Категория', 'category__name', lambda name: name or 'Без категории', 100),
+        ('Описание', 'description', lambda description: description or '-', 140),
+        ('Сумма', 'amount', None, 65),
+        ('Счет', 'account__name', lambda name: name or 'Не указан', 92),
+    ]
+
+
+# CSV: (заголовок, поле, форматирование)
+def transactions_csv_columns(tz=None):
+    # Дата выгружается как есть, с часовым поясом: файл читается обратно импортом
+    return [
+        ('Дата', 'date', None),
+        ('Категория', 'category__name', lambda name: name or ''),
+        ('Сумма', 'amount', None),
+        ('Тип', 'type', None),
+        ('Описание', 'description', lambda description: description or ''),
+    ]
+
+
+def analytics_csv_columns(tz=None):
+    return [
+        ('Дата', 'date', local_time('%Y-%m-%d %H:%M:%S', tz)),
+        ('Тип', 'type', None),
+        ('Категория', 'category__name', lambda name: name or "Без категории"),
+        ('Сумма', 'amount', None),
+        ('Описание', 'description', lambda description: description or "_"),
+    ]
+
+
+def transactions_source(user, params):
+    """Все транзакции пользователя (TransactionViewSet.export_csv / export_pdf)."""
+    queryset = Transaction.objects.filter(user=user).order_by('date', 'id')
+    return queryset, 'Отчет по транзакциям', 'transactions'
+
+
+def analytics_source(user, params):
+    """Транзакции за период (ExportCSVView / ExportPDFView)."""
+    start_date, end_date = params['start_date'], params['end_date']
+    window = date_window(start_date, end_date, params.get('tz'))
+    queryset = Transaction.objects.filter(user=user, **window.lookups()).order_by('date', 'id')
+    return queryset, f'Аналитика за период: {start_date} - {end_date}', f'analytics_{start_date}_to_{end_date}'
+
+
+# Отчеты по имени: источник строк, колонки PDF и колонки/разделитель CSV.
+# По имени и JSON-параметрам задача Celery строит тот же отчет, что и синхронный запрос.
+REPORTS = {
+    'transactions': (transactions_source, transactions_pdf_columns, transactions_csv_columns, ','),
+    'analytics': (analytics_source, analytics_pdf_columns, analytics_csv_columns, ';'),
+}
+
+
+def report_source(kind, user, params):
+    """Возвращает (queryset, заголовок, имя файла без расширения) для отчета kind."""
+    source = REPORTS[kind][0]
+    return source(user, params)
+
+
+def report_timezone(params):
+    """Часовой пояс периода отчета из его параметров; None - пояс сервера."""
+    return parse_timezone(params.get('tz'))
+
+
+def write_report(kind, export_format, queryset, title, output, progress=None, tz=None):
+    """
+    Записывает отчет в бинарный файл output в формате csv или pdf, даты - в поясе tz.
+    progress(строк_записано) вызывается после каждой пачки строк.
+    """
+    _, pdf_columns, csv_columns, delimiter = REPORTS[kind]
+    if export_format == 'pdf':
+        PDFReport(pdf_columns(tz), title).render(queryset, output, progress=progress)
+        return
+    for chunk in iter_csv_rows(queryset, csv_columns(tz), delimiter=delimiter, progress=progress):
+        output.write(chunk.encode('utf-8'))
+
+
+def pdf_report_response(kind, user, params):
+    """
+    Отдает PDF-отчет. Небольшие отчеты строятся сразу в ответ на запрос, а отчеты больше
+    PDF_SYNC_MAX_ROWS строк оформляются фоновой выгрузкой (ExportJob), чтобы не занимать
+    веб-воркер: клиент получает 202 и ссылку для проверки готовности.
+    """
+    queryset, title, basename = report_source(kind, user, params)
+    if queryset.count() > settings.PDF_SYNC_MAX_ROWS:
+        from .export_jobs import export_job_response, submit_export
+        job, _ = submit_export(user, kind, 'pdf', params)
+        return export_job_response(job)
+
+    buffer = BytesIO()
+    write_report(kind, 'pdf', queryset, title, buffer, tz=report_timezone(params))
+    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="{basename}.pdf"'
+    return response
@@ -0,0 +1,206 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils.timezone import localdate
+
+from .models import DailyRollup, Transaction
+
+# Поля транзакции, от которых зависит строка сводной таблицы
+ROLLUP_FIELDS = ('user_id', 'date', 'category_id', 'type', 'currency_id', 'amount')
+
+# Размер пачки при полном пересчете
+REBUILD_BATCH_SIZE = 5000
+
+
+def rollup_key(user_id, date, category_id, transaction_type, currency_id):
+    """Ключ строки сводной таблицы: (пользователь, день, категория, тип, валюта)."""
+    return user_id, localdate(date), category_id, transaction_type, currency_id
+
+
+def transaction_state(instance):
+    """
+    Снимок полей транзакции, влияющих на сводную таблицу. Транзакция без валюты
+    учитывается в валюте счета, как в Transaction.converted_amount.
+    """
+    state = {field: getattr(instance, field) for field in ROLLUP_FIELDS}
+    if state['currency_id'] is None and instance.account_id:
+        state['currency_id'] = instance.account.currency_id
+    return state
+
+
+def stored_transaction_state(pk):
+    """Снимок транзакции в том виде, в каком она сохранена в базе (один запрос); None, если ее нет."""
+    state = (
+        Transaction.objects.filter(pk=pk)
+        .values(*ROLLUP_FIELDS, account_currency_id=F('account__currency'))
+        .first()
+    )
+    if state is not None:
+        account_currency_id = state.pop('account_currency_id')
+        if state['currency_id'] is None:
+            state['currency_id'] = account_currency_id
+    return state
+
+
+class RollupDelta:
+    """
+    Накопитель изменений сводной таблицы. Вклад транзакции добавляется через add(),
+    снимается через remove(), а apply() записывает итог в БД.
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(lambda: [Decimal(0), 0])
+
+    def add(self, state, sign=1):
+        key = rollup_key(
+            state['user_id'], state['date'], state['category_id'], state['type'], state['currency_id']
+        )
+        change = self.changes[key]
+        change[0] += sign * Decimal(state['amount'])
+        change[1] += sign
+
+    def remove(self, state):
+        self.add(state, sign=-1)
+
+    def apply(self):
+        changes = {key: change for key, change in self.changes.items() if change[0] or change[1]}
+        if changes:
+            apply_rollup_changes(changes)
+        self.changes.clear()
+
+
+def apply_rollup_changes(changes):
+    """
+    Применяет изменения {ключ: [сумма, количество]} к сводной таблице.
+    Независимо от количества ключей выполняется не больше четырех запросов:
+    выборка существующих строк с блокировкой, bulk_update, bulk_create и удаление опустевших строк.
+    Ключ уникален (budget_rollup_key_unique): если строку с тем же ключом одновременно создал
+    другой запрос, изменения применяются повторно и на этот раз она находится под блокировкой.
+    Вставка с ON CONFLICT не подходит: к строке нужно прибавить разницу, а не заменить значения.
+    """
+    try:
+        with transaction.atomic():
+            _apply_rollup_changes(changes)
+    except IntegrityError:
+        with transaction.atomic():
+            _apply_rollup_changes(changes)
+
+
+def _apply_rollup_changes(changes):
+    user_ids = {key[0] for key in changes}
+    dates = {key[1] for key in changes}
+    existing = {
+        (row.user_id, row.date, row.category_id, row.type, row.currency_id): row
+        for row in DailyRollup.objects.select_for_update().filter(user_id__in=user_ids, date__in=dates)
+    }
+
+    to_update, to_create, to_delete = [], [], []
+    for key, (amount, count) in changes.items():
+        row = existing.get(key)
+        if row is None:
+            if count > 0:
+                user_id, date, category_id, transaction_type, currency_id = key
+                to_create.append(DailyRollup(
+                    user_id=user_id, date=date, category_id=category_id, type=transaction_type,
+                    currency_id=currency_id, total=amount, count=count,
+                ))
+            continue
+        row.total += amount
+        row.count += count
+        if row.count <= 0:
+            to_delete.append(row.pk)
+        else:
+            to_update.append(row)
+
+    if to_update:
+        DailyRollup.objects.bulk_update(to_update, ['total', 'count'])
+    if to_create:
+        DailyRollup.objects.bulk_create(to_create)
+    if to_delete:
+        DailyRollup.objects.filter(pk__in=to_delete).delete()
+
+
+def merge_rollups_without(field, value):
+    """
+    Перед удалением категории (field='category_id') или валюты (field='currency_id') переносит
+    ее строки сводной таблицы в строки без нее - так же, как SET_NULL у транзакций, -
+    чтобы у объединенного ключа осталась одна строка.
+    """
+    with transaction.atomic():
+        rows = list(DailyRollup.objects.select_for_update().filter(**{field: value}))
+        if not rows:
+            return
+        changes = defaultdict(lambda: [Decimal(0), 0])
+        for row in rows:
+            key = {
+                'user_id': row.user_id, 'date': row.date, 'category_id': row.category_id,
+                'type': row.type, 'currency_id': row.currency_id, field: None,
+            }
+            change = changes[(key['user_id'], key['date'], key['category_id'], key['type'], key['currency_id'])]
+            change[0] += row.total
+            change[1] += row.count
+        DailyRollup.objects.filter(pk__in=[row.pk for row in rows]).delete()
+        apply_rollup_changes(changes)
+
+
+def move_rollup_currency(transactions, old_currency, new_currency):
+    """
+    Переносит вклад транзакций transactions из строк сводки с валютой old_currency в строки
+    с валютой new_currency (выражения). Вызывается перед SET_NULL, который меняет действующую
+    валюту транзакций: при удалении валюты (остается валюта счета) или счета (валюты не остается).
+    """
+    rows = (
+        transactions.annotate(day=TruncDate('date'), old_currency=old_currency, new_currency=new_currency)
+        .values('user_id', 'day', 'category_id', 'type', 'old_currency', 'new_currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    changes = defaultdict(lambda: [Decimal(0), 0])
+    for row in rows:
+        if row['old_currency'] == row['new_currency']:
+            continue
+        for currency_id, sign in ((row['old_currency'], -1), (row['new_currency'], 1)):
+            change = changes[(row['user_id'], row['day'], row['category_id'], row['type'], currency_id)]
+            change[0] += sign * row['total']
+            change[1] += sign * row['count']
+    if changes:
+        apply_rollup_changes(changes)
+
+
+def rebuild_daily_rollup(user=None):
+    """
+    Полностью пересчитывает сводную таблицу (для всех пользователей или одного).
+    Возвращает количество созданных строк.
+    """
+    transactions = Transaction.objects.all()
+    rollups = DailyRollup.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    rows = (
+        transactions.annotate(day=TruncDate('date'), rollup_currency=Coalesce('currency', 'account__currency'))
+        .values('user_id', 'day', 'category_id', 'type', 'rollup_currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    created = 0
+    with transaction.atomic():
+        rollups.delete()
+        batch = []
+        for row in rows.iterator(chunk_size=REBUILD_BATCH_SIZE):
+            batch.append(DailyRollup(
+                user_id=row['user_id'], date=row['day'], category_id=row['category_id'], type=row['type'],
+                currency_id=row['rollup_currency'], total=row['total'], count=row['count'],
+            ))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                DailyRollup.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            DailyRollup.objects.bulk_create(batch)
+            created += len(batch)
+    return created
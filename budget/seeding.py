@@ -0,0 +1,343 @@
+import csv
+import io
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import (
+    Account, Budget, Category, Counterparty, Currency, DailyRollup, DataVersion, ExportJob, Loan, Tag, Transaction,
+    Transfer,
+)
+from .rates import save_rate_series
+from .rollups import rebuild_daily_rollup
+from .versioning import bump_data_version
+
+# Пользователи тестовых данных узнаются по префиксу имени и входят с общим паролем
+BENCHMARK_USER_PREFIX = 'bench_'
+BENCHMARK_PASSWORD = 'bench-password'
+
+# Код, название, курс к BYN
+CURRENCIES = [
+    ('BYN', 'Белорусский рубль', Decimal('1')),
+    ('USD', 'Доллар США', Decimal('3.2735')),
+    ('EUR', 'Евро', Decimal('3.3912')),
+    ('RUB', 'Российский рубль', Decimal('0.0316')),
+]
+# Название, описание, относительная частота расходов (категории из cat.txt и несколько частых)
+EXPENSE_CATEGORIES = [
+    ('Продукты', 'Еда, напитки, магазины', 40),
+    ('Транспорт', 'Общественный транспорт, такси, бензин', 20),
+    ('Развлечения', 'Кино, театр, концерты', 10),
+    ('Жилье', 'Аренда, коммунальные услуги', 5),
+    ('Здоровье', 'Аптеки, врачи', 8),
+    ('Одежда', 'Одежда и обувь', 7),
+    ('Кафе', 'Кафе и рестораны', 10),
+]
+INCOME_CATEGORIES = [
+    ('Зарплата', 'Основной источник дохода', 8),
+    ('Фриланс', 'Доходы от проектов на стороне', 2),
+]
+TAGS = ['семья', 'работа', 'отпуск', 'подарок', 'онлайн', 'наличные', 'кэшбэк', 'подписка', 'авто', 'дети']
+DESCRIPTIONS = ['Покупка', 'Оплата', 'Магазин у дома', 'Супермаркет', 'Заказ', 'Платеж', 'Перевод', 'Поездка']
+
+# Доля доходов и параметры сумм: расходы - логнормальные (в среднем ~37), доходы - крупные и редкие,
+# чтобы остатки счетов в среднем не уходили в минус и не переполняли поле
+INCOME_SHARE = 0.03
+EXPENSE_MU, EXPENSE_SIGMA = 3.2, 0.9
+INCOME_MEAN, INCOME_SPREAD = 1200, 300
+TAGGED_SHARE = 0.3
+INITIAL_BALANCE = Decimal('5000.00')
+
+TRANSACTION_COLUMNS = ('user_id', 'type', 'amount', 'date', 'description', 'category_id', 'account_id', 'currency_id')
+
+
+def benchmark_users():
+    return User.objects.filter(username__startswith=BENCHMARK_USER_PREFIX)
+
+
+def copy_rows(model, columns, rows):
+    """
+    Вставка строк через COPY FROM STDIN (PostgreSQL, psycopg2 или psycopg 3) -
+    на порядок быстрее INSERT. rows - кортежи значений в порядке columns.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        quote(model._meta.db_table), ', '.join(quote(column) for column in columns),
+    )
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            raw.copy_expert(sql, buffer)
+        else:
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def insert_rows(model, columns, rows, batch_size):
+    """Вставка без сигналов и save(): COPY на PostgreSQL, иначе bulk_create."""
+    if connection.vendor == 'postgresql':
+        copy_rows(model, columns, rows)
+    else:
+        model.objects.bulk_create(
+            [model(**dict(zip(columns, row))) for row in rows], batch_size=batch_size,
+        )
+
+
+class BenchmarkSeeder:
+    """
+    Генератор воспроизводимых тестовых данных (фиксированный seed): пользователи, счета
+    в нескольких валютах, категории, теги, бюджеты, долги и транзакции. Число транзакций
+    у пользователей распределено неравномерно (по Парето), поэтому в одной базе есть
+    и небольшие, и очень большие объемы данных. Транзакции пишутся пачками через COPY
+    (или bulk_create), затем одним проходом пересчитываются остатки счетов, дневные сводки,
+    расходы бюджетов и версии данных. Все даты отсчитываются назад от дня end_date
+    (по умолчанию сегодня): с тем же seed и end_date данные совпадают в любой день.
+    """
+
+    def __init__(self, users=50, transactions=100_000, days=730, seed=42, batch_size=10_000, log=None, end_date=None):
+        self.users = users
+        self.transactions = transactions
+        self.days = days
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.log = log or (lambda message: None)
+        self.end_date = end_date or timezone.localdate()
+        self.now = timezone.make_aware(datetime.combine(self.end_date, time(23, 59, 59)))
+
+    def run(self):
+        with transaction.atomic():
+            currencies = self.seed_currencies()
+            expense_categories, income_categories = self.seed_categories()
+            tag_ids = self.seed_tags()
+            users = self.seed_users()
+            accounts = self.seed_accounts(users, currencies)
+            self.seed_loans(users, accounts)
+            self.seed_budgets(users, expense_categories)
+
+        created = 0
+        for user, count in zip(users, self.transaction_counts()):
+            with transaction.atomic():
+                created += self.seed_transactions(
+                    user, accounts[user.pk], expense_categories, income_categories, tag_ids, count,
+                )
+            self.log(f'{user.username}: {count} транзакций')
+
+        self.log('Пересчет остатков, дневных сводок и бюджетов...')
+        with transaction.atomic():
+            self.update_balances(users)
+            rebuild_daily_rollup()
+            self.update_budgets(users)
+            for user in users:
+                bump_data_version(user.pk)
+        return {'users': len(users), 'transactions': created}
+
+    def transaction_counts(self):
+        weights = [self.random.paretovariate(1.2) for _ in range(self.users)]
+        total = sum(weights)
+        return [max(1, round(self.transactions * weight / total)) for weight in weights]
+
+    def seed_currencies(self):
+        existing = dict(Currency.objects.values_list('code', 'id'))
+        Currency.objects.bulk_create([
+            Currency(code=code, name=name, rate_to_base=rate)
+            for code, name, rate in CURRENCIES if code not in existing
+        ])
+        # История курсов за весь период: случайное блуждание вокруг текущего курса
+        series = {}
+        rates = {code: rate for code, _, rate in CURRENCIES if code != 'BYN'}
+        for offset in range(self.days, -1, -1):
+            day = self.end_date - timedelta(days=offset)
+            rates = {
+                code: (rate * Decimal(1 + self.random.uniform(-0.004, 0.004))).quantize(Decimal('0.00000001'))
+                for code, rate in rates.items()
+            }
+            series[day] = rates
+        save_rate_series(series, source='benchmark')
+        return list(Currency.objects.filter(code__in=[code for code, _, _ in CURRENCIES]).values_list('id', flat=True))
+
+    def seed_categories(self):
+        names = {name: description for name, description, _ in EXPENSE_CATEGORIES + INCOME_CATEGORIES}
+        existing = set(Category.objects.filter(name__in=names).values_list('name', flat=True))
+        Category.objects.bulk_create([
+            Category(name=name, description=description) for name, description in names.items() if name not in existing
+        ])
+        ids = {}
+        for category_id, name in Category.objects.filter(name__in=names).order_by('id').values_list('id', 'name'):
+            ids.setdefault(name, category_id)
+        expense = [(ids[name], weight) for name, _, weight in EXPENSE_CATEGORIES]
+        income = [(ids[name], weight) for name, _, weight in INCOME_CATEGORIES]
+        return expense, income
+
+    def seed_tags(self):
+        Tag.objects.bulk_create([Tag(name=name) for name in TAGS], ignore_conflicts=True)
+        return list(Tag.objects.filter(name__in=TAGS).values_list('id', flat=True))
+
+    def seed_users(self):
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password(BENCHMARK_PASSWORD)
+        start = benchmark_users().count()
+        User.objects.bulk_create([
+            User(
+                username=f'{BENCHMARK_USER_PREFIX}{number:05d}', email=f'{BENCHMARK_USER_PREFIX}{number:05d}@example.com',
+                password=password,
+            )
+            for number in range(start, start + self.users)
+        ])
+        return list(benchmark_users().order_by('id')[start:start + self.users])
+
+    def seed_accounts(self, users, currencies):
+        base = currencies[0]
+        items = []
+        for user in users:
+            # Основной счет в BYN и 1-3 счета в других валютах
+            account_currencies = [base] + self.random.sample(currencies[1:], self.random.randint(1, len(currencies) - 1))
+            for number, currency_id in enumerate(account_currencies):
+                items.append(Account(
+                    user=user, name=f'Счет {number + 1}', account_type=self.random.choice(['cash', 'card', 'e_wallet']),
+                    currency_id=currency_id, balance=INITIAL_BALANCE,
+                ))
+        Account.objects.bulk_create(items)
+        accounts = {}
+        for account_id, user_id, currency_id in (
+            Account.objects.filter(user__in=users).order_by('id').values_list('id', 'user_id', 'currency_id')
+        ):
+            accounts.setdefault(user_id, []).append((account_id, currency_id))
+        return accounts
+
+    def seed_loans(self, users, accounts):
+        Counterparty.objects.bulk_create([
+            Counterparty(user=user, name=f'Контрагент {number + 1}')
+            for user in users for number in range(self.random.randint(0, 3))
+        ])
+        loans = []
+        for counterparty in Counterparty.objects.filter(user__in=users):
+            account_id, currency_id = self.random.choice(accounts[counterparty.user_id])
+            issued = self.end_date - timedelta(days=self.random.randint(30, self.days))
+            loan = Loan(
+                user_id=counterparty.user_id, counterparty=counterparty,
+                loan_type=self.random.choice(['given', 'received']),
+                principal_amount=Decimal(self.random.randint(100, 5000)),
+                interest_rate=Decimal(self.random.choice([0, 5, 10, 15])),
+                currency_id=currency_id, account_id=account_id,
+                date_issued=issued, due_date=issued + timedelta(days=self.random.randint(30, 720)),
+            )
+            loan.remaining_amount = loan.total_due.quantize(Decimal('0.01'))
+            loans.append(loan)
+        Loan.objects.bulk_create(loans)
+
+    def seed_budgets(self, users, expense_categories):
+        month_start = self.end_date.replace(day=1)
+        Budget.objects.bulk_create([
+            Budget(
+                user=user, category_id=category_id, amount=Decimal(self.random.randint(100, 1500)),
+                start_date=month_start, end_date=month_start + timedelta(days=30),
+            )
+            for user in users
+            for category_id, _ in self.random.sample(expense_categories, 3)
+        ])
+
+    def seed_transactions(self, user, accounts, expense_categories, income_categories, tag_ids, count):
+        expense_ids, expense_weights = zip(*expense_categories)
+        income_ids, income_weights = zip(*income_categories)
+        last_id = Transaction.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        period = self.days * 24 * 60 * 60
+        created = 0
+        while created < count:
+            rows = []
+            for _ in range(min(self.batch_size, count - created)):
+                account_id, currency_id = self.random.choice(accounts)
+                if self.random.random() < INCOME_SHARE:
+                    kind = 'income'
+                    category_id = self.random.choices(income_ids, income_weights)[0]
+                    amount = max(self.random.gauss(INCOME_MEAN, INCOME_SPREAD), 100)
+                else:
+                    kind = 'expense'
+                    category_id = self.random.choices(expense_ids, expense_weights)[0]
+                    amount = min(self.random.lognormvariate(EXPENSE_MU, EXPENSE_SIGMA), 5000)
+                date = self.now - timedelta(seconds=self.random.randrange(period))
+                rows.append((
+                    user.pk, kind, Decimal(amount).quantize(Decimal('0.01')), date.isoformat(),
+                    f'{self.random.choice(DESCRIPTIONS)} #{self.random.randint(1, 9999)}',
+                    category_id, account_id, currency_id,
+                ))
+            insert_rows(Transaction, TRANSACTION_COLUMNS, rows, self.batch_size)
+            created += len(rows)
+
+        # Теги для части транзакций: id новых строк известны только после вставки
+        tag_rows = []
+        new_ids = Transaction.objects.filter(user=user, id__gt=last_id).values_list('id', flat=True)
+        for transaction_id in new_ids.iterator(chunk_size=self.batch_size):
+            if self.random.random() < TAGGED_SHARE:
+                for tag_id in self.random.sample(tag_ids, self.random.randint(1, 2)):
+                    tag_rows.append((transaction_id, tag_id))
+            if len(tag_rows) >= self.batch_size:
+                insert_rows(Transaction.tags.through, ('transaction_id', 'tag_id'), tag_rows, self.batch_size)
+                tag_rows = []
+        if tag_rows:
+            insert_rows(Transaction.tags.through, ('transaction_id', 'tag_id'), tag_rows, self.batch_size)
+        return created
+
+    def update_balances(self, users):
+        # Транзакции сгенерированы в валюте счета, поэтому остаток - начальный плюс сумма движений
+        movements = (
+            Transaction.objects.filter(account=OuterRef('pk'))
+            .order_by().values('account')
+            .annotate(total=Sum(Case(
+                When(type='income', then=F('amount')),
+                default=-F('amount'),
+                output_field=DecimalField(),
+            )))
+            .values('total')
+        )
+        Account.objects.filter(user__in=users).update(
+            balance=F('balance') + Coalesce(Subquery(movements), Value(Decimal(0)), output_field=DecimalField()),
+        )
+
+    def update_budgets(self, users):
+        budgets = list(Budget.objects.filter(user__in=users).with_total_expenses())
+        for budget in budgets:
+            budget.spent = budget.total_expenses
+        Budget.objects.bulk_update(budgets, ['spent'], batch_size=self.batch_size)
+
+
+def transaction_counts_by_user():
+    """{пользователь: число транзакций} для пользователей тестовых данных."""
+    rows = (
+        Transaction.objects.filter(user__username__startswith=BENCHMARK_USER_PREFIX)
+        .values('user_id').annotate(count=Count('id')).order_by()
+    )
+    return {row['user_id']: row['count'] for row in rows}
+
+
+def flush_benchmark_data():
+    """
+    Удаляет пользователей тестовых данных со всеми их данными. Большие таблицы удаляются
+    одним DELETE без загрузки строк (сигналы пересчета здесь не нужны: удаляется все).
+    """
+    users = benchmark_users()
+    with transaction.atomic():
+        for queryset in (
+            Transaction.tags.through.objects.filter(transaction__user__in=users),
+            Transaction.objects.filter(user__in=users),
+            DailyRollup.objects.filter(user__in=users),
+            Transfer.objects.filter(sender_account__user__in=users),
+            Transfer.objects.filter(receiver_account__user__in=users),
+            Loan.objects.filter(user__in=users),
+            Budget.objects.filter(user__in=users),
+            ExportJob.objects.filter(user__in=users),
+            DataVersion.objects.filter(user__in=users),
+        ):
+            queryset._raw_delete(queryset.db)
+        return users.delete()[1].get('auth.User', 0)
@@ -1,7 +1,15 @@
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
-from .models import Transaction, Category, Tag, Account, Transfer, Budget, Currency, Counterparty, Loan
+from django.urls import reverse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import Transaction, Category, Tag, Account, Transfer, Budget, Currency, Counterparty, Loan, ExportJob
+from .authentication import USER_CLAIMS
+from .dates import parse_timezone
+from .rates.snapshot import convert_amount
 from django.contrib.auth.models import User
 
 
@@ -27,6 +35,40 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Выдача токенов: в токен кладутся поля пользователя, нужные для проверки без базы."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Обновление access-токена: единственное место, где пользователь читается из базы.
+    Отключенный пользователь токен не получит, а claims берутся актуальные.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh[jwt_settings.USER_ID_CLAIM], is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed('Пользователь не найден или отключен.')
+        for claim in USER_CLAIMS:
+            refresh[claim] = getattr(user, claim)
+
+        data = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return data
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -48,11 +90,9 @@ class CurrencySerializer(serializers.ModelSerializer):
 def convert_currency(amount, from_currency, to_currency):
     if from_currency == to_currency:
         return amount
-    if from_currency.rate_to_base == 0:
-        raise ValueError(f'Курс для {from_currency.code} не установлен')
-    # конвертируем в базовую, а затем в целевую валюту
-    base_amount = amount / from_currency.rate_to_base
-    return base_amount * to_currency.rate_to_base
+    # конвертируем в базовую, а затем в целевую валюту по снимку курсов (без запросов к Currency);
+    # rate_to_base - базовых единиц за 1 единицу валюты
+    return convert_amount(amount, from_currency.pk, to_currency.pk)
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -143,8 +183,10 @@ class BudgetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Budget
         fields = '__all__'
-        read_only_fields = ['user', 'total_expenses', 'is_exceeded']
+        read_only_fields = ['user', 'spent', 'total_expenses', 'is_exceeded']
 
+    # Оба поля читают аннотацию total_expenses из BudgetViewSet.get_queryset,
+    # без нее (например, сразу после создания) сумма считается отдельным запросом
     def get_is_exceeded(self, obj):
         # Проверяем, превышен ли бюджет
         return obj.is_exceeded()
@@ -197,3 +239,46 @@ class LoanSerializer(serializers.ModelSerializer):
         if data.get('due_date') and data['due_date'] < data['date_issued']:
             raise serializers.ValidationError("Дата погашения не может быть раньше даты выдачи.")
         return data
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    start_date = serializers.DateField(write_only=True, required=False)
+    end_date = serializers.DateField(write_only=True, required=False)
+    tz = serializers.CharField(write_only=True, required=False)
+    progress = serializers.IntegerField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'format', 'start_date', 'end_date', 'tz', 'params', 'status', 'progress',
+            'rows_total', 'rows_done', 'filename', 'error', 'created_at', 'finished_at', 'expires_at',
+            'download_url',
+        ]
+        read_only_fields = [
+            'id', 'params', 'status', 'rows_total', 'rows_done', 'filename', 'error',
+            'created_at', 'finished_at', 'expires_at',
+        ]
+
+    def get_download_url(self, obj):
+        if obj.status != ExportJob.STATUS_DONE:
+            return None
+        return reverse('export-download', args=[obj.pk])
+
+    def validate(self, data):
+        start_date, end_date = data.pop('start_date', None), data.pop('end_date', None)
+        tz = data.pop('tz', None)
+        data['params'] = {}
+        if data['kind'] == 'analytics':
+            if not start_date or not end_date:
+                raise ValidationError("Для выгрузки за период укажите start_date и end_date.")
+            if start_date > end_date:
+                raise ValidationError("Дата начала периода позже даты окончания.")
+            data['params'] = {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}
+            if tz:
+                try:
+                    parse_timezone(tz)
+                except ValueError as e:
+                    raise ValidationError({'tz': [str(e)]})
+                data['params']['tz'] = tz
+        return data
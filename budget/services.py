@@ -0,0 +1,60 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Account
+
+
+CENTS = Decimal('0.01')
+
+
+class InsufficientFunds(ValueError):
+    """На счете недостаточно средств для списания."""
+
+
+def to_money(amount):
+    """Приводит сумму к точности поля balance (2 знака после запятой)."""
+    return Decimal(amount).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def change_balance(account_id, delta):
+    """
+    Изменяет баланс счета на delta одним UPDATE (balance = balance + delta).
+    Значение считает сама БД, поэтому параллельные изменения не теряются.
+    """
+    Account.objects.filter(pk=account_id).update(
+        balance=F('balance') + to_money(delta), updated_at=timezone.now()
+    )
+
+
+def withdraw(account_id, amount, message='Недостаточно средств на счете.'):
+    """
+    Списывает amount со счета, только если на нем достаточно средств.
+    Проверка и списание выполняются одним условным UPDATE, без окна для гонки.
+    """
+    amount = to_money(amount)
+    updated = Account.objects.filter(pk=account_id, balance__gte=amount).update(
+        balance=F('balance') - amount, updated_at=timezone.now()
+    )
+    if not updated:
+        raise InsufficientFunds(message)
+
+
+def transfer_funds(sender_id, receiver_id, amount):
+    """
+    Переводит amount между счетами. Оба счета блокируются в порядке возрастания id,
+    чтобы встречные переводы не приводили к взаимной блокировке.
+    """
+    amount = to_money(amount)
+    with transaction.atomic():
+        accounts = {
+            account.pk: account
+            for account in Account.objects.select_for_update().filter(pk__in=[sender_id, receiver_id]).order_by('pk')
+        }
+        if accounts[sender_id].balance < amount:
+            raise InsufficientFunds('Недостаточно средств на счете отправителя.')
+        change_balance(sender_id, -amount)
+        change_balance(receiver_id, amount)
+
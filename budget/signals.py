@@ -0,0 +1,173 @@
+from django.db.models import F, IntegerField, Value
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .metrics import transactions_ingested
+from .models import Account, Budget, Category, Currency, ProfileCapture, Tag, Transaction, Transfer
+from .rates.snapshot import invalidate as invalidate_rates
+from .rollups import (
+    RollupDelta, merge_rollups_without, move_rollup_currency, stored_transaction_state, transaction_state,
+)
+from .spending import BudgetSpendDelta, schedule_budget_check
+from .versioning import (
+    CATALOG_CATEGORIES, CATALOG_CURRENCIES, CATALOG_TAGS, bump_catalog_version, bump_data_version,
+)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_transaction_state(sender, instance, **kwargs):
+    # Для изменяемой транзакции запоминаем прежние значения, чтобы снять ее старый вклад
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = stored_transaction_state(instance.pk)
+
+
+@receiver(post_save, sender=Transaction)
+def update_daily_rollup(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    delta = RollupDelta()
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        delta.remove(previous)
+    delta.add(transaction_state(instance))
+    delta.apply()
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_daily_rollup(sender, instance, **kwargs):
+    delta = RollupDelta()
+    delta.remove(transaction_state(instance))
+    delta.apply()
+
+
+@receiver(post_save, sender=Transaction)
+def update_budget_spent(sender, instance, raw=False, **kwargs):
+    # Проверка превышения выполняется асинхронно и только для бюджетов, расходы по которым выросли
+    if raw:
+        return
+    delta = BudgetSpendDelta()
+    previous = getattr(instance, '_previous_state', None)
+    if previous:
+        delta.remove(previous)
+    delta.add(transaction_state(instance))
+    schedule_budget_check(delta.apply())
+
+
+@receiver(post_delete, sender=Transaction)
+def remove_from_budget_spent(sender, instance, **kwargs):
+    delta = BudgetSpendDelta()
+    delta.remove(transaction_state(instance))
+    delta.apply()
+
+
+@receiver(post_save, sender=Transaction)
+def count_ingested_transaction(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        transactions_ingested('single')
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_save, sender=Account)
+@receiver(post_save, sender=Budget)
+def bump_user_data_version(sender, instance, raw=False, **kwargs):
+    # Любое изменение данных пользователя делает недействительными его кэшированные отчеты
+    if raw:
+        return
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Transaction)
+@receiver(post_delete, sender=Account)
+@receiver(post_delete, sender=Budget)
+def bump_user_data_version_on_delete(sender, instance, **kwargs):
+    # При удалении самого пользователя его строка версии удаляется вместе с ним, создавать ее заново нельзя
+    bump_data_version(instance.user_id, create=False)
+
+
+@receiver(post_save, sender=Transfer)
+def bump_transfer_data_version(sender, instance, raw=False, **kwargs):
+    # Перевод меняет балансы обоих счетов
+    if raw:
+        return
+    bump_data_version(instance.sender_account.user_id)
+    if instance.receiver_account.user_id != instance.sender_account.user_id:
+        bump_data_version(instance.receiver_account.user_id)
+
+
+@receiver(m2m_changed, sender=Transaction.tags.through)
+def bump_tags_data_version(sender, instance, action, reverse, pk_set, **kwargs):
+    # Теги транзакции входят в ответы API
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            bump_data_version(instance.user_id)
+        return
+    # Изменены транзакции тега: версию поднимаем всем их владельцам
+    if action in ('post_add', 'post_remove'):
+        transactions = Transaction.objects.filter(pk__in=pk_set)
+    elif action == 'pre_clear':
+        transactions = Transaction.objects.filter(tags=instance)
+    else:
+        return
+    for user_id in transactions.values_list('user_id', flat=True).distinct():
+        bump_data_version(user_id)
+
+
+@receiver(pre_delete, sender=Category)
+def merge_category_rollups(sender, instance, **kwargs):
+    # Транзакции удаляемой категории остаются без нее (SET_NULL), строки сводки - тоже
+    merge_rollups_without('category_id', instance.pk)
+
+
+@receiver(pre_delete, sender=Currency)
+def move_currency_rollups(sender, instance, **kwargs):
+    # Транзакции удаляемой валюты остаются без нее и дальше учитываются в валюте счета
+    move_rollup_currency(Transaction.objects.filter(currency=instance), F('currency'), F('account__currency'))
+
+
+@receiver(pre_save, sender=Account)
+def move_account_currency_rollups(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Смена валюты счета меняет валюту его транзакций без своей валюты
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not {'currency', 'currency_id'} & update_fields:
+        return
+    # Переименование и обновление баланса не трогают сводку: история счета не перебирается
+    if Account.objects.filter(pk=instance.pk, currency_id=instance.currency_id).exists():
+        return
+    move_rollup_currency(
+        Transaction.objects.filter(account_id=instance.pk, currency__isnull=True),
+        F('account__currency'), Value(instance.currency_id, output_field=IntegerField()),
+    )
+
+
+@receiver(pre_delete, sender=Account)
+def move_account_rollups(sender, instance, **kwargs):
+    # Транзакции без своей валюты учитывались в валюте счета; после удаления счета валюты у них нет
+    move_rollup_currency(
+        Transaction.objects.filter(account=instance, currency__isnull=True),
+        F('account__currency'), Value(None, output_field=IntegerField()),
+    )
+
+
+CATALOGS = {Category: CATALOG_CATEGORIES, Tag: CATALOG_TAGS, Currency: CATALOG_CURRENCIES}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Currency)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Currency)
+def bump_catalog(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bump_catalog_version(CATALOGS[sender])
+    if sender is Currency:
+        invalidate_rates()
+
+
+@receiver(post_delete, sender=ProfileCapture)
+def remove_profile_files(sender, instance, **kwargs):
+    instance.stacks_path.unlink(missing_ok=True)
+    instance.sql_path.unlink(missing_ok=True)
@@ -0,0 +1,94 @@
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.utils.timezone import localdate
+
+from .models import Budget
+from .services import to_money
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetSpendDelta:
+    """
+    Накопитель изменений счетчика Budget.spent. Вклад расходной транзакции добавляется
+    через add(), снимается через remove(), а apply() переносит итог на бюджеты,
+    в период которых попадает день транзакции.
+    Принимает те же снимки полей, что и RollupDelta (rollups.transaction_state).
+    """
+
+    def __init__(self):
+        self.changes = defaultdict(Decimal)
+
+    def add(self, state, sign=1):
+        if state['type'] != 'expense' or not state['category_id']:
+            return
+        key = (state['user_id'], state['category_id'], localdate(state['date']))
+        self.changes[key] += sign * Decimal(state['amount'])
+
+    def remove(self, state):
+        self.add(state, sign=-1)
+
+    def apply(self):
+        """
+        Применяет изменения и возвращает id бюджетов, расходы по которым выросли.
+        Независимо от количества транзакций выполняется не больше двух запросов:
+        выборка затронутых бюджетов и один UPDATE spent = spent + delta.
+        """
+        changes = {key: amount for key, amount in self.changes.items() if amount}
+        self.changes.clear()
+        if not changes:
+            return []
+
+        days = defaultdict(list)
+        for (user_id, category_id, day), amount in changes.items():
+            days[(user_id, category_id)].append((day, amount))
+        condition = Q()
+        for user_id, category_id in days:
+            condition |= Q(user_id=user_id, category_id=category_id)
+        first_day = min(day for _, _, day in changes)
+        last_day = max(day for _, _, day in changes)
+
+        deltas = {}
+        budgets = Budget.objects.filter(condition, start_date__lte=last_day, end_date__gte=first_day)
+        for budget in budgets.values('pk', 'user_id', 'category_id', 'start_date', 'end_date'):
+            delta = sum(
+                (amount for day, amount in days[(budget['user_id'], budget['category_id'])]
+                 if budget['start_date'] <= day <= budget['end_date']),
+                Decimal(0),
+            )
+            if delta:
+                deltas[budget['pk']] = to_money(delta)
+        if not deltas:
+            return []
+
+        # Прибавляем разницу на стороне БД, чтобы параллельные записи не теряли изменения
+        Budget.objects.filter(pk__in=deltas).update(
+            spent=F('spent') + Case(
+                *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+                output_field=DecimalField(),
+            )
+        )
+        return [pk for pk, delta in deltas.items() if delta > 0]
+
+
+def schedule_budget_check(budget_ids):
+    """
+    Ставит проверку превышения бюджетов в очередь Celery после фиксации транзакции БД.
+    Недоступность брокера не должна ломать запись транзакции, поэтому ошибка только логируется.
+    """
+    if not budget_ids:
+        return
+    budget_ids = list(budget_ids)
+
+    def enqueue():
+        from .tasks import check_budget_spending
+        try:
+            check_budget_spending.delay(budget_ids)
+        except Exception:
+            logger.exception('Не удалось поставить проверку бюджетов %s в очередь', budget_ids)
+
+    transaction.on_commit(enqueue)
@@ -1,33 +1,124 @@
+import logging
+import time
+
 from celery import shared_task
-from django.core.mail import send_mail
+from celery.signals import task_postrun, task_prerun
+from django.core.mail import get_connection, send_mass_mail
 from django.conf import settings
+from django.db.models import F
 from budget.models import Budget
+from budget.export_jobs import cleanup_expired_exports, run_export
+from budget.metrics import task_finished, task_started
+from budget.rates.snapshot import begin_scope, end_scope
 from datetime import date
 
+logger = logging.getLogger(__name__)
+
+# Сколько писем отправляет одна подзадача через одно SMTP-соединение
+NOTIFICATION_CHUNK_SIZE = 100
+
+# Области сверки курсов выполняющихся задач: task_id -> токен begin_scope
+_rate_scopes = {}
+
+
+@task_prerun.connect
+def check_rates_per_task(task_id=None, **kwargs):
+    # Как и запрос, каждая задача один раз сверяет версию снимка курсов
+    _rate_scopes[task_id] = begin_scope()
+    task_started(task_id)
+
+
+@task_postrun.connect
+def record_task_metrics(task_id=None, task=None, state=None, **kwargs):
+    # Длительность и исход (SUCCESS, FAILURE, RETRY) каждой задачи, в том числе check_budgets
+    task_finished(task_id, task.name, state or 'UNKNOWN')
+    # После задачи (в том числе выполненной сразу, без воркера) сверка курсов снова на каждый вызов
+    token = _rate_scopes.pop(task_id, None)
+    if token is not None:
+        end_scope(token)
+
 
 @shared_task
 def check_budgets():
     """
     Проверяет все бюджеты на превышение и отправляет уведомления пользователям.
+    Расходы всех активных бюджетов считаются одним запросом, письма рассылаются
+    подзадачами пачками по NOTIFICATION_CHUNK_SIZE.
     """
+    started = time.monotonic()
     today = date.today()
-    budgets = Budget.objects.filter(start_date__lte=today, end_date__gte=today)
-
-    for budget in budgets:
-        total_expenses = budget.get_total_expenses()
-        if total_expenses > budget.amount:
-            # Отправляем уведомление
-            subject = "Превышение бюджета!"
-            message = (
-                f"Ваш бюджет по категории {budget.category.name} "
-                f"превышен! Общие расходы: {total_expenses}, "
-                f"запланированный бюджет: {budget.amount}."
-            )
-            recipient = budget.user.email
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [recipient],
-                fail_silently=False,
-            )
+    exceeded = (
+        Budget.objects.active(today)
+        .with_total_expenses()
+        .filter(total_expenses__gt=F('amount'))
+        .exclude(user__email='')
+        .values_list('user__email', 'category__name', 'amount', 'total_expenses')
+    )
+
+    messages = []
+    for email, category_name, amount, total_expenses in exceeded.iterator():
+        # Отправляем уведомление
+        subject = "Превышение бюджета!"
+        message = (
+            f"Ваш бюджет по категории {category_name} "
+            f"превышен! Общие расходы: {total_expenses}, "
+            f"запланированный бюджет: {amount}."
+        )
+        messages.append([subject, message, settings.DEFAULT_FROM_EMAIL, [email]])
+    evaluated = time.monotonic()
+
+    chunks = [
+        messages[start:start + NOTIFICATION_CHUNK_SIZE]
+        for start in range(0, len(messages), NOTIFICATION_CHUNK_SIZE)
+    ]
+    for chunk in chunks:
+        send_budget_notifications.delay(chunk)
+
+    metrics = {
+        'exceeded': len(messages),
+        'chunks': len(chunks),
+        'evaluation_seconds': round(evaluated - started, 3),
+        'total_seconds': round(time.monotonic() - started, 3),
+    }
+    logger.info("check_budgets: %s", metrics)
+    return metrics
+
+
+@shared_task
+def send_budget_notifications(messages):
+    """
+    Отправляет пачку уведомлений через одно SMTP-соединение.
+    messages - список [тема, текст, отправитель, [получатели]].
+    """
+    connection = get_connection(fail_silently=False)
+    return send_mass_mail([tuple(message) for message in messages], connection=connection)
+
+
+@shared_task
+def check_budget_spending(budget_ids):
+    """
+    Проверяет бюджеты, расходы по которым выросли после записи транзакций.
+    Используется счетчик Budget.spent, поэтому проверка - один запрос без агрегации.
+    """
+    exceeded = Budget.objects.filter(pk__in=budget_ids, spent__gt=F('amount')).select_related('category')
+    exceeded_ids = []
+    for budget in exceeded:
+        # Логика для уведомления
+        logger.info("Бюджет для категории %s превышен!", budget.category.name)
+        exceeded_ids.append(budget.pk)
+    return exceeded_ids
+
+
+
+@shared_task
+def run_export_job(job_id):
+    """Строит файл фоновой выгрузки (см. export_jobs.submit_export)."""
+    return run_export(job_id)
+
+
+@shared_task
+def cleanup_export_jobs():
+    """Удаляет выгрузки с истекшим сроком хранения вместе с файлами, зависшие помечает неудачными."""
+    removed = cleanup_expired_exports()
+    logger.info("cleanup_export_jobs: удалено %s", removed)
+    return removed
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+
+from budget.models import Account, Currency, Transfer
+from budget.services import InsufficientFunds
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class BalanceConcurrencyTest(TransactionTestCase):
+    """
+    Нагрузочная проверка атомарных изменений баланса: параллельные пополнения и переводы
+    из нескольких потоков (у каждого свое соединение с БД) не должны терять обновления.
+    """
+    workers = 16
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='stress', password='password123')
+        currency = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.first = Account.objects.create(
+            user=self.user, name='Первый', account_type='cash', currency=currency, balance=Decimal('1000.00')
+        )
+        self.second = Account.objects.create(
+            user=self.user, name='Второй', account_type='card', currency=currency, balance=Decimal('1000.00')
+        )
+
+    def run_parallel(self, tasks):
+        def run(task):
+            try:
+                return task()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(run, tasks))
+
+    def deposit(self, account_id, amount):
+        def task():
+            Account.objects.get(pk=account_id).update_balance(amount)
+        return task
+
+    def transfer(self, sender_id, receiver_id, amount):
+        def task():
+            try:
+                Transfer.objects.create(
+                    sender_account=Account.objects.get(pk=sender_id),
+                    receiver_account=Account.objects.get(pk=receiver_id),
+                    amount=Decimal(amount),
+                )
+                return True
+            except InsufficientFunds:
+                return False
+        return task
+
+    def test_parallel_deposits_and_transfers(self):
+        tasks = []
+        for _ in range(200):
+            tasks.append(self.deposit(self.first.pk, Decimal('1.25')))
+            tasks.append(self.deposit(self.second.pk, Decimal('0.75')))
+        for _ in range(100):
+            # Встречные переводы проверяют отсутствие взаимных блокировок
+            tasks.append(self.transfer(self.first.pk, self.second.pk, '3.00'))
+            tasks.append(self.transfer(self.second.pk, self.first.pk, '2.00'))
+        results = self.run_parallel(tasks)
+        self.assertTrue(all(result is not False for result in results))
+
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        # 1000 + 200 * 1.25 - 100 * 3 + 100 * 2
+        self.assertEqual(self.first.balance, Decimal('1150.00'))
+        # 1000 + 200 * 0.75 + 100 * 3 - 100 * 2
+        self.assertEqual(self.second.balance, Decimal('1250.00'))
+
+    def test_no_overdraft(self):
+        Account.objects.filter(pk=self.first.pk).update(balance=Decimal('100.00'))
+        results = self.run_parallel([self.transfer(self.first.pk, self.second.pk, '10.00') for _ in range(50)])
+
+        self.assertEqual(results.count(True), 10)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual(self.first.balance, Decimal('0.00'))
+        self.assertEqual(self.second.balance, Decimal('1100.00'))
+        self.assertEqual(Transfer.objects.count(), 10)
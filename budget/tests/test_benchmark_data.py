@@ -0,0 +1,85 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+
+from budget.models import Account, DailyRollup, Loan, Transaction
+from budget.seeding import BENCHMARK_PASSWORD, benchmark_users
+
+
+class SeedBenchmarkDataTest(TestCase):
+    def seed(self, *args):
+        call_command(
+            'seed_benchmark_data', '--users', '4', '--transactions', '300', '--days', '60', '--batch-size', '50',
+            *args, stdout=StringIO(),
+        )
+
+    def test_seed_is_consistent_and_reproducible(self):
+        self.seed()
+        users = benchmark_users()
+        self.assertEqual(users.count(), 4)
+        self.assertTrue(users.first().check_password(BENCHMARK_PASSWORD))
+        total = Transaction.objects.filter(user__in=users).count()
+        self.assertAlmostEqual(total, 300, delta=4)
+        # Сводки и остатки пересчитаны по вставленным транзакциям
+        self.assertEqual(DailyRollup.objects.filter(user__in=users).aggregate(n=Sum('count'))['n'], total)
+        self.assertFalse(Loan.objects.filter(user__in=users, remaining_amount__isnull=True).exists())
+        account = Account.objects.filter(user__in=users, transactions__isnull=False).first()
+        income = account.transactions.filter(type='income').aggregate(s=Sum('amount'))['s'] or 0
+        expense = account.transactions.filter(type='expense').aggregate(s=Sum('amount'))['s'] or 0
+        self.assertEqual(account.balance, 5000 + income - expense)
+
+        amounts = list(Transaction.objects.order_by('id').values_list('amount', flat=True)[:20])
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.seed('--flush')
+        self.assertEqual(benchmark_users().count(), 4)
+        self.assertEqual(list(Transaction.objects.order_by('id').values_list('amount', flat=True)[:20]), amounts)
+
+    def test_end_date_anchors_history(self):
+        self.seed('--end-date', '2025-06-30')
+        dates = Transaction.objects.filter(user__in=benchmark_users()).values_list('date__date', flat=True)
+        self.assertEqual(str(max(dates)), '2025-06-30')
+        self.assertGreaterEqual(str(min(dates)), '2025-05-01')
+        with self.assertRaises(CommandError):
+            self.seed('--flush', '--end-date', '30.06.2025')
+
+    @override_settings(PDF_SYNC_MAX_ROWS=20)
+    def test_pdf_benchmark_stays_synchronous(self):
+        # Период PDF сужается до PDF_SYNC_MAX_ROWS строк: замеряется построение отчета, а не выгрузка (202)
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'report.json'
+            call_command(
+                'benchmark_endpoints', '--sizes', '1000', '--repeat', '1', '--warmup', '0', '--endpoint', 'export-pdf',
+                '--output', str(output), stdout=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding='utf-8'))
+        self.assertEqual([row['status'] for row in report['results']], [200])
+
+    def test_benchmark_endpoints_writes_report(self):
+        self.seed()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'report.json'
+            call_command(
+                'benchmark_endpoints', '--sizes', '10,1000', '--repeat', '1', '--warmup', '0',
+                '--output', str(output), stdout=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding='utf-8'))
+            call_command(
+                'benchmark_endpoints', '--sizes', '10', '--repeat', '1', '--warmup', '0', '--endpoint', 'analytics',
+                '--output', str(output), '--compare', str(output), stdout=StringIO(),
+            )
+        self.assertEqual(len(report['results']), 18)
+        statuses = {row['endpoint']: row['status'] for row in report['results']}
+        self.assertTrue(all(code < 400 for code in statuses.values()), statuses)
+        self.assertEqual(statuses['transactions'], 200)
+        self.assertEqual(statuses['import-csv'], 201)
+        self.assertEqual(statuses['transfer'], 201)
+        # Запросы выполнялись в откатываемых транзакциях
+        self.assertFalse(Transaction.objects.filter(description__startswith='Импорт').exists())
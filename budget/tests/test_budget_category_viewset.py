@@ -1,10 +1,15 @@
 from datetime import date, timedelta
+from decimal import Decimal
 
 from django.contrib.auth.models import User
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from budget.models import Category, Budget
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from budget.models import Category, Budget, Transaction
 
 
 class BudgetViewSetTests(APITestCase):
@@ -64,3 +69,39 @@ class BudgetViewSetTests(APITestCase):
         self.assertEqual(len(response.data), 1)
         self.assertIn('total_expenses', response.data[0])
         self.assertIn('is_exceeded', response.data[0])
+
+    def add_budgets(self, count):
+        for number in range(count):
+            category = Category.objects.create(name=f'Категория {Category.objects.count()}')
+            Budget.objects.create(
+                user=self.user, category=category, amount=Decimal('100.00'),
+                start_date=date.today() - timedelta(days=5), end_date=date.today(),
+            )
+            Transaction.objects.create(
+                user=self.user, category=category, type='expense', amount=Decimal(50 * number),
+                date=timezone.now(),
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_list_and_summary_constant_queries(self):
+        self.add_budgets(2)
+        small_list, _ = self.count_queries('/api/v1/budgets/')
+        small_summary, _ = self.count_queries('/api/v1/budgets/summary/')
+
+        self.add_budgets(8)
+        large_list, response = self.count_queries('/api/v1/budgets/')
+        large_summary, summary = self.count_queries('/api/v1/budgets/summary/')
+
+        self.assertEqual(small_list, large_list)
+        self.assertEqual(small_summary, large_summary)
+        self.assertEqual(len(response.data), 11)
+        for item in response.data:
+            budget = Budget.objects.get(pk=item['id'])
+            self.assertEqual(Decimal(item['total_expenses']), budget.calculate_spent())
+            self.assertEqual(item['is_exceeded'], budget.calculate_spent() > budget.amount)
+        self.assertEqual(sum(item['is_exceeded'] for item in summary.data), 5)
@@ -0,0 +1,87 @@
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Budget, Category, Transaction
+from budget.tasks import check_budget_spending
+
+
+class BudgetSpentTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='spender', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(name='Еда')
+        self.transport = Category.objects.create(name='Транспорт')
+        self.budget = Budget.objects.create(
+            user=self.user, category=self.food, amount=Decimal('100.00'),
+            start_date=date(2025, 3, 1), end_date=date(2025, 3, 31),
+        )
+
+    def create(self, amount, category=None, day=10, month=3):
+        return Transaction.objects.create(
+            user=self.user, category=category or self.food, type='expense',
+            amount=Decimal(amount), date=make_aware(datetime(2025, month, day, 12)),
+        )
+
+    def assertSpent(self, value):
+        self.budget.refresh_from_db()
+        self.assertEqual(self.budget.spent, Decimal(value))
+        self.assertEqual(self.budget.spent, self.budget.calculate_spent())
+
+    def test_counter_follows_create_update_delete(self):
+        first = self.create('30.00')
+        self.create('20.00', day=31)
+        self.create('500.00', month=4)
+        self.assertSpent('50.00')
+
+        first.amount = Decimal('45.00')
+        first.save()
+        self.assertSpent('65.00')
+
+        first.category = self.transport
+        first.save()
+        self.assertSpent('20.00')
+
+        first.category = self.food
+        first.save()
+        first.delete()
+        self.assertSpent('20.00')
+
+    def test_unchanged_save_runs_no_budget_queries(self):
+        transaction = self.create('30.00')
+        transaction.description = 'Обед'
+        # Точка сохранения, чтение прежнего состояния, UPDATE транзакции и версии данных,
+        # без запросов к бюджетам и сводной таблице
+        with self.assertNumQueries(5):
+            transaction.save()
+
+    def test_budget_check_is_scheduled_after_commit(self):
+        with mock.patch.object(check_budget_spending, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create('150.00')
+        delay.assert_called_once_with([self.budget.pk])
+        self.assertEqual(check_budget_spending(delay.call_args.args[0]), [self.budget.pk])
+
+    def test_broker_failure_does_not_break_write(self):
+        with mock.patch.object(check_budget_spending, 'delay', side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create('10.00')
+        self.assertSpent('10.00')
+
+    def test_import_updates_counter(self):
+        content = (
+            'Дата,Категория,Сумма,Тип,Описание\n'
+            '2025-03-05,Еда,12.00,expense,\n'
+            '2025-03-06,Еда,8.00,expense,\n'
+            '2025-04-01,Еда,99.00,expense,\n'
+        )
+        file = SimpleUploadedFile('statement.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/v1/transactions/import_csv/', {'file': file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertSpent('20.00')
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase
+from django.utils import timezone
+
+from budget.models import Budget, Category, Transaction
+from budget.tasks import check_budgets, send_budget_notifications
+
+
+class CheckBudgetsTaskTest(TestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        self.food = Category.objects.create(name='Еда')
+        self.fun = Category.objects.create(name='Развлечения')
+        self.budgets = []
+        for number in range(5):
+            user = User.objects.create_user(
+                username=f'user{number}', email=f'user{number}@example.com', password='password123'
+            )
+            self.budgets.append(Budget.objects.create(
+                user=user, category=self.food, amount=Decimal('100.00'),
+                start_date=today - timedelta(days=10), end_date=today,
+            ))
+            Budget.objects.create(
+                user=user, category=self.fun, amount=Decimal('100.00'),
+                start_date=today - timedelta(days=10), end_date=today + timedelta(days=10),
+            )
+            # Нечетные пользователи превышают бюджет "Еда", расход в последний день периода тоже учитывается
+            Transaction.objects.create(
+                user=user, category=self.food, type='expense', amount=Decimal('60.00'),
+                date=timezone.make_aware(datetime.combine(today, datetime.min.time())) + timedelta(hours=23),
+            )
+            Transaction.objects.create(
+                user=user, category=self.food, type='expense', amount=Decimal('50.00') if number % 2 else '10.00',
+                date=timezone.now() - timedelta(days=3),
+            )
+            # Расход вне периода бюджета не учитывается
+            Transaction.objects.create(
+                user=user, category=self.food, type='expense', amount=Decimal('500.00'),
+                date=timezone.now() - timedelta(days=30),
+            )
+
+    def test_annotation_matches_per_budget_total(self):
+        annotated = {budget.pk: budget.total_expenses for budget in Budget.objects.with_total_expenses()}
+        for budget in Budget.objects.all():
+            self.assertEqual(annotated[budget.pk], budget.get_total_expenses())
+
+    def test_exceeded_budgets_evaluated_in_one_query(self):
+        with mock.patch.object(send_budget_notifications, 'delay', side_effect=send_budget_notifications) as delay:
+            with self.assertNumQueries(1):
+                metrics = check_budgets()
+
+        self.assertEqual(metrics['exceeded'], 2)
+        self.assertEqual(delay.call_count, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['user1@example.com', 'user3@example.com'])
+        self.assertIn('Еда', mail.outbox[0].body)
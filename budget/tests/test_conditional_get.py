@@ -0,0 +1,99 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Category, Currency, Tag, Transaction
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='poller', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.food = Category.objects.create(name='Еда')
+        self.transaction = self.create('10.00')
+
+    def create(self, amount, user=None):
+        return Transaction.objects.create(
+            user=user or self.user, category=self.food, type='expense',
+            amount=Decimal(amount), date=make_aware(datetime(2025, 3, 10, 12)),
+        )
+
+    def assertNotModified(self, url, etag, queries=1, **params):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def assertModified(self, url, etag, **params):
+        response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_transaction_list(self):
+        url = '/api/v1/transactions/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertNotModified(url, etag)
+        # Другие параметры запроса - другой ETag
+        self.assertModified(url, etag, ordering='amount')
+
+        # Изменения чужих данных не влияют
+        other = User.objects.create_user(username='other', password='password123')
+        self.create('5.00', user=other)
+        self.assertNotModified(url, etag)
+
+        self.create('20.00')
+        etag = self.assertModified(url, etag)
+
+        # Категория и теги входят в ответ
+        self.food.name = 'Продукты'
+        self.food.save()
+        etag = self.assertModified(url, etag)
+        self.transaction.tags.add(Tag.objects.create(name='обед'))
+        self.assertModified(url, etag)
+
+    def test_if_modified_since(self):
+        url = '/api/v1/budgets/'
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_catalogs(self):
+        response = self.client.get('/api/v1/categories/')
+        self.assertNotModified('/api/v1/categories/', response['ETag'])
+        # Категории не зависят от данных пользователя
+        self.create('1.00')
+        self.assertNotModified('/api/v1/categories/', response['ETag'])
+        Category.objects.create(name='Транспорт')
+        self.assertModified('/api/v1/categories/', response['ETag'])
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get('/api/v1/currencies/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Currency.objects.create(code='USD', name='Доллар США', rate_to_base=Decimal('3.2'))
+        self.assertModified('/api/v1/currencies/', response['ETag'])
+
+    def test_analytics(self):
+        url = '/api/analytics/trend/'
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotModified(url, response['ETag'], **params)
+        self.create('3.00')
+        self.assertModified(url, response['ETag'], **params)
+
+    def test_write_methods_are_not_conditional(self):
+        response = self.client.get('/api/v1/categories/')
+        response = self.client.post(
+            '/api/v1/categories/', {'name': 'Связь'}, format='json', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('ETag', response)
@@ -0,0 +1,52 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from budget.models import CatalogVersion, Currency, CurrencyRate
+from budget.rates import rate_as_of, rate_on, save_rates
+
+
+class SaveRatesTest(TestCase):
+    def setUp(self):
+        self.usd = Currency.objects.create(code='USD', name='Доллар', rate_to_base=Decimal('3.0000'))
+        self.eur = Currency.objects.create(code='EUR', name='Евро', rate_to_base=Decimal('3.5000'))
+
+    def test_bulk_upsert_in_constant_queries(self):
+        # Точка сохранения, выборка валют, upsert истории, проверка более поздних дат,
+        # UPDATE Currency, UPDATE версии справочника, освобождение точки сохранения
+        with self.assertNumQueries(7):
+            saved = save_rates({'USD': '3.2', 'EUR': '3.4', 'XXX': '1'}, date(2025, 1, 10), source='test')
+        self.assertEqual(sorted(saved), ['EUR', 'USD'])
+        # Повторная загрузка той же даты перезаписывает курс
+        save_rates({'USD': '3.25'}, date(2025, 1, 10))
+        self.assertEqual(CurrencyRate.objects.count(), 2)
+        self.usd.refresh_from_db()
+        self.assertEqual(self.usd.rate_to_base, Decimal('3.2500'))
+        self.assertTrue(CatalogVersion.objects.filter(name='currencies').exists())
+
+    def test_backfill_does_not_overwrite_current_rate(self):
+        save_rates({'USD': '3.2'}, date(2025, 1, 10))
+        save_rates({'USD': '2.9'}, date(2024, 12, 1))
+        self.usd.refresh_from_db()
+        self.assertEqual(self.usd.rate_to_base, Decimal('3.2000'))
+
+    def test_rate_on_date(self):
+        save_rates({'USD': '3.1'}, date(2025, 1, 1))
+        save_rates({'USD': '3.2'}, date(2025, 1, 10))
+        self.assertEqual(rate_on(self.usd, date(2025, 1, 5)), Decimal('3.1'))
+        self.assertEqual(rate_on(self.usd, date(2025, 2, 1)), Decimal('3.2'))
+        # До начала истории - текущий курс
+        self.assertEqual(rate_on(self.usd, date(2024, 1, 1)), self.usd.rate_to_base)
+        self.assertEqual(rate_on(self.eur, date(2025, 1, 5)), Decimal('3.5'))
+
+    def test_rate_as_of_annotation(self):
+        save_rates({'USD': '3.1'}, date(2025, 1, 1))
+        save_rates({'USD': '3.2'}, date(2025, 1, 10))
+        rates = (
+            CurrencyRate.objects.filter(currency=self.usd)
+            .annotate(previous=rate_as_of('currency', 'date'))
+            .values_list('date', 'previous')
+        )
+        self.assertEqual(dict(rates), {date(2025, 1, 1): Decimal('3.1'), date(2025, 1, 10): Decimal('3.2')})
+
@@ -0,0 +1,185 @@
+from datetime import datetime
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Category, Currency, DailyRollup, Transaction
+
+
+def rollup_snapshot(user):
+    return sorted(
+        DailyRollup.objects.filter(user=user).values_list('date', 'category_id', 'type', 'currency_id', 'total', 'count')
+    )
+
+
+class DailyRollupTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollup', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.currency = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.account = Account.objects.create(
+            user=self.user, name='Кошелек', account_type='cash', currency=self.currency, balance=Decimal('1000')
+        )
+        self.food = Category.objects.create(name='Еда')
+        self.transport = Category.objects.create(name='Транспорт')
+
+    def create(self, amount, category, type='expense', day=1, month=3):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, currency=self.currency, category=category, type=type,
+            amount=Decimal(amount), date=make_aware(datetime(2025, month, day, 12)),
+        )
+
+    def test_rollup_follows_create_update_delete(self):
+        first = self.create('10.00', self.food, day=1)
+        self.create('5.50', self.food, day=1)
+        second = self.create('7.00', self.transport, day=2)
+
+        row = DailyRollup.objects.get(user=self.user, category=self.food)
+        self.assertEqual((row.total, row.count), (Decimal('15.50'), 2))
+
+        # Перенос транзакции в другую категорию и день
+        first.category = self.transport
+        first.date = make_aware(datetime(2025, 3, 2, 9))
+        first.save()
+        second.delete()
+
+        snapshot = rollup_snapshot(self.user)
+        self.assertEqual(len(snapshot), 2)
+        call_command('rebuild_daily_rollup', stdout=StringIO())
+        self.assertEqual(rollup_snapshot(self.user), snapshot)
+
+    def test_trend_and_top_read_rollup(self):
+        self.create('100.00', None, type='income', day=1)
+        self.create('30.00', self.food, day=1)
+        self.create('20.00', self.food, day=15)
+        self.create('40.00', self.transport, day=20)
+        self.create('999.00', self.transport, day=1, month=5)
+
+        params = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        # Версия данных для кэша и сама выборка из сводной таблицы
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/trend/', {**params, 'group_by': 'month'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['trend']), 1)
+        self.assertEqual(response.data['trend'][0]['total_income'], Decimal('100.00'))
+        self.assertEqual(response.data['trend'][0]['total_expense'], Decimal('90.00'))
+
+        response = self.client.get('/api/analytics/top-expenses/', {**params, 'limit': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['top_categories'], [{'category__name': 'Еда', 'total_expense': Decimal('50.00')}]
+        )
+
+    def test_invalid_date(self):
+        response = self.client.get('/api/analytics/top-expenses/', {'start_date': '2025-13-01', 'end_date': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DailyRollupKeyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollupkey', password='password123')
+        self.food = Category.objects.create(name='Еда')
+        self.day = make_aware(datetime(2025, 3, 1, 12))
+
+    def create(self, amount, category):
+        return Transaction.objects.create(
+            user=self.user, category=category, type='expense', amount=Decimal(amount), date=self.day,
+        )
+
+    def test_key_is_unique_including_null_category(self):
+        self.create('5.00', None)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DailyRollup.objects.create(user=self.user, date=self.day.date(), type='expense', total=1, count=1)
+
+    def test_category_delete_merges_into_row_without_category(self):
+        ten = self.create('10.00', self.food)
+        self.create('5.00', None)
+        self.food.delete()
+        self.assertEqual(rollup_snapshot(self.user), [(self.day.date(), None, 'expense', None, Decimal('15.00'), 2)])
+
+        # Удаление транзакции снимает ее вклад с единственной строки ключа
+        Transaction.objects.get(pk=ten.pk).delete()
+        self.assertEqual(rollup_snapshot(self.user), [(self.day.date(), None, 'expense', None, Decimal('5.00'), 1)])
+
+    def test_concurrent_first_insert_is_retried(self):
+        # Другой запрос создал строку ключа уже после нашей выборки: первая выборка ее не видит
+        DailyRollup.objects.create(user=self.user, date=self.day.date(), type='expense', total=3, count=1)
+        original = DailyRollup.objects.select_for_update
+        calls = []
+
+        def stale_then_fresh(*args, **kwargs):
+            calls.append(1)
+            queryset = original(*args, **kwargs)
+            return queryset.none() if len(calls) == 1 else queryset
+
+        with mock.patch.object(DailyRollup.objects, 'select_for_update', side_effect=stale_then_fresh):
+            self.create('7.00', None)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(rollup_snapshot(self.user), [(self.day.date(), None, 'expense', None, Decimal('10.00'), 2)])
+
+
+class DailyRollupAccountCurrencyTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='rollupcurrency', password='password123')
+        self.byn = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.usd = Currency.objects.create(code='USD', name='Доллар', rate_to_base=Decimal('3'))
+        self.account = Account.objects.create(
+            user=self.user, name='Долларовый', account_type='card', currency=self.usd, balance=Decimal('0')
+        )
+        self.day = make_aware(datetime(2025, 3, 1, 12))
+
+    def create(self, amount, currency=None):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, currency=currency, type='expense',
+            amount=Decimal(amount), date=self.day,
+        )
+
+    def test_transaction_without_currency_counts_in_account_currency(self):
+        self.create('10.00')
+        self.create('5.00', currency=self.usd)
+        expected = [(self.day.date(), None, 'expense', self.usd.pk, Decimal('15.00'), 2)]
+        self.assertEqual(rollup_snapshot(self.user), expected)
+        call_command('rebuild_daily_rollup', stdout=StringIO())
+        self.assertEqual(rollup_snapshot(self.user), expected)
+
+    def test_account_currency_change_and_delete_move_rollups(self):
+        self.create('10.00')
+        self.create('5.00', currency=self.usd)
+        self.account.currency = self.byn
+        self.account.save()
+        self.assertEqual(rollup_snapshot(self.user), [
+            (self.day.date(), None, 'expense', self.byn.pk, Decimal('10.00'), 1),
+            (self.day.date(), None, 'expense', self.usd.pk, Decimal('5.00'), 1),
+        ])
+
+        # Без счета у транзакции не остается валюты
+        self.account.delete()
+        rows = DailyRollup.objects.values_list('date', 'category_id', 'type', 'currency_id', 'total', 'count')
+        self.assertCountEqual(rows, [
+            (self.day.date(), None, 'expense', None, Decimal('10.00'), 1),
+            (self.day.date(), None, 'expense', self.usd.pk, Decimal('5.00'), 1),
+        ])
+
+    def test_account_save_without_currency_change_skips_history(self):
+        self.create('10.00')
+        self.account.name = 'Зарплатный'
+        with CaptureQueriesContext(connection) as queries:
+            self.account.save()
+        self.assertFalse([query for query in queries if 'budget_transaction' in query['sql']])
+        self.assertEqual(rollup_snapshot(self.user), [(self.day.date(), None, 'expense', self.usd.pk, Decimal('10.00'), 1)])
+
+    def test_currency_delete_falls_back_to_account_currency(self):
+        eur = Currency.objects.create(code='EUR', name='Евро', rate_to_base=Decimal('3.5'))
+        self.create('10.00')
+        self.create('4.00', currency=eur)
+        eur.delete()
+        self.assertEqual(rollup_snapshot(self.user), [(self.day.date(), None, 'expense', self.usd.pk, Decimal('14.00'), 2)])
@@ -0,0 +1,135 @@
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.export_jobs import cleanup_expired_exports, run_export
+from budget.models import Category, ExportJob, Transaction
+from budget.tasks import run_export_job
+
+
+class ExportJobTest(APITestCase):
+    url = '/api/v1/exports/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name='Еда')
+        for day in range(1, 6):
+            Transaction.objects.create(
+                user=self.user, category=self.category, type='expense', amount=Decimal('10.00'),
+                date=timezone.make_aware(datetime(2025, 1, day, 12)),
+            )
+        export_root = tempfile.TemporaryDirectory()
+        self.addCleanup(export_root.cleanup)
+        settings_override = override_settings(EXPORT_ROOT=export_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def submit(self, **data):
+        payload = {'kind': 'analytics', 'format': 'csv', 'start_date': '2025-01-01', 'end_date': '2025-01-31', **data}
+        payload = {key: value for key, value in payload.items() if value is not None}
+        with mock.patch.object(run_export_job, 'delay', side_effect=run_export_job) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, payload, format='json')
+        return response, delay
+
+    def test_submit_poll_download(self):
+        response, delay = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        delay.assert_called_once()
+
+        job = self.client.get(f'{self.url}{response.data["id"]}/')
+        self.assertEqual(job.data['status'], 'done')
+        self.assertEqual(job.data['progress'], 100)
+        self.assertEqual((job.data['rows_total'], job.data['rows_done']), (5, 5))
+
+        download = self.client.get(job.data['download_url'])
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        content = b''.join(download.streaming_content).decode('utf-8-sig')
+        self.assertEqual(len(content.strip().splitlines()), 6)
+
+    def test_identical_request_reuses_artifact_until_data_changes(self):
+        first, _ = self.submit()
+        second, delay = self.submit()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['id'], first.data['id'])
+        delay.assert_not_called()
+
+        # Другой формат - другая выгрузка
+        pdf, delay = self.submit(format='pdf')
+        self.assertNotEqual(pdf.data['id'], first.data['id'])
+
+        Transaction.objects.create(
+            user=self.user, category=self.category, type='expense', amount=Decimal('1.00'),
+            date=timezone.make_aware(datetime(2025, 1, 10, 12)),
+        )
+        third, delay = self.submit()
+        self.assertEqual(third.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(third.data['id'], first.data['id'])
+        delay.assert_called_once()
+
+    def test_broker_unavailable(self):
+        with mock.patch.object(run_export_job, 'delay', side_effect=ConnectionError):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(self.url, {'kind': 'transactions', 'format': 'pdf'}, format='json')
+        # В тесте запрос выполняется внутри транзакции, поэтому постановка в очередь происходит после ответа
+        job = self.client.get(f'{self.url}{response.data["id"]}/')
+        self.assertEqual(job.data['status'], 'failed')
+        self.assertIsNone(job.data['download_url'])
+
+        # Неудачная выгрузка не переиспользуется
+        retry, delay = self.submit(kind='transactions', format='pdf', start_date=None, end_date=None)
+        self.assertEqual(retry.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(retry.data['id'], response.data['id'])
+
+    def test_validation_and_ownership(self):
+        response = self.client.post(self.url, {'kind': 'analytics', 'format': 'csv'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        created, _ = self.submit()
+        other = User.objects.create_user(username='other', password='password123')
+        self.client.force_authenticate(user=other)
+        download = self.client.get(f'{self.url}{created.data["id"]}/download/')
+        self.assertEqual(download.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired_artifacts_are_removed(self):
+        response, _ = self.submit()
+        job = ExportJob.objects.get(pk=response.data['id'])
+        self.assertTrue(job.artifact_path.exists())
+        ExportJob.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        download = self.client.get(f'{self.url}{job.pk}/download/')
+        self.assertEqual(download.status_code, status.HTTP_410_GONE)
+        self.assertEqual(cleanup_expired_exports(), 1)
+        self.assertFalse(job.artifact_path.exists())
+        self.assertFalse(ExportJob.objects.filter(pk=job.pk).exists())
+
+    def test_redelivered_job_is_built_once(self):
+        response, _ = self.submit()
+        job = ExportJob.objects.get(pk=response.data['id'])
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.STATUS_RUNNING)
+        # Второй воркер не захватывает задание, которое уже строится
+        with mock.patch('budget.export_jobs.write_report') as write_report:
+            self.assertEqual(run_export(job.pk), ExportJob.STATUS_RUNNING)
+        write_report.assert_not_called()
+
+    def test_stale_running_job_is_not_reused(self):
+        first, _ = self.submit()
+        ExportJob.objects.filter(pk=first.data['id']).update(
+            status=ExportJob.STATUS_RUNNING, expires_at=None, created_at=timezone.now() - timedelta(hours=2),
+        )
+        second, delay = self.submit()
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+
+        cleanup_expired_exports()
+        stale = ExportJob.objects.get(pk=first.data['id'])
+        self.assertEqual(stale.status, ExportJob.STATUS_FAILED)
+        self.assertIsNotNone(stale.finished_at)
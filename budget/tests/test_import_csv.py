@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Category, Currency, Transaction
+
+
+class ImportCSVTest(APITestCase):
+    url = '/api/v1/transactions/import_csv/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.byn = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.usd = Currency.objects.create(code='USD', name='Доллар США', rate_to_base=Decimal('3.2'))
+        self.account = Account.objects.create(
+            user=self.user, name='Карта', account_type='card', currency=self.byn, balance=Decimal('100.00')
+        )
+        self.food = Category.objects.create(name='Еда')
+        self.salary = Category.objects.create(name='Зарплата')
+
+    def upload(self, content, **data):
+        file = SimpleUploadedFile('statement.csv', content.encode('utf-8'), content_type='text/csv')
+        return self.client.post(self.url, {'file': file, **data}, format='multipart')
+
+    def test_import_updates_balance_once(self):
+        content = (
+            '\ufeffДата,Категория,Сумма,Тип,Описание,Счет,Валюта\n'
+            '2025-01-05,Зарплата,500.00,income,Аванс,Карта,\n'
+            '2025-01-06 10:30:00,Еда,25.50,expense,Обед,Карта,BYN\n'
+            '2025-01-07,Еда,10.00,expense,,Карта,USD\n'
+        )
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 3)
+        self.assertEqual(response.data['errors'], [])
+
+        self.account.refresh_from_db()
+        # 100 + 500 - 25.50 - 10 * 3.2
+        self.assertEqual(self.account.balance, Decimal('542.50'))
+        dates = sorted(Transaction.objects.filter(user=self.user).values_list('date__date', flat=True))
+        self.assertEqual([str(day) for day in dates], ['2025-01-05', '2025-01-06', '2025-01-07'])
+
+    def test_atomic_mode_rolls_back_on_error(self):
+        content = (
+            'Дата;Категория;Сумма;Тип;Описание\n'
+            '2025-01-05;Еда;12.00;expense;Кофе\n'
+            '2025-01-06;Неизвестная;5.00;expense;\n'
+            'вчера;Еда;5.00;expense;\n'
+        )
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['imported'], 0)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_partial_mode_imports_valid_rows(self):
+        content = (
+            'Дата,Категория,Сумма,Тип,Описание,Счет\n'
+            '2025-01-05,Еда,12.00,expense,Кофе,Карта\n'
+            '2025-01-06,Еда,-5.00,expense,,Карта\n'
+            '2025-01-07,Еда,8.00,transfer,,Карта\n'
+        )
+        response = self.upload(content, mode='partial')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['failed'], 2)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('88.00'))
+
+    def test_ambiguous_category_name_is_rejected(self):
+        Category.objects.create(name='Еда')
+        content = (
+            'Дата,Категория,Сумма,Тип,Описание,Счет\n'
+            '2025-01-05,Еда,12.00,expense,Кофе,Карта\n'
+            '2025-01-06,Зарплата,50.00,income,,Карта\n'
+        )
+        response = self.upload(content, mode='partial')
+        self.assertEqual(response.data['imported'], 1)
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertIn('неоднозначна', response.data['errors'][0]['error'])
+        self.assertFalse(Transaction.objects.filter(user=self.user, category__name='Еда').exists())
+
+    def test_query_count_does_not_depend_on_rows(self):
+        def run(rows, month):
+            content = 'Дата,Категория,Сумма,Тип,Описание,Счет\n' + ''.join(
+                f'2025-{month:02d}-{day % 28 + 1:02d},Еда,1.00,expense,,Карта\n' for day in range(rows)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.upload(content)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        self.assertEqual(run(10, month=2), run(60, month=3))
+
+    def test_missing_file(self):
+        response = self.client.post(self.url, {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
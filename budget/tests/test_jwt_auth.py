@@ -0,0 +1,54 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Currency
+
+
+class StatelessJWTAuthTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='jwtuser', password='password123')
+        currency = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=1)
+        Account.objects.create(user=self.user, name='Счет', account_type='cash', currency=currency)
+
+    def obtain(self):
+        response = self.client.post('/api/v1/token/', {'username': 'jwtuser', 'password': 'password123'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_access_token_does_not_load_user(self):
+        access = self.obtain()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        # Только выборка счетов: ни пользователя, ни сессии
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/accounts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_invalid_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer broken')
+        response = self.client.get('/api/v1/accounts/')
+        # Первым стоит SessionAuthentication, поэтому отказ - 403, как и без учетных данных
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_checks_user(self):
+        refresh = self.obtain()['refresh']
+        response = self.client.post('/api/v1/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post('/api/v1/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_auth', iterations=2, stdout=out)
+        self.assertIn('JWT, только подпись', out.getvalue())
+        self.assertFalse(User.objects.filter(username='benchmark-auth').exists())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_auth', iterations=0, stdout=StringIO())
@@ -0,0 +1,43 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase
+
+from budget.models import Transaction
+
+
+class RunLoadTestTest(LiveServerTestCase):
+    def test_load_test_reports_stages_and_checks_balances(self):
+        call_command(
+            'seed_benchmark_data', '--users', '2', '--transactions', '50', '--days', '30', stdout=StringIO(),
+        )
+        existing = Transaction.objects.count()
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'load.json'
+            call_command(
+                'run_load_test', '--base-url', self.live_server_url, '--stages', '1,2', '--duration', '1',
+                '--think-time', '0', '--users', '2', '--output', str(output), stdout=StringIO(),
+            )
+            report = json.loads(output.read_text(encoding='utf-8'))
+
+        self.assertEqual([stage['concurrency'] for stage in report['stages']], [1, 2])
+        self.assertEqual(report['lost_updates'], [])
+        stage = report['stages'][0]
+        self.assertGreater(stage['requests'], 0)
+        self.assertEqual(stage['error_rate'], 0)
+        if 'create-transaction' in stage['endpoints']:
+            self.assertGreater(Transaction.objects.count(), existing)
+
+    def test_failed_login_stops_load_test(self):
+        call_command('seed_benchmark_data', '--users', '1', '--transactions', '10', '--days', '30', stdout=StringIO())
+        with mock.patch('budget.loadtest.BENCHMARK_PASSWORD', 'wrong-password'):
+            with self.assertRaisesMessage(CommandError, 'Не удалось войти'):
+                call_command(
+                    'run_load_test', '--base-url', self.live_server_url, '--stages', '1', '--duration', '1',
+                    '--think-time', '0', '--users', '1', stdout=StringIO(),
+                )
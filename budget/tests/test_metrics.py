@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from prometheus_client.core import REGISTRY
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Category, Currency
+from budget.tasks import check_budgets
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsEndpointTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='metricsuser', password='password123')
+        self.client.force_authenticate(user=self.user)
+        self.currency = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.account = Account.objects.create(
+            user=self.user, name='Карта', account_type='card', currency=self.currency, balance=Decimal('100.00'),
+        )
+
+    def test_requests_tasks_and_business_metrics_are_exposed(self):
+        requests_before = sample(
+            'budget_http_request_duration_seconds_count',
+            view='transaction-list', action='list', method='GET', status='200',
+        )
+        ingested_before = sample('budget_transactions_ingested_total', source='single')
+        tasks_before = sample('budget_celery_tasks_total', task='budget.tasks.check_budgets', outcome='SUCCESS')
+
+        self.client.get('/api/v1/transactions/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/transactions/', {
+                'user': self.user.pk, 'account': self.account.pk, 'type': 'expense', 'amount': '5.00',
+                'category': Category.objects.create(name='Еда').pk,
+            })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        check_budgets.apply()
+
+        self.assertEqual(sample(
+            'budget_http_request_duration_seconds_count',
+            view='transaction-list', action='list', method='GET', status='200',
+        ), requests_before + 1)
+        self.assertEqual(sample('budget_transactions_ingested_total', source='single'), ingested_before + 1)
+        self.assertEqual(
+            sample('budget_celery_tasks_total', task='budget.tasks.check_budgets', outcome='SUCCESS'), tasks_before + 1,
+        )
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('budget_db_queries_total{', body)
+        self.assertIn('budget_export_jobs{status="pending"} 0.0', body)
+        self.assertIn('budget_currency_rate_age_seconds{currency="BYN"}', body)
+
+    def test_metrics_are_closed_for_other_addresses(self):
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_multiprocess_directory_is_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+                response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Файлов воркеров нет - остаются только значения из базы
+        self.assertNotIn('python_gc_objects_collected_total', response.content.decode())
+        self.assertIn('budget_exceeded_budgets 0.0', response.content.decode())
+
+
+class MultiprocessDirectoryTest(SimpleTestCase):
+    def test_missing_directory_is_created_on_import(self):
+        # Каталог проверяется в отдельном процессе: режим multiprocess выбирается при импорте prometheus_client
+        with tempfile.TemporaryDirectory() as root:
+            directory = os.path.join(root, 'prometheus')
+            script = (
+                'import django; django.setup(); '
+                'from budget.metrics import DB_QUERIES; DB_QUERIES.labels("view", "list").inc()'
+            )
+            result = subprocess.run(
+                [sys.executable, '-c', script], capture_output=True, text=True, cwd=settings.BASE_DIR,
+                env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory},
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertTrue(os.listdir(directory))
@@ -0,0 +1,90 @@
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.middleware import PerformanceMiddleware
+from budget.models import Category, Transaction
+from budget.monitoring import stats
+
+
+class PerformanceMiddlewareTest(APITestCase):
+    def setUp(self):
+        stats.reset()
+        self.addCleanup(stats.reset)
+        self.user = User.objects.create_user(username='perfuser', password='password123')
+        self.client.force_authenticate(user=self.user)
+        category = Category.objects.create(name='Еда')
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, category=category, type='expense', amount=Decimal('5.00'),
+                date=timezone.make_aware(datetime(2025, 1, day, 12)),
+            )
+            for day in range(1, 6)
+        ])
+
+    def view_stats(self, view, action):
+        return next(row for row in stats.snapshot()['views'] if row['view'] == view and row['action'] == action)
+
+    def test_request_is_attributed_to_view_and_action(self):
+        with self.assertLogs('budget.performance', level='INFO') as logs:
+            response = self.client.get('/api/v1/transactions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('"view": "transaction-list"', logs.output[0])
+
+        row = self.view_stats('transaction-list', 'list')
+        self.assertEqual(row['requests'], 1)
+        self.assertGreater(row['mean_queries'], 0)
+        self.assertEqual(row['response_bytes'], len(response.content))
+
+    def test_streamed_export_is_measured_until_the_end(self):
+        response = self.client.get('/api/v1/transactions/export_csv/')
+        self.assertEqual(stats.snapshot()['views'], [])
+        body = b''.join(response.streaming_content)
+        row = self.view_stats('transaction-export-csv', 'export_csv')
+        self.assertEqual(row['response_bytes'], len(body))
+        self.assertGreater(row['mean_queries'], 0)
+
+    def test_repeated_queries_are_counted_as_duplicates(self):
+        ids = list(Transaction.objects.values_list('id', flat=True))
+
+        def view(request):
+            # N+1: одна и та же выборка на каждую строку
+            for pk in ids:
+                Transaction.objects.get(pk=pk)
+            return HttpResponse('ok')
+
+        PerformanceMiddleware(view)(RequestFactory().get('/'))
+        row = self.view_stats('unresolved', 'get')
+        self.assertEqual(row['max_queries'], len(ids))
+        self.assertEqual(row['duplicate_queries'], len(ids) - 1)
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_queries_are_sampled_with_stack(self):
+        request = RequestFactory().get('/api/v1/transactions/')
+
+        def view(request):
+            list(Transaction.objects.all())
+            return HttpResponse('ok')
+
+        with self.assertLogs('budget.performance.slow_query', level='WARNING'):
+            PerformanceMiddleware(view)(request)
+        sample = stats.snapshot()['slow_queries'][-1]
+        self.assertIn('budget_transaction', sample['sql'])
+        self.assertTrue(any('test_monitoring.py' in frame for frame in sample['stack']))
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/performance/').status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_superuser(username='perfadmin', password='password123')
+        self.client.force_authenticate(user=admin)
+        self.client.get('/api/v1/transactions/')
+        response = self.client.get('/api/performance/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('slow_queries', response.data)
+        self.assertEqual(self.client.delete('/api/performance/').status_code, status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,82 @@
+import json
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Category, ProfileCapture, Transaction
+from budget.serializers import ClaimsTokenObtainPairSerializer
+
+
+class ProfilingMiddlewareTest(APITestCase):
+    url = '/api/analytics/analytics/'
+    params = {'start_date': '2025-01-01', 'end_date': '2025-01-31'}
+
+    def setUp(self):
+        profile_root = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_root.cleanup)
+        settings_override = override_settings(PROFILE_ROOT=profile_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser(username='profadmin', password='password123')
+        self.user = User.objects.create_user(username='profuser', password='password123')
+        category = Category.objects.create(name='Еда')
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.admin, category=category, type='expense', amount=Decimal('7.00'),
+                date=timezone.make_aware(datetime(2025, 1, day, 12)),
+            )
+            for day in range(1, 11)
+        ])
+
+    def test_sql_profile_is_saved_for_staff(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(self.url, {**self.params, 'profile': 'sql'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(capture.view, 'analytics:analytics_api')
+        self.assertGreater(capture.queries, 0)
+        stacks = capture.stacks_path.read_text(encoding='utf-8').splitlines()
+        # Свернутый формат: "кадр;кадр;SQL ... вес"
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in stacks))
+        self.assertTrue(any('analytics/views.py' in line and ';SQL SELECT' in line for line in stacks))
+        trace = json.loads(capture.sql_path.read_text(encoding='utf-8'))
+        self.assertEqual(len(trace), capture.queries)
+
+        admin_page = self.client.get(f'/admin/budget/profilecapture/{capture.pk}/change/')
+        self.assertContains(admin_page, 'Самые затратные запросы')
+        download = self.client.get(f'/admin/budget/profilecapture/{capture.pk}/download/stacks/')
+        self.assertEqual(b''.join(download.streaming_content).decode('utf-8').splitlines(), stacks)
+
+        capture.delete()
+        self.assertFalse(capture.stacks_path.exists())
+
+    @override_settings(PROFILE_SAMPLE_INTERVAL=0.0005)
+    def test_cpu_profile_of_streamed_export_with_jwt(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get('/api/analytics/export-csv/', {**self.params, 'profile': 'cpu'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Профиль сохраняется после чтения всего потока
+        self.assertFalse(ProfileCapture.objects.exists())
+        b''.join(response.streaming_content)
+
+        capture = ProfileCapture.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual(capture.mode, ProfileCapture.MODE_CPU)
+        self.assertEqual(capture.user, self.admin)
+        self.assertGreater(capture.queries, 0)
+        self.assertTrue(capture.stacks_path.exists())
+
+    def test_flag_is_ignored_for_regular_users(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {**self.params, 'profile': 'sql'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(ProfileCapture.objects.exists())
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils.timezone import make_aware
+
+from budget.models import Budget, Category, Loan, Transaction
+
+
+class QueryPlanTest(TestCase):
+    """
+    Проверяет по EXPLAIN, что основные выборки идут по индексам, а не полным сканированием.
+    На PostgreSQL последовательное сканирование отключается, чтобы на маленькой тестовой
+    таблице планировщик показал, есть ли подходящий индекс.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='planner', password='password123')
+        self.category = Category.objects.create(name='Еда')
+        self.start = make_aware(datetime(2025, 1, 1))
+        self.end = make_aware(datetime(2025, 2, 1))
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, *index_names):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan)
+        if connection.vendor in ('postgresql', 'sqlite'):
+            self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_transaction_list(self):
+        queryset = Transaction.objects.filter(user=self.user).order_by('-date')
+        self.assertUsesIndex(queryset, 'budget_tx_user_date_idx')
+
+    def test_transactions_for_period(self):
+        queryset = Transaction.objects.filter(user=self.user, date__gte=self.start, date__lt=self.end)
+        self.assertUsesIndex(queryset, 'budget_tx_user_date_idx')
+
+    def test_transactions_by_type_for_period(self):
+        queryset = Transaction.objects.filter(
+            user=self.user, type='income', date__gte=self.start, date__lt=self.end
+        ).values('user').annotate(total=Sum('amount'))
+        self.assertUsesIndex(queryset, 'budget_tx_user_type_date_idx')
+
+    def test_category_expenses(self):
+        queryset = Transaction.objects.filter(
+            user=self.user, category=self.category, type='expense', date__gte=self.start, date__lt=self.end
+        ).values('category').annotate(total=Sum('amount'))
+        self.assertUsesIndex(queryset, 'budget_tx_expense_cat_date_idx', 'budget_tx_user_type_date_idx')
+
+    def test_budget_lookup(self):
+        today = date(2025, 1, 15)
+        queryset = Budget.objects.filter(
+            user=self.user, category=self.category, start_date__lte=today, end_date__gte=today
+        )
+        self.assertUsesIndex(queryset, 'budget_budget_period_idx')
+
+    def test_open_loans(self):
+        queryset = Loan.objects.filter(counterparty__user=self.user, is_settled=False)
+        self.assertUsesIndex(queryset, 'budget_loan_cp_settled_idx')
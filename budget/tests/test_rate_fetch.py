@@ -0,0 +1,152 @@
+import json
+import threading
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from budget.models import Currency, CurrencyRate
+from budget.rates.fetch import date_range, fetch_rates, update_rates
+from budget.rates.http import build_session
+from budget.rates.providers import NBRBProvider
+from budget.update_currecy import Command as ExchangeRateCommand
+
+FIXTURES = Path(__file__).parent / 'fixtures' / 'rates'
+
+
+class StubRatesHandler(BaseHTTPRequestHandler):
+    """Заглушка API курсов: отдает фикстуры, поддерживает ETag и может отвечать 503."""
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        with server.lock:
+            server.hits.append(self.path)
+            if server.failures:
+                server.failures -= 1
+                self.send_response(503)
+                self.end_headers()
+                return
+
+        if url.path == '/nbrb':
+            on_date = parse_qs(url.query)['ondate'][0]
+            rates = json.loads((FIXTURES / 'nbrb.json').read_text(encoding='utf-8'))
+            # Курс меняется по дням, чтобы было видно, какой день загружен
+            day = date.fromisoformat(on_date).toordinal() % 100
+            for rate in rates:
+                rate['Date'] = f'{on_date}T00:00:00'
+                rate['Cur_OfficialRate'] = round(rate['Cur_OfficialRate'] + day / 10000, 4)
+            body = json.dumps(rates).encode('utf-8')
+        else:
+            body = (FIXTURES / 'exchangerate_api.json').read_bytes()
+
+        etag = '"%d"' % hash(body)
+        if self.headers.get('If-None-Match') == etag:
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class RateFetchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubRatesHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.settings = override_settings(
+            RATE_PROVIDER_URLS={'nbrb': f'{base}/nbrb', 'exchangerate-api': f'{base}/latest/USD'},
+            RATE_FETCH_BACKOFF=0,
+        )
+        cls.settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.hits, self.server.failures, self.server.not_modified = [], 0, 0
+        cache.clear()
+        # Новая общая сессия с настройками теста
+        patcher = mock.patch('budget.rates.http._session', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.usd = Currency.objects.create(code='USD', name='Доллар', rate_to_base=Decimal('3.0000'))
+        self.eur = Currency.objects.create(code='EUR', name='Евро', rate_to_base=Decimal('3.5000'))
+
+    def test_backfill_saves_every_day_with_one_upsert(self):
+        dates = date_range(date(2025, 1, 1), date(2025, 1, 31))
+        saved, errors = update_rates(['nbrb'], dates=dates, workers=8)
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(saved['nbrb']), ['EUR', 'USD'])
+        self.assertEqual(len(self.server.hits), 31)
+        self.assertEqual(CurrencyRate.objects.filter(currency=self.usd, source='nbrb').count(), 31)
+        # Текущим становится курс последнего дня
+        last = CurrencyRate.objects.get(currency=self.usd, date=date(2025, 1, 31))
+        self.usd.refresh_from_db()
+        self.assertEqual(self.usd.rate_to_base, last.rate.quantize(Decimal('0.0001')))
+
+    def test_server_errors_are_retried(self):
+        self.server.failures = 2
+        saved, errors = update_rates(['nbrb'], dates=[date(2025, 1, 10)])
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.server.hits), 3)
+        self.assertIn('USD', saved['nbrb'])
+
+    def test_failed_dates_are_reported(self):
+        session = build_session(retries=0)
+        self.server.failures = 1
+        series, errors = fetch_rates([NBRBProvider()], [date(2025, 1, 10)], session=session)
+        self.assertEqual(series, {})
+        self.assertEqual(len(errors), 1)
+
+    def test_repeated_request_is_conditional(self):
+        provider = NBRBProvider()
+        first = provider.fetch(date(2025, 1, 10))
+        second = provider.fetch(date(2025, 1, 10))
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.not_modified, 1)
+
+    def test_update_command(self):
+        call_command('update_currency_rates', '--date', '2025-01-10', stdout=mock.Mock(), stderr=mock.Mock())
+        rate = CurrencyRate.objects.get(currency=self.usd)
+        self.assertEqual((rate.date, rate.source), (date(2025, 1, 10), 'nbrb'))
+        # RUB нет в базе и в списке поддерживаемых валют
+        self.assertFalse(Currency.objects.filter(code='RUB').exists())
+
+    def test_backfill_command(self):
+        call_command(
+            'backfill_currency_rates', '--start', '2025-01-01', '--end', '2025-01-05', '--codes', 'USD',
+            stdout=mock.Mock(), stderr=mock.Mock(),
+        )
+        self.assertEqual(CurrencyRate.objects.filter(currency=self.usd).count(), 5)
+        self.assertFalse(CurrencyRate.objects.filter(currency=self.eur).exists())
+
+    def test_exchangerate_feed_is_converted_to_base(self):
+        ExchangeRateCommand(stdout=mock.Mock()).handle()
+        rates = dict(CurrencyRate.objects.values_list('currency__code', 'rate'))
+        self.assertEqual(
+            rates, {'USD': Decimal('3.2'), 'BYN': Decimal('1'), 'EUR': Decimal('4'), 'RUB': Decimal('0.032')},
+        )
+        self.assertEqual(Currency.objects.get(code='EUR').rate_to_base, Decimal('4.0000'))
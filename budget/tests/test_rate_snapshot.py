@@ -0,0 +1,66 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from budget.models import Account, Currency, Transaction
+from budget.rates import save_rates
+from budget.rates.snapshot import convert_amount, get_rates, invalidate, rate_scope
+from budget.serializers import convert_currency
+from budget.tasks import cleanup_export_jobs
+from budget.versioning import CATALOG_CURRENCIES, bump_catalog_version
+
+
+class RateSnapshotTest(TestCase):
+    def setUp(self):
+        invalidate()
+        self.byn = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        self.usd = Currency.objects.create(code='USD', name='Доллар', rate_to_base=Decimal('3.2'))
+        self.user = User.objects.create_user(username='rates', password='password123')
+        self.account = Account.objects.create(user=self.user, name='Счет', account_type='cash', currency=self.byn)
+
+    def test_conversion_without_queries(self):
+        transaction = Transaction(
+            user=self.user, account=self.account, currency=self.usd, type='expense', amount=Decimal('10.00'),
+        )
+        with rate_scope():
+            get_rates()
+            with self.assertNumQueries(0):
+                self.assertEqual(transaction.converted_amount, Decimal('32.00'))
+                self.assertEqual(convert_currency(Decimal('32.00'), self.byn, self.usd), Decimal('10.00'))
+
+    def test_stamp_is_checked_once_per_scope(self):
+        get_rates()
+        with rate_scope():
+            with self.assertNumQueries(1):
+                convert_amount(1, self.usd.pk, self.byn.pk)
+                convert_amount(2, self.byn.pk, self.usd.pk)
+
+    def test_change_in_another_process_is_picked_up(self):
+        with rate_scope():
+            self.assertEqual(convert_amount(1, self.usd.pk, self.byn.pk), Decimal('3.2'))
+        # Другой воркер меняет курс: сигналы этого процесса не срабатывают, меняется только версия
+        Currency.objects.filter(pk=self.usd.pk).update(rate_to_base=Decimal('3.5'))
+        bump_catalog_version(CATALOG_CURRENCIES)
+        with rate_scope():
+            self.assertEqual(convert_amount(1, self.usd.pk, self.byn.pk), Decimal('3.5'))
+
+    def test_change_is_picked_up_outside_scope(self):
+        # Команда управления или shell: без rate_scope версия сверяется при каждом вызове,
+        # в том числе после задачи, выполненной в том же потоке
+        cleanup_export_jobs.apply()
+        self.assertEqual(convert_amount(1, self.usd.pk, self.byn.pk), Decimal('3.2'))
+        Currency.objects.filter(pk=self.usd.pk).update(rate_to_base=Decimal('3.5'))
+        bump_catalog_version(CATALOG_CURRENCIES)
+        self.assertEqual(convert_amount(1, self.usd.pk, self.byn.pk), Decimal('3.5'))
+
+    def test_rate_update_refreshes_snapshot(self):
+        with rate_scope():
+            get_rates()
+            save_rates({'USD': '3.3'}, date.today())
+            self.assertEqual(convert_amount(10, self.usd.pk, self.byn.pk), Decimal('33.0000'))
+
+    def test_convert_many(self):
+        amounts = get_rates().convert_many(['1.00', '2.50'], self.usd.pk, self.byn.pk)
+        self.assertEqual(amounts, [Decimal('3.2000'), Decimal('8.0000')])
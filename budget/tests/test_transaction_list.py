@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import make_aware
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from budget.models import Account, Category, Currency, Tag, Transaction
+
+
+class TransactionListTest(APITestCase):
+    url = '/api/v1/transactions/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='lister', password='password123')
+        self.client.force_authenticate(user=self.user)
+        currency = Currency.objects.create(code='BYN', name='Белорусский рубль', rate_to_base=Decimal('1'))
+        account = Account.objects.create(
+            user=self.user, name='Карта', account_type='card', currency=currency, balance=Decimal('0')
+        )
+        start = make_aware(datetime(2025, 1, 1))
+        for number in range(30):
+            transaction = Transaction.objects.create(
+                user=self.user, account=account, currency=currency, type='income', amount=Decimal('1.00'),
+                category=Category.objects.create(name=f'Категория {number}'),
+                # Пары транзакций с одинаковой датой проверяют порядок по id
+                date=start + timedelta(days=number // 2),
+            )
+            transaction.tags.add(Tag.objects.create(name=f'tag-{number}'))
+
+    def list_queries(self, page_size):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'page_size': page_size})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), page_size)
+        return len(queries)
+
+    def test_constant_queries(self):
+        self.assertEqual(self.list_queries(2), self.list_queries(25))
+
+    def page_ids(self, query):
+        seen = []
+        url = self.url + '?' + query
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_cursor_pages_cover_all_transactions(self):
+        expected = list(Transaction.objects.filter(user=self.user).order_by('-date', '-id').values_list('id', flat=True))
+        self.assertEqual(self.page_ids('page_size=7'), expected)
+
+    def test_cursor_pages_with_ordering_by_equal_amounts(self):
+        # У всех транзакций одна сумма: порядок и позицию курсора задает добавленный id
+        transactions = Transaction.objects.filter(user=self.user)
+        for ordering in ('amount', '-amount'):
+            with self.subTest(ordering=ordering):
+                expected = list(transactions.order_by(ordering, ordering.replace('amount', 'id')).values_list('id', flat=True))
+                self.assertEqual(self.page_ids(f'page_size=7&ordering={ordering}'), expected)
@@ -15,14 +15,16 @@ router.register(r'currencies', CurrencyViewSet, basename='currency')
 router.register(r'budgets', BudgetViewSet, basename='budget')
 router.register(r'loans', LoanViewSet, basename='loan')
 router.register(r'counterparties', CounterpartyViewSet, basename='counterparties')
+router.register(r'exports', ExportJobViewSet, basename='export')
 
 urlpatterns = [
     # API маршруты
     path('v1/', include(router.urls)),
-    # path('v1/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
-    # path('v1/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('v1/token/', TokenObtainPairView.as_view(), name='v1_token_obtain_pair'),
+    path('v1/token/refresh/', TokenRefreshView.as_view(), name='v1_token_refresh'),
     path('api-auth/', include('rest_framework.urls')),
     path('transfer/', TransferView.as_view(), name='transfer'),
+    path('performance/', PerformanceStatsView.as_view(), name='performance_stats'),
     path('analytics/', include('analytics.urls')),
     # Маршруты для HTML-страниц
     path('', include(frontend_urls)),
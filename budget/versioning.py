@@ -0,0 +1,103 @@
+from django.db import IntegrityError, transaction
+from django.db.models import CharField, F, Value
+from django.utils import timezone
+
+from .models import CatalogVersion, DataVersion
+
+# Общие справочники, у которых есть своя версия
+CATALOG_CATEGORIES = 'categories'
+CATALOG_TAGS = 'tags'
+CATALOG_CURRENCIES = 'currencies'
+# Ключ версии данных пользователя в get_version_states
+USER_SCOPE = 'user'
+
+
+def _bump(model, lookup, create):
+    # Один UPDATE; строка создается при первом изменении, одновременное создание
+    # из двух запросов заканчивается повторным UPDATE, поэтому ни одно увеличение не теряется
+    updated = model.objects.filter(**lookup).update(version=F('version') + 1, updated_at=timezone.now())
+    if updated or not create:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(version=1, **lookup)
+    except IntegrityError:
+        _bump(model, lookup, create)
+
+
+def bump_data_version(user_id, create=True):
+    """
+    Увеличивает версию данных пользователя одним UPDATE.
+    Строка создается при первом изменении (если create).
+    """
+    if user_id is None:
+        return
+    _bump(DataVersion, {'user_id': user_id}, create)
+
+
+def bump_catalog_version(name):
+    """Увеличивает версию общего справочника (CATALOG_*)."""
+    _bump(CatalogVersion, {'name': name}, True)
+
+
+def get_data_version(user_id):
+    """Текущая версия данных пользователя (0, если данные еще не менялись)."""
+    return get_data_state(user_id)[0]
+
+
+def get_data_state(user_id):
+    """(версия, время изменения) данных пользователя; (0, None), если данные еще не менялись."""
+    row = DataVersion.objects.filter(user_id=user_id).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def get_catalog_state(name):
+    """(версия, время изменения) справочника; (0, None), если он еще не менялся."""
+    row = CatalogVersion.objects.filter(name=name).values_list('version', 'updated_at').first()
+    return row or (0, None)
+
+
+def get_version_states(user_id=None, catalogs=()):
+    """
+    Версии данных пользователя и справочников одним запросом.
+    Возвращает {USER_SCOPE: (версия, время), справочник: (версия, время), ...};
+    для еще не менявшихся данных - (0, None).
+    """
+    scopes = list(catalogs)
+    # В UNION все колонки - аннотации, иначе Django ставит поля модели перед аннотациями
+    queryset = (
+        CatalogVersion.objects.filter(name__in=scopes)
+        .annotate(scope=F('name'), scope_version=F('version'), scope_updated_at=F('updated_at'))
+        .values_list('scope', 'scope_version', 'scope_updated_at')
+    )
+    if user_id is not None:
+        scopes.insert(0, USER_SCOPE)
+        user_row = (
+            DataVersion.objects.filter(user_id=user_id)
+            .annotate(
+                scope=Value(USER_SCOPE, output_field=CharField()),
+                scope_version=F('version'),
+                scope_updated_at=F('updated_at'),
+            )
+            .values_list('scope', 'scope_version', 'scope_updated_at')
+        )
+        queryset = user_row.union(queryset, all=True) if catalogs else user_row
+    rows = {name: (version, updated_at) for name, version, updated_at in queryset}
+    return {scope: rows.get(scope, (0, None)) for scope in scopes}
+
+
+def format_stamp(state):
+    """
+    Отметка версии для ключей кэша и ETag: номер версии и время последнего изменения.
+    Время делает отметку уникальной, даже если строка версии создана заново
+    (например, после удаления пользователя с тем же id).
+    """
+    version, updated_at = state
+    if updated_at is None:
+        return str(version)
+    return f'{version}-{updated_at.timestamp():.6f}'
+
+
+def get_data_stamp(user_id):
+    """Отметка версии данных пользователя (см. format_stamp)."""
+    return format_stamp(get_data_state(user_id))
@@ -1,36 +1,41 @@
-import csv
 from datetime import datetime
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 
-import django
+from django.db import transaction
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden
 from django.db.models import Sum, Case, When, DecimalField
-from django.db.models.signals import post_save
-from django.dispatch import receiver
-from django.http import HttpResponse
 from drf_yasg import openapi
+from prometheus_client import CONTENT_TYPE_LATEST
 from drf_yasg.utils import swagger_auto_schema
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfgen import canvas
 from rest_framework.decorators import action
 from rest_framework.filters import OrderingFilter, SearchFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from .conditional import ConditionalGetMixin
 from .docs.budget_docs import BUDGET_LIST_RESPONSE, BUDGET_CREATE_EXAMPLE, BUDGET_CREATE_RESPONSE
 from .docs.category_docs import CATEGORY_FILTER_PARAMS, CATEGORY_LIST_RESPONSE, CATEGORY_CREATE_RESPONSE
 from .docs.loan_docs import make_payment_request, make_payment_response, settle_request, settle_response
 from .docs.transaction_docs import TRANSACTION_LIST_RESPONSES, TRANSACTION_LIST_PARAMETERS
+from .export_jobs import export_job_response, submit_export
+from .exports import stream_csv_response
 from .filters import TransactionFilter
-from .models import Transaction, Category, Tag, Budget, Loan
+from .imports import IMPORT_MODE_ATOMIC, IMPORT_MODES, TransactionImporter
+from .metrics import render_metrics
+from .monitoring import stats as performance_stats
+from .pagination import TransactionCursorPagination
+from .reports import pdf_report_response, transactions_csv_columns
+from .models import Transaction, Category, Tag, Budget, Loan, ExportJob
 from .serializers import *
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
+from .services import InsufficientFunds, withdraw
+from .versioning import CATALOG_CATEGORIES, CATALOG_CURRENCIES, CATALOG_TAGS
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly, AllowAny
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
@@ -38,7 +43,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
     filterset_class = TransactionFilter
     search_fields = ['description', 'category__name', 'tags__name']
     ordering_fields = ['date', 'amount']  # Поля для сортировки
-    ordering = ['-date']
+    ordering = ['-date', '-id']
+    pagination_class = TransactionCursorPagination
+    # В ответе есть категория, теги и валюта транзакции
+    etag_catalogs = (CATALOG_CATEGORIES, CATALOG_TAGS, CATALOG_CURRENCIES)
+
     @swagger_auto_schema(
         operation_description='Получение списка транзакций с фильтрацией и сортировкой',
         manual_parameters=TRANSACTION_LIST_PARAMETERS,
@@ -47,89 +56,60 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        return Transaction.objects.filter(user=user)
+        # Связанные объекты сериализатора загружаются заранее, чтобы не было запроса на каждую строку
+        return (
+            Transaction.objects.filter(user=user)
+            .select_related('category', 'currency', 'account')
+            .prefetch_related('tags')
+        )
 
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
-        transactions = Transaction.objects.filter(user=request.user)
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
-        # Эта штука фиксит кириллицу
-        response.write('\ufeff'.encode('utf-8'))
-        writer = csv.writer(response)
-        writer.writerow(['Дата', 'Категория', 'Сумма', 'Тип', 'Описание'])
-        for transaction in transactions:
-            writer.writerow([
-                transaction.date,
-                transaction.category.name if transaction.category else '',
-                transaction.amount,
-                transaction.type,
-                transaction.description or ''
-            ])
-        return response
+        transactions = Transaction.objects.filter(user=request.user).order_by('date', 'id')
+        return stream_csv_response(
+            transactions,
+            transactions_csv_columns(),
+            filename='transactions.csv',
+            content_type='text/csv; charset=utf-8',
+        )
 
     @action(detail=False, methods=['get'])
     def export_pdf(self, request):
-        transactions = Transaction.objects.filter(user=request.user)
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = 'attachment; filename="transactions.pdf"'
-        pdfmetrics.registerFont(TTFont('DejaVuSans', 'static/fonts/DejaVuSans.ttf'))
-        pdf = canvas.Canvas(response, pagesize=letter)
-        pdf.setFont('DejaVuSans', 12)
-        pdf.drawString(100, 750, "Отчет по транзакциям")
-        pdf.drawString(50, 700, "Дата | Категория | Сумма | Тип | Описание")
-        y = 680
-        for transaction in transactions:
-            pdf.drawString(
-                50, y,
-                f"{transaction.date} | {transaction.category.name if transaction.category else ''} | "
-                f"{transaction.amount} | {transaction.type} | {transaction.description or ''}"
-            )
-            y -= 20
-            if y < 50:  # Переход на новую страницу
-                pdf.showPage()
-                pdf.setFont('DejaVuSans', 12)
-                y = 750
-
-        pdf.save()
-        return response
+        return pdf_report_response('transactions', request.user, {})
 
     @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
     def import_csv(self, request):
         file = request.FILES.get('file')
-        if not file.name.endswith('.csv'):
+        if not file or not file.name.endswith('.csv'):
             return Response({'error': 'Загрузите файл в формате CSV.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            decoded_file = file.read().decode('utf-8')  # Декодируем файл
-            reader = csv.reader(decoded_file.splitlines())
-            next(reader)  # Пропускаем заголовок
-
-            for row in reader:
-                try:
-                    date, category_name, amount, type, description = row
-                    category = Category.objects.get(name=category_name, user=request.user)
-                    Transaction.objects.create(
-                        user=request.user,
-                        date=date,
-                        category=category,
-                        amount=Decimal(amount),
-                        type=type,
-                        description=description
-                    )
-                except Exception as e:
-                    return Response({'error': f'Ошибка в строке: {row}. {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
+        mode = request.data.get('mode', IMPORT_MODE_ATOMIC)
+        if mode not in IMPORT_MODES:
+            return Response(
+                {'error': f'Недопустимое значение mode. Используйте {" или ".join(IMPORT_MODES)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-            return Response({'message': 'Данные успешно импортированы!'}, status=status.HTTP_201_CREATED)
+        try:
+            report = TransactionImporter(request.user, mode=mode).run(file)
         except UnicodeDecodeError:
             return Response({'error': 'Проверьте, что файл сохранен в кодировке UTF-8.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        if report['errors'] and mode == IMPORT_MODE_ATOMIC:
+            return Response(
+                {'error': 'Файл содержит ошибки, данные не импортированы.', **report},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'message': 'Данные успешно импортированы!', **report}, status=status.HTTP_201_CREATED)
+
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated]
+    etag_user_data = False
+    etag_catalogs = (CATALOG_CATEGORIES,)
 
     @swagger_auto_schema(
         operation_description="Получение списка категорий",
@@ -246,93 +226,74 @@ class AccountViewSet(viewsets.ModelViewSet):
         account = self.get_object()
         amount = request.data.get('amount')
         try:
-            amount = float(amount)
+            amount = Decimal(str(amount))
             if amount <= 0:
                 return Response(
                     {'error': 'Сумма должна быть положительным числм'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            if amount > account.balance:
-                return Response(
-                    {'message': f'Со счета снято {amount}. Текущий баланс {account.balance}'},
-                    status=status.HTTP_200_OK,
-                )
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, InvalidOperation):
             return Response(
                 {'error': 'Укажите корректную сумму.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        try:
+            withdraw(account.pk, amount)
+        except InsufficientFunds as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        account.refresh_from_db(fields=['balance', 'updated_at'])
+        return Response(
+            {'message': f'Со счета снято {amount}. Текущий баланс {account.balance}'},
+            status=status.HTTP_200_OK,
+        )
 
 
 class TransferView(APIView):
     def post(self, request):
         serializer = TransferSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            serializer.save()  # Обновление балансов происходит в модели Transfer
+            try:
+                serializer.save()  # Обновление балансов происходит в модели Transfer
+            except InsufficientFunds as e:
+                # Остаток мог измениться между валидацией и списанием
+                return Response({'non_field_errors': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-@receiver(post_save, sender=Transaction)
-def check_budget_limit(sender, instance, **kwargs):
-    if instance.type == 'expense':
-        budgets = Budget.objects.filter(
-            user=instance.user,
-            category=instance.category,
-            start_date__lte=instance.date,
-            end_date__gte=instance.date
-        )
-        for budget in budgets:
-            total_expenses = Transaction.objects.filter(
-                user=instance.user,
-                category=instance.category,
-                type='expense',
-                date__range=(budget.start_date, budget.end_date)
-            ).aggregate(total=django.db.models.Sum('amount'))['total'] or 0
-            if total_expenses > budget.amount:
-                # Логика для уведомления
-                print(f"Бюджет для категории {budget.category.name} превышен!")
-
-
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = BudgetSerializer
     permission_classes = [IsAuthenticated]
     queryset = Budget.objects.all()
+    etag_catalogs = (CATALOG_CATEGORIES,)
 
     def get_queryset(self):
-        return Budget.objects.filter(user=self.request.user)
+        # Расходы считаются в том же запросе (total_expenses), а не отдельным агрегатом на каждый бюджет
+        return (
+            Budget.objects.filter(user=self.request.user)
+            .with_total_expenses()
+            .select_related('category')
+        )
 
-    @action(detail=True, methods=['get'])
-    def check_budget_status(self, request, pk=None):
-        # проверяем не превышен ли бюджет и возвращаем подробную информацию
-        budget = self.get_object()
-        total_expenses = budget.get_total_expenses()
-        is_exceeded = budget.is_exceeded()
-        data = {
+    @staticmethod
+    def budget_status(budget):
+        return {
             'budget_id': budget.id,
             'category': budget.category.name,
             'budget_amount': budget.amount,
-            'total_expenses': total_expenses,
-            'is_exceeded': is_exceeded
+            'total_expenses': budget.total_expenses,
+            'is_exceeded': budget.total_expenses > budget.amount,
         }
-        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def check_budget_status(self, request, pk=None):
+        # проверяем не превышен ли бюджет и возвращаем подробную информацию
+        return Response(self.budget_status(self.get_object()))
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
         # Вся инфа о бюджетах категорий пользователя
-        budgets = self.get_queryset()
-        data = []
-        for budget in budgets:
-            total_expenses = budget.get_total_expenses()
-            is_exceeded = budget.is_exceeded()
-            data.append({
-                'budget_id': budget.id,
-                'category': budget.category.name,
-                'budget_amount': budget.amount,
-                'total_expenses': total_expenses,
-                'is_exceeded': is_exceeded,
-            })
-        return Response(data)
+        return Response([self.budget_status(budget) for budget in self.get_queryset()])
 
     @swagger_auto_schema(
         operation_description="Получение списка бюджетов текущего пользователя",
@@ -397,10 +358,12 @@ class BudgetViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class CurrencyViewSet(viewsets.ModelViewSet):
+class CurrencyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Currency.objects.all()
     serializer_class = CurrencySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    etag_user_data = False
+    etag_catalogs = (CATALOG_CURRENCIES,)
 
 
 class LoanViewSet(viewsets.ModelViewSet):
@@ -412,7 +375,6 @@ class LoanViewSet(viewsets.ModelViewSet):
         """
         Возвращает только кредиты текущего пользователя.
         """
-        print((f"Current user: {self.request.user}"))
         return Loan.objects.filter(counterparty__user=self.request.user)
 
     @swagger_auto_schema(
@@ -449,35 +411,29 @@ class LoanViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Проверяем достаточность средств на счете
-        if payment_amount > loan.account.balance:
-            return Response(
-                {"error": "Недостаточно средств на счете."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Погашение кредита: кредит блокируется, а списание проверяет остаток на счете тем же UPDATE
+        try:
+            with transaction.atomic():
+                loan = Loan.objects.select_for_update().get(pk=loan.pk)
+                remaining_amount = loan.remaining_amount
+                if payment_amount >= remaining_amount:
+                    withdraw(loan.account_id, remaining_amount)
+                    loan.is_settled = True
+                    loan.remaining_amount = Decimal(0)
+                    loan.save(update_fields=['remaining_amount', 'is_settled'])
+                    message = f"Кредит полностью погашен. Списано: {remaining_amount}."
+                else:
+                    withdraw(loan.account_id, payment_amount)
+                    # Округление остатка
+                    loan.remaining_amount = (loan.remaining_amount - payment_amount).quantize(
+                        Decimal('0.01'), rounding=ROUND_HALF_UP
+                    )
+                    loan.save(update_fields=['remaining_amount'])
+                    message = f"Платеж в размере {payment_amount} успешно принят. Остаток долга: {loan.remaining_amount}."
+        except InsufficientFunds as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Погашение кредита
-        remaining_amount = loan.remaining_amount
-        if payment_amount >= remaining_amount:
-            loan.is_settled = True
-            loan.remaining_amount = Decimal(0)
-            loan.account.update_balance(-remaining_amount)
-            loan.save()
-            return Response(
-                {"message": f"Кредит полностью погашен. Списано: {remaining_amount}."},
-                status=status.HTTP_200_OK
-            )
-        else:
-            # Округление остатка
-            loan.remaining_amount = (loan.remaining_amount - payment_amount).quantize(Decimal('0.01'),
-                                                                                      rounding=ROUND_HALF_UP)
-            loan.account.update_balance(-payment_amount)
-            loan.save()
-            return Response(
-                {
-                    "message": f"Платеж в размере {payment_amount} успешно принят. Остаток долга: {loan.remaining_amount}."},
-                status=status.HTTP_200_OK
-            )
+        return Response({"message": message}, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
         method='post',
@@ -568,3 +524,58 @@ class CounterpartyViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+class ExportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Фоновые выгрузки: POST создает выгрузку (или возвращает готовую для тех же параметров
+    и неизменившихся данных), GET по id показывает прогресс, download отдает файл.
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return ExportJob.objects.filter(user=self.request.user).order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, _ = submit_export(
+            request.user,
+            serializer.validated_data['kind'],
+            serializer.validated_data['format'],
+            serializer.validated_data['params'],
+        )
+        return export_job_response(job)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != ExportJob.STATUS_DONE:
+            return Response({'error': 'Выгрузка еще не готова.'}, status=status.HTTP_409_CONFLICT)
+        if job.is_expired() or not job.artifact_path.exists():
+            return Response({'error': 'Срок хранения выгрузки истек.'}, status=status.HTTP_410_GONE)
+        content_type = 'application/pdf' if job.format == 'pdf' else 'text/csv; charset=utf-8'
+        return FileResponse(
+            open(job.artifact_path, 'rb'), as_attachment=True, filename=job.filename, content_type=content_type
+        )
+
+
+class PerformanceStatsView(APIView):
+    """Сводка замеров запросов этого процесса (budget.monitoring) и медленные запросы к базе."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(performance_stats.snapshot())
+
+    def delete(self, request):
+        performance_stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus; доступны с адресов METRICS_ALLOWED_IPS и администраторам."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,18 @@
+# Настройки gunicorn для Budget_Accounting.wsgi.
+# Метрики Prometheus собираются со всех воркеров через каталог PROMETHEUS_MULTIPROC_DIR (budget.metrics).
+import os
+import shutil
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска описывают уже несуществующие процессы
+    directory = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)